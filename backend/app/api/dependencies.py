@@ -1,8 +1,18 @@
 from typing import Annotated
 
+import numpy as np
 from fastapi import Depends
 
 from ..core.config import settings
+from ..core.timing import StageTimings
+from ..services.admission import AdmissionController
+from ..services.cancellation import Cancellation
+from ..services.drain import DrainController
+from ..services.inference_broker import create_broker
+from ..services.model_router import ModelRouter
+from ..services.rate_limit import RateLimiter, create_bucket_store, parse_model_weights
+from ..services.stream_sessions import StreamSessionStore
+from ..services.remote_inference import RemoteInferenceClient
 from ..services.whisper_service import WhisperModelManager
 from ..services.streaming_service import StreamingTranscriptionService
 
@@ -10,8 +20,14 @@ from ..services.streaming_service import StreamingTranscriptionService
 class WhisperService:
     """Whisperサービスの統合インターフェース"""
 
-    def __init__(self, model_manager: WhisperModelManager):
+    def __init__(
+        self,
+        model_manager: WhisperModelManager,
+        remote: RemoteInferenceClient | None = None,
+    ):
         self.model_manager = model_manager
+        # 設定されている場合は推論をワーカープロセスに依頼する
+        self.remote = remote
 
     def get_available_models(self) -> list[str]:
         return self.model_manager.get_available_models()
@@ -23,21 +39,67 @@ class WhisperService:
         return self.model_manager.get_model_status(model_name)
 
     def load_model(self, model_name: str) -> object:
+        if self.remote is not None:
+            self.remote.load_model(model_name)
+            return None
         return self.model_manager.load_model(model_name)
 
+    def load_audio(self, audio_file_path: str) -> np.ndarray:
+        """音声ファイルを16kHz モノラル float32にデコード（推論をワーカーに依頼する場合もAPIプロセスで行う）"""
+        return self.model_manager.load_audio(audio_file_path)
+
     def transcribe(
-        self, audio_file_path: str, model_name: str, language: str | None = None
+        self,
+        audio: str | np.ndarray,
+        model_name: str,
+        language: str | None = None,
+        profile: str | None = None,
+        timings: StageTimings | None = None,
+        priority: str = "interactive",
+        client: str = "",
+        cancel: Cancellation | None = None,
     ) -> dict:
         if language is None:
             language = settings.default_language
-        return self.model_manager.transcribe(audio_file_path, model_name, language)
+        if profile is None:
+            profile = settings.default_decoding_profile
+        engine = self.remote or self.model_manager
+        return engine.transcribe(
+            audio,
+            model_name,
+            language,
+            profile=profile,
+            timings=timings,
+            priority=priority,
+            client=client,
+            cancel=cancel,
+        )
 
     def create_streaming_service(
-        self, model_name: str, language: str | None = None
+        self,
+        model_name: str,
+        language: str | None = None,
+        profile: str | None = None,
+        revision_model: str | None = None,
+        client: str = "",
+        final_pass: str | None = None,
     ) -> StreamingTranscriptionService:
         if language is None:
             language = settings.default_language
-        return StreamingTranscriptionService(model_name, language)
+        if profile is None:
+            profile = settings.streaming_decoding_profile
+        if final_pass is None:
+            final_pass = settings.stream_final_pass
+        return StreamingTranscriptionService(
+            model_name,
+            language,
+            profile,
+            revision_model,
+            admission=_container.admission_controller,
+            remote=self.remote,
+            client=client,
+            final_pass=final_pass,
+        )
 
 
 class ServiceContainer:
@@ -45,6 +107,11 @@ class ServiceContainer:
 
     _instance = None
     _whisper_manager = None
+    _admission_controller = None
+    _remote_inference = None
+    _drain_controller = None
+    _rate_limiter = None
+    _stream_sessions = None
 
     def __new__(cls) -> "ServiceContainer":
         if cls._instance is None:
@@ -57,6 +124,64 @@ class ServiceContainer:
             self._whisper_manager = WhisperModelManager()
         return self._whisper_manager
 
+    @property
+    def admission_controller(self) -> AdmissionController:
+        if self._admission_controller is None:
+            self._admission_controller = AdmissionController(
+                settings.max_queue_depth, settings.max_pending_audio_seconds
+            )
+        return self._admission_controller
+
+    @property
+    def drain_controller(self) -> DrainController:
+        if self._drain_controller is None:
+            self._drain_controller = DrainController(
+                settings.drain_grace_seconds, settings.drain_retry_after
+            )
+        return self._drain_controller
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        if self._rate_limiter is None:
+            store = create_bucket_store(
+                settings.rate_limit_db if settings.rate_limit_rate > 0 else ""
+            )
+            self._rate_limiter = RateLimiter(
+                store,
+                settings.rate_limit_rate,
+                settings.rate_limit_burst,
+                parse_model_weights(settings.rate_limit_model_weights),
+                settings.rate_limit_key_header,
+            )
+        return self._rate_limiter
+
+    @property
+    def stream_sessions(self) -> StreamSessionStore:
+        if self._stream_sessions is None:
+            self._stream_sessions = StreamSessionStore(
+                settings.stream_session_grace_seconds, settings.workers
+            )
+        return self._stream_sessions
+
+    @property
+    def remote_inference(self) -> RemoteInferenceClient | None:
+        """INFERENCE_MODE=remote の場合の推論ワーカーへのクライアント"""
+        if settings.inference_mode != "remote":
+            return None
+        if self._remote_inference is None:
+            broker = create_broker(
+                settings.inference_broker_url,
+                settings.inference_broker_authkey.encode(),
+            )
+            # 状態の登録が数回途切れたワーカーには振り分けない
+            router = ModelRouter(
+                broker, heartbeat_timeout=settings.worker_heartbeat_interval * 5
+            )
+            self._remote_inference = RemoteInferenceClient(
+                broker, self.whisper_manager, settings.inference_timeout, router
+            )
+        return self._remote_inference
+
 
 # DIコンテナインスタンス
 _container = ServiceContainer()
@@ -64,8 +189,39 @@ _container = ServiceContainer()
 
 def get_whisper_service() -> WhisperService:
     """WhisperServiceのDI用ファクトリ関数"""
-    return WhisperService(_container.whisper_manager)
+    return WhisperService(_container.whisper_manager, _container.remote_inference)
 
 
 # 型ヒント付きDI
 WhisperServiceDep = Annotated[WhisperService, Depends(get_whisper_service)]
+
+
+def get_admission_controller() -> AdmissionController:
+    """AdmissionControllerのDI用ファクトリ関数"""
+    return _container.admission_controller
+
+
+AdmissionControllerDep = Annotated[
+    AdmissionController, Depends(get_admission_controller)
+]
+
+
+def get_drain_controller() -> DrainController:
+    """DrainControllerのDI用ファクトリ関数"""
+    return _container.drain_controller
+
+
+DrainControllerDep = Annotated[DrainController, Depends(get_drain_controller)]
+
+
+def get_rate_limiter() -> RateLimiter:
+    """RateLimiterのDI用ファクトリ関数"""
+    return _container.rate_limiter
+
+
+RateLimiterDep = Annotated[RateLimiter, Depends(get_rate_limiter)]
+
+
+def get_stream_sessions() -> StreamSessionStore:
+    """StreamSessionStoreの取得（WebSocketエンドポイント用）"""
+    return _container.stream_sessions
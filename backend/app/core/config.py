@@ -33,6 +33,101 @@ class Settings(BaseModel):
         "large-v2",
         "large-v3",
     ]
+    # カスタムモデルのファイルの更新を確認する間隔（秒、0は確認しない）
+    model_reload_interval: float = float(os.getenv("MODEL_RELOAD_INTERVAL", "5.0"))
+
+    # 音声デコードキャッシュ設定
+    audio_cache_enabled: bool = (
+        os.getenv("AUDIO_CACHE_ENABLED", "false").lower() == "true"
+    )
+    audio_cache_dir: Path = Path(os.getenv("AUDIO_CACHE_DIR", "cache/audio"))
+    audio_cache_max_bytes: int = int(
+        os.getenv("AUDIO_CACHE_MAX_BYTES", "1073741824")
+    )  # デフォルト1GB
+
+    # モデルレプリカ設定（同一モデルを並列に推論する数と、1推論あたりのスレッド数。0は自動）
+    model_replicas: int = int(os.getenv("MODEL_REPLICAS", "1"))
+    replica_threads: int = int(os.getenv("REPLICA_THREADS", "0"))
+
+    # CPU設定（ワーカー数はuvicornと同じWEB_CONCURRENCYから取得）
+    workers: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    torch_interop_threads: int = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+    cpu_affinity: str = os.getenv("CPU_AFFINITY", "none")
+
+    # クライアントごとの利用上限（APIキーまたはIPごと、base相当の音声秒数で計る）
+    # rate: 1秒あたりに使える音声秒数（0は無制限） / burst: まとめて使える音声秒数
+    rate_limit_rate: float = float(os.getenv("RATE_LIMIT_RATE", "0"))
+    rate_limit_burst: float = float(os.getenv("RATE_LIMIT_BURST", "3600"))
+    rate_limit_model_weights: str = os.getenv(
+        "RATE_LIMIT_MODEL_WEIGHTS",
+        "tiny=0.5,base=1,small=2,medium=4,large-v1=8,large-v2=8,large-v3=8",
+    )
+    rate_limit_key_header: str = os.getenv("RATE_LIMIT_KEY_HEADER", "X-API-Key")
+    # ワーカー間で残量を共有するファイル（空の場合はワーカーごとに数える）
+    rate_limit_db: str = os.getenv("RATE_LIMIT_DB", "/tmp/whisper-rate-limit.sqlite3")
+
+    # この秒数より長いアップロードは batch 優先度で処理する（0は自動で切り替えない）
+    batch_audio_seconds: float = float(os.getenv("BATCH_AUDIO_SECONDS", "600"))
+
+    # /transcribe の処理期限（秒）。クライアントは X-Request-Timeout ヘッダーか timeout で
+    # さらに短くできる（0は期限なし）
+    request_timeout_seconds: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "0"))
+
+    # 切断されたストリーミングセッションを再接続のために保持する秒数（0は保持しない）
+    stream_session_grace_seconds: float = float(
+        os.getenv("STREAM_SESSION_GRACE_SECONDS", "60")
+    )
+    # /stream-transcribe-mux の1接続で同時に扱えるストリーム数
+    mux_max_streams: int = int(os.getenv("MUX_MAX_STREAMS", "256"))
+    # 多重化接続のストリームごとに処理を待てるメッセージ数（超えたストリームは終了する）
+    mux_queue_max_items: int = int(os.getenv("MUX_QUEUE_MAX_ITEMS", "64"))
+    # ストリーミングの最終結果の作り方（chunk: 残りの音声のみ / full: セッション全体を
+    # 文字起こしし直す）。クライアントは final_pass で切り替えられる
+    stream_final_pass: str = os.getenv("STREAM_FINAL_PASS", "chunk")
+    # final_pass=full で保持する音声がこのバイト数を超えたら一時ファイルに書き出す
+    stream_final_spill_bytes: int = int(
+        os.getenv("STREAM_FINAL_SPILL_BYTES", "67108864")
+    )
+
+    # 推論の実行場所（local: APIプロセス内 / remote: ブローカー経由で推論ワーカーに依頼）
+    inference_mode: str = os.getenv("INFERENCE_MODE", "local")
+    inference_broker_url: str = os.getenv(
+        "INFERENCE_BROKER_URL", "unix:///tmp/whisper-inference/broker.sock"
+    )
+    # unix:// のキューの認証キー（既定値はなく、unix:// を使う場合は必須）
+    inference_broker_authkey: str = os.getenv("INFERENCE_BROKER_AUTHKEY", "")
+    inference_timeout: float = float(os.getenv("INFERENCE_TIMEOUT", "600"))
+    # 推論ワーカー1台あたりのロードするモデル数の上限（0は無制限）と状態の登録間隔（秒）
+    worker_max_models: int = int(os.getenv("WORKER_MAX_MODELS", "0"))
+    worker_heartbeat_interval: float = float(
+        os.getenv("WORKER_HEARTBEAT_INTERVAL", "2.0")
+    )
+
+    # デコード設定（fast / balanced / accurate）
+    default_decoding_profile: str = os.getenv("DEFAULT_DECODING_PROFILE", "balanced")
+    streaming_decoding_profile: str = os.getenv(
+        "STREAMING_DECODING_PROFILE", "balanced"
+    )
+
+    # 処理段階ごとの所要時間をServer-Timingヘッダーとレスポンスに含める
+    stage_timings_enabled: bool = (
+        os.getenv("STAGE_TIMINGS_ENABLED", "false").lower() == "true"
+    )
+
+    # 管理用プロファイラ設定（ADMIN_TOKENが未設定の場合は無効）
+    profiler_enabled: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    profiler_max_seconds: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+
+    # 受付制御設定（0は無制限）
+    max_queue_depth: int = int(os.getenv("MAX_QUEUE_DEPTH", "8"))
+    max_pending_audio_seconds: float = float(
+        os.getenv("MAX_PENDING_AUDIO_SECONDS", "1800")
+    )
+
+    # 停止時の処理（処理中のリクエストを待つ最大秒数と、拒否したリクエストへの再試行の目安）
+    drain_grace_seconds: float = float(os.getenv("DRAIN_GRACE_SECONDS", "30"))
+    drain_retry_after: int = int(os.getenv("DRAIN_RETRY_AFTER", "5"))
 
     # ストリーミング設定
     default_language: str = os.getenv("DEFAULT_LANGUAGE", "ja")
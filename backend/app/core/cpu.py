@@ -0,0 +1,201 @@
+import fcntl
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, TextIO
+
+import torch
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# none: 固定しない / worker: ワーカーごとに重ならないコアへ固定 /
+# replica: さらにワーカー内のレプリカごとにコアを分ける
+AFFINITY_MODES = ("none", "worker", "replica")
+
+# ワーカー番号を決めるためのロックファイルの置き場所
+SLOT_DIR = Path(tempfile.gettempdir()) / "whisper-cpu-slots"
+
+
+def available_cores() -> List[int]:
+    """このプロセスが使用できるCPUコア（cgroup や taskset の制限を反映）"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores: List[int], parts: int) -> List[List[int]]:
+    """コアを重ならない連続した組に分ける（余りは先頭の組から1つずつ配る）
+
+    組の数はコア数を超えない。
+    """
+    parts = max(1, min(parts, len(cores)))
+    size, extra = divmod(len(cores), parts)
+    groups = []
+    start = 0
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+class CpuConfig:
+    """ワーカープロセスのスレッド数とコア割り当て"""
+
+    def __init__(
+        self,
+        workers: int,
+        worker_index: int,
+        affinity: str,
+        cores: List[int],
+        intra_op_threads: int,
+        inter_op_threads: int,
+        replica_cores: List[List[int]] | None = None,
+    ):
+        self.workers = workers
+        self.worker_index = worker_index
+        self.affinity = affinity
+        self.cores = cores
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.replica_cores = replica_cores
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "worker_index": self.worker_index,
+            "affinity": self.affinity,
+            "cores": self.cores,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "replica_cores": self.replica_cores,
+            "torch_threads": torch.get_num_threads(),
+            "torch_interop_threads": torch.get_num_interop_threads(),
+        }
+
+
+def plan_cpu_config(
+    workers: int = 1,
+    replicas: int = 1,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+    affinity: str = "none",
+    worker_index: int = 0,
+    cores: List[int] | None = None,
+) -> CpuConfig:
+    """ワーカー数とレプリカ数から各推論のスレッド数とコアを決める
+
+    スレッド数が0の場合は、使用可能なコアをワーカーとレプリカで等分した数にする
+    （推論同士がコアを奪い合わないようにするため）。
+    """
+    if affinity not in AFFINITY_MODES:
+        raise ValueError(
+            f"Unknown CPU affinity mode: {affinity}. Available modes: {AFFINITY_MODES}"
+        )
+    workers = max(1, workers)
+    replicas = max(1, replicas)
+    if cores is None:
+        cores = available_cores()
+
+    if affinity == "none":
+        worker_cores = cores
+        budget = max(1, len(cores) // workers)
+    else:
+        groups = split_cores(cores, workers)
+        worker_cores = groups[worker_index % len(groups)]
+        budget = len(worker_cores)
+
+    replica_cores = None
+    if affinity == "replica":
+        replica_cores = split_cores(worker_cores, replicas)
+
+    return CpuConfig(
+        workers=workers,
+        worker_index=worker_index,
+        affinity=affinity,
+        cores=worker_cores,
+        intra_op_threads=intra_op_threads or max(1, budget // replicas),
+        inter_op_threads=inter_op_threads or 1,
+        replica_cores=replica_cores,
+    )
+
+
+# 取得したスロットのロックはプロセスの終了まで保持する
+_slot_file: TextIO | None = None
+
+
+def claim_worker_slot(workers: int, slot_dir: Path = SLOT_DIR) -> int:
+    """同じホストのワーカー間で重ならない番号を取得
+
+    uvicorn はワーカーに番号を渡さないため、番号ごとのロックファイルを
+    排他ロックできたものを自分の番号とする。ロックはプロセスの終了時に解放される。
+    空きがない場合（再起動の重なりなど）はPIDから決める。
+    """
+    global _slot_file
+    slot_dir.mkdir(parents=True, exist_ok=True)
+    for index in range(workers):
+        slot_file = open(slot_dir / f"slot-{index}.lock", "w")
+        try:
+            fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            slot_file.close()
+            continue
+        _slot_file = slot_file
+        return index
+    return os.getpid() % workers
+
+
+def _apply(config: CpuConfig) -> None:
+    torch.set_num_threads(config.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(config.inter_op_threads)
+    except RuntimeError:
+        # inter-op スレッド数は並列処理の開始後には変更できない
+        logger.warning("Inter-op thread count is already fixed and was not changed")
+    if config.affinity != "none" and hasattr(os, "sched_setaffinity"):
+        # 以降に作成されるスレッド（推論用スレッドを含む）はこの設定を引き継ぐ
+        os.sched_setaffinity(0, config.cores)
+
+
+_active: CpuConfig | None = None
+
+
+def configure_cpu() -> CpuConfig:
+    """設定からこのワーカーのCPU構成を決めて適用（ワーカーの起動時に1回呼ぶ）"""
+    global _active
+    worker_index = 0
+    if settings.cpu_affinity != "none" and settings.workers > 1:
+        worker_index = claim_worker_slot(settings.workers)
+    config = plan_cpu_config(
+        workers=settings.workers,
+        replicas=settings.model_replicas,
+        intra_op_threads=settings.replica_threads,
+        inter_op_threads=settings.torch_interop_threads,
+        affinity=settings.cpu_affinity,
+        worker_index=worker_index,
+    )
+    _apply(config)
+    logger.info(
+        f"CPU config: worker {config.worker_index}/{config.workers}, "
+        f"affinity={config.affinity}, cores={config.cores}, "
+        f"intra_op={config.intra_op_threads}, inter_op={config.inter_op_threads}"
+    )
+    _active = config
+    return config
+
+
+def active_cpu_config() -> CpuConfig:
+    """適用済みのCPU構成（未適用の場合は設定から求めた値。プロセスには適用しない）"""
+    if _active is not None:
+        return _active
+    return plan_cpu_config(
+        workers=settings.workers,
+        replicas=settings.model_replicas,
+        intra_op_threads=settings.replica_threads,
+        inter_op_threads=settings.torch_interop_threads,
+        affinity="none",
+    )
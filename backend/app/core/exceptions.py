@@ -31,6 +31,17 @@ class ModelLoadError(WhisperAppException):
         super().__init__(message, error_message)
 
 
+class InvalidDecodingProfileError(WhisperAppException):
+    """無効なデコードプロファイルエラー"""
+
+    def __init__(self, profile: str, available_profiles: List[str]):
+        self.profile = profile
+        self.available_profiles = available_profiles
+        message = f"Invalid decoding profile: {profile}"
+        details = f"Available profiles: {', '.join(available_profiles)}"
+        super().__init__(message, details)
+
+
 class AudioProcessingError(WhisperAppException):
     """音声処理エラー"""
 
@@ -52,6 +63,38 @@ class UnsupportedAudioFormatError(WhisperAppException):
         super().__init__(message, details)
 
 
+class ServiceBusyError(WhisperAppException):
+    """過負荷による受付拒否エラー"""
+
+    def __init__(self, retry_after: int, reason: str = "busy"):
+        self.retry_after = retry_after
+        self.reason = reason
+        message = "Server is busy, please retry later"
+        details = f"Retry after {retry_after} seconds"
+        super().__init__(message, details)
+
+
+class RateLimitExceededError(ServiceBusyError):
+    """クライアントごとの利用上限（音声の秒数）超過エラー"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after, reason="rate_limited")
+        self.message = "Rate limit exceeded, please retry later"
+
+
+class RequestCancelledError(WhisperAppException):
+    """期限切れ・クライアントの切断による打ち切りエラー"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        message = (
+            "Request deadline exceeded"
+            if reason == "deadline"
+            else "Request cancelled by client"
+        )
+        super().__init__(message, f"Cancelled before completion: {reason}")
+
+
 class FileTooLargeError(WhisperAppException):
     """ファイルサイズ超過エラー"""
 
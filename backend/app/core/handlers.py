@@ -4,10 +4,14 @@ from fastapi.responses import JSONResponse
 from .exceptions import (
     WhisperAppException,
     InvalidModelError,
+    InvalidDecodingProfileError,
     ModelLoadError,
     AudioProcessingError,
     UnsupportedAudioFormatError,
     FileTooLargeError,
+    ServiceBusyError,
+    RateLimitExceededError,
+    RequestCancelledError,
 )
 
 
@@ -41,6 +45,22 @@ async def invalid_model_error_handler(
     )
 
 
+async def invalid_decoding_profile_error_handler(
+    request: Request, exc: InvalidDecodingProfileError
+) -> JSONResponse:
+    """無効なデコードプロファイルエラーハンドラー"""
+    return JSONResponse(
+        status_code=400,
+        content={
+            "error": "invalid_decoding_profile",
+            "message": exc.message,
+            "details": exc.details,
+            "invalid_profile": exc.profile,
+            "available_profiles": exc.available_profiles,
+        },
+    )
+
+
 async def model_load_error_handler(
     request: Request, exc: ModelLoadError
 ) -> JSONResponse:
@@ -101,3 +121,49 @@ async def file_too_large_error_handler(
             "max_size": exc.max_size,
         },
     )
+
+
+async def service_busy_error_handler(
+    request: Request, exc: ServiceBusyError
+) -> JSONResponse:
+    """過負荷による受付拒否エラーハンドラー"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": exc.reason,
+            "message": exc.message,
+            "details": exc.details,
+            "retry_after": exc.retry_after,
+        },
+    )
+
+
+async def rate_limit_exceeded_error_handler(
+    request: Request, exc: RateLimitExceededError
+) -> JSONResponse:
+    """利用上限超過エラーハンドラー"""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "error": exc.reason,
+            "message": exc.message,
+            "details": exc.details,
+            "retry_after": exc.retry_after,
+        },
+    )
+
+
+async def request_cancelled_error_handler(
+    request: Request, exc: RequestCancelledError
+) -> JSONResponse:
+    """打ち切りエラーハンドラー（期限切れは504、クライアントの切断は499）"""
+    return JSONResponse(
+        status_code=504 if exc.reason == "deadline" else 499,
+        content={
+            "error": exc.reason,
+            "message": exc.message,
+            "details": exc.details,
+        },
+    )
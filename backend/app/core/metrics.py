@@ -0,0 +1,124 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# uvicorn --workers で複数プロセスを起動する場合は PROMETHEUS_MULTIPROC_DIR を設定する。
+# 各ワーカーの値はそのディレクトリのファイルに書き出され、/metrics で合算される。
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+REALTIME_FACTOR_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+# === リクエスト ===
+TRANSCRIBE_REQUESTS = Counter(
+    "whisper_transcribe_requests_total",
+    "Number of /transcribe requests",
+    ["model", "status"],
+)
+WEBSOCKET_SESSIONS = Counter(
+    "whisper_websocket_sessions_total",
+    "Number of accepted streaming sessions",
+    ["model"],
+)
+ACTIVE_WEBSOCKET_SESSIONS = Gauge(
+    "whisper_websocket_sessions_active",
+    "Number of open streaming sessions",
+    multiprocess_mode="livesum",
+)
+
+# === レイテンシ ===
+UPLOAD_READ_SECONDS = Histogram(
+    "whisper_upload_read_seconds",
+    "Time spent reading the uploaded file",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+AUDIO_DECODE_SECONDS = Histogram(
+    "whisper_audio_decode_seconds",
+    "Time spent decoding audio to 16kHz PCM",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+INFERENCE_SECONDS = Histogram(
+    "whisper_inference_seconds",
+    "Time spent computing log-mel and decoding, excluding the wait for the model",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "whisper_request_duration_seconds",
+    "Total /transcribe latency",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+REALTIME_FACTOR = Histogram(
+    "whisper_realtime_factor",
+    "Inference seconds per audio second",
+    ["model"],
+    buckets=REALTIME_FACTOR_BUCKETS,
+)
+STREAM_CHUNK_LAG_SECONDS = Histogram(
+    "whisper_stream_chunk_lag_seconds",
+    "Time from a streaming chunk being complete to its partial result being sent",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# === モデル ===
+MODEL_LOAD_SECONDS = Histogram(
+    "whisper_model_load_seconds",
+    "Time spent loading a model",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LOADED_MODELS = Gauge(
+    "whisper_loaded_models",
+    "Number of models loaded in memory",
+    multiprocess_mode="livesum",
+)
+LOADED_MODEL_BYTES = Gauge(
+    "whisper_loaded_model_bytes",
+    "Estimated parameter bytes of loaded models",
+    multiprocess_mode="livesum",
+)
+
+# === 推論キュー ===
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "whisper_inference_queue_depth",
+    "Admitted inference work, running or waiting",
+    multiprocess_mode="livesum",
+)
+INFERENCE_IN_PROGRESS = Gauge(
+    "whisper_inference_in_progress",
+    "Inference currently running on a model",
+    multiprocess_mode="livesum",
+)
+PENDING_AUDIO_SECONDS = Gauge(
+    "whisper_pending_audio_seconds",
+    "Seconds of admitted audio not yet transcribed",
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Prometheusテキスト形式のメトリクスとContent-Typeを取得"""
+    if MULTIPROC_DIR_ENV in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """終了するワーカーのlivesumゲージを集計対象から外す"""
+    if MULTIPROC_DIR_ENV in os.environ:
+        multiprocess.mark_process_dead(os.getpid())  # type: ignore[no-untyped-call]
@@ -0,0 +1,40 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimings:
+    """処理段階ごとの所要時間を記録
+
+    同じ段階を複数回計測した場合（窓ごとのエンコードなど）は合計する。
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def get(self, stage: str) -> float:
+        return self.seconds.get(stage, 0.0)
+
+    def as_milliseconds(self) -> Dict[str, float]:
+        """レスポンス用（ミリ秒、小数点以下1桁）"""
+        return {
+            stage: round(seconds * 1000, 1) for stage, seconds in self.seconds.items()
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値"""
+        return ", ".join(
+            f"{stage};dur={milliseconds}"
+            for stage, milliseconds in self.as_milliseconds().items()
+        )
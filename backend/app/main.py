@@ -1,26 +1,62 @@
+import asyncio
 import json
 import logging
+import os
+import secrets
+import struct
 import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Set
 
+import numpy as np
 from fastapi import (
     FastAPI,
     File,
     Form,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
     UploadFile,
     WebSocket,
     WebSocketDisconnect,
 )
+from pydantic import ValidationError
+from starlette.types import Message
+from whisper.audio import SAMPLE_RATE  # type: ignore
 
-from .api.dependencies import WhisperServiceDep
+from .api.dependencies import (
+    AdmissionControllerDep,
+    DrainControllerDep,
+    RateLimiterDep,
+    WhisperService,
+    WhisperServiceDep,
+    get_drain_controller,
+    get_rate_limiter,
+)
+from .core import metrics
 from .core.config import settings
+from .core.cpu import configure_cpu
 from .core.exceptions import (
     AudioProcessingError,
     FileTooLargeError,
+    InvalidDecodingProfileError,
     InvalidModelError,
     ModelLoadError,
+    RateLimitExceededError,
+    RequestCancelledError,
+    ServiceBusyError,
     UnsupportedAudioFormatError,
 )
+from .core.handlers import (
+    rate_limit_exceeded_error_handler,
+    request_cancelled_error_handler,
+    service_busy_error_handler,
+)
+from .core.timing import StageTimings
 from .schemas.schemas import (
+    AudioInfoMessage,
     ErrorMessage,
     FinalMessage,
     HealthResponse,
@@ -30,20 +66,51 @@ from .schemas.schemas import (
     ModelStatusResponse,
     PartialMessage,
     ReadyMessage,
+    RevisedMessage,
+    SegmentMessage,
+    StreamMessage,
     TranscriptionResponse,
     TranscriptionResult,
 )
+from .services.audio_codecs import PCM
+from .services.cancellation import Cancellation, effective_timeout, watch_disconnect
+from .services.decoding_profiles import DECODING_PROFILES
+from .services.profiler import ProfilerBusyError, format_collapsed, profiler
+from .services.rate_limit import RateLimiter
+from .services.streaming_service import (
+    FINAL_PASSES,
+    SegmentsCallback,
+    StreamingTranscriptionService,
+)
 from .utils.utils import AudioFileProcessor, validate_audio_format, validate_file_size
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # 推論スレッドが作成される前にスレッド数とコアの固定を適用する
+    configure_cpu()
+    # SIGTERMを受けたら処理中のリクエストを終えてから停止する
+    get_drain_controller().install_signal_handlers()
+    yield
+    metrics.mark_worker_dead()
+
+
 app = FastAPI(
     title=settings.app_name,
     description="音声ファイルを文字起こしするAPI",
     version=settings.version,
     debug=settings.debug,
+    lifespan=lifespan,
 )
 
+# 過負荷時はクライアントが再試行できるよう503 + Retry-Afterを返す
+app.add_exception_handler(ServiceBusyError, service_busy_error_handler)  # type: ignore[arg-type]
+# クライアントごとの利用上限を超えた場合は429 + Retry-After
+app.add_exception_handler(RateLimitExceededError, rate_limit_exceeded_error_handler)  # type: ignore[arg-type]
+# 期限までに推論を始められなかった場合は504、クライアントが切断した場合は499
+app.add_exception_handler(RequestCancelledError, request_cancelled_error_handler)  # type: ignore[arg-type]
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -51,6 +118,57 @@ async def health_check() -> HealthResponse:
     return HealthResponse(status="healthy")
 
 
+@app.get("/ready", response_model=HealthResponse)
+async def readiness_check(
+    response: Response, drain: DrainControllerDep
+) -> HealthResponse:
+    """新しいリクエストを受け付けられるか（停止処理中は503）"""
+    if drain.draining:
+        response.status_code = 503
+        return HealthResponse(status="draining")
+    return HealthResponse(status="ready")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheusテキスト形式のメトリクス（複数ワーカーの値を合算）"""
+    content, content_type = metrics.render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@app.post("/admin/profile", include_in_schema=False)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, description="計測時間（秒）"),
+    interval_ms: float = Query(5.0, ge=1, description="サンプリング間隔（ミリ秒）"),
+    x_admin_token: str | None = Header(None),
+) -> Response:
+    """このリクエストを受けたワーカーをサンプリングし、折りたたみ形式のスタックを返す"""
+    if not settings.profiler_enabled or not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, settings.admin_token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    duration = min(seconds, settings.profiler_max_seconds)
+    try:
+        samples = await asyncio.to_thread(
+            profiler.profile, duration, interval_ms / 1000
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    pid = os.getpid()
+    return Response(
+        content=format_collapsed(samples),
+        media_type="text/plain",
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{pid}.collapsed"',
+            "X-Worker-Pid": str(pid),
+        },
+    )
+
+
 @app.get("/models", response_model=ModelsResponse)
 async def get_available_models(whisper_service: WhisperServiceDep) -> ModelsResponse:
     return ModelsResponse(available_models=whisper_service.get_available_models())
@@ -108,12 +226,37 @@ async def load_model(
 
 @app.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_audio(
+    request: Request,
+    response: Response,
     whisper_service: WhisperServiceDep,
+    admission: AdmissionControllerDep,
+    drain: DrainControllerDep,
+    limiter: RateLimiterDep,
     file: UploadFile = File(..., description="音声ファイル (WAV, MP3, MP4, M4A, FLAC)"),
     model: str = Form(settings.default_model, description="使用するWhisperモデル"),
-    language: str = Form(settings.default_language, description="音声の言語コード"),
+    language: str = Form(
+        settings.default_language, description="音声の言語コード（autoで自動判定）"
+    ),
+    profile: str = Form(
+        settings.default_decoding_profile,
+        description="デコードプロファイル (fast, balanced, accurate)",
+    ),
+    priority: Literal["interactive", "batch"] = Form(
+        "interactive",
+        description="優先度（batch はストリーミングと interactive の後に処理する）",
+    ),
+    timeout: float | None = Form(
+        None, description="処理期限（秒）。過ぎると途中までの結果を返す"
+    ),
+    x_request_timeout: float | None = Header(None),
 ) -> TranscriptionResponse:
-    file_content = await file.read()
+    request_started = time.perf_counter()
+    cancel = Cancellation(
+        effective_timeout(settings.request_timeout_seconds, x_request_timeout, timeout)
+    )
+    timings = StageTimings()
+    with timings.measure("upload_read"):
+        file_content = await file.read()
     if not validate_file_size(len(file_content)):
         raise FileTooLargeError(len(file_content), settings.max_file_size)
 
@@ -125,119 +268,836 @@ async def transcribe_audio(
     if not whisper_service.is_valid_model(model):
         raise InvalidModelError(model, whisper_service.get_available_models())
 
+    if profile not in DECODING_PROFILES:
+        raise InvalidDecodingProfileError(profile, list(DECODING_PROFILES))
+
+    metrics.UPLOAD_READ_SECONDS.labels(model).observe(timings.get("upload_read"))
+    wav_seconds = AudioFileProcessor.wav_duration(file_content)
+    # WAV以外はデコードするまで長さが分からないため、受付判定にはサイズからの見積もりを使う
+    audio_seconds = AudioFileProcessor.estimate_duration(file_content)
+    client_key = limiter.client_key(request)
+    try:
+        drain.check()
+        # 過負荷の場合と残量を使い切っているクライアントの場合は、デコードする前に拒否する
+        admission.check(audio_seconds)
+        limiter.check(client_key)
+    except ServiceBusyError as e:
+        metrics.TRANSCRIBE_REQUESTS.labels(model, e.reason).inc()
+        raise
+
     temp_file_path = None
+    watcher = asyncio.create_task(watch_disconnect(request, cancel))
     try:
-        temp_file_path = AudioFileProcessor.save_uploaded_file(
-            file_content, suffix=".tmp"
-        )
+        # 停止処理はデコードと推論が終わるまで待つ
+        with drain.track():
+            with timings.measure("temp_write"):
+                temp_file_path = AudioFileProcessor.save_uploaded_file(
+                    file_content, suffix=".tmp"
+                )
 
-        transcription_result = whisper_service.transcribe(
-            str(temp_file_path), model, language
-        )
+            audio: str | np.ndarray = str(temp_file_path)
+            if wav_seconds is None:
+                # 実際の長さで受付判定と課金を行うため、先にデコードする
+                # （デコード結果はそのまま推論に使う）
+                cancel.check()
+                with timings.measure("audio_decode"):
+                    audio = await asyncio.to_thread(
+                        whisper_service.load_audio, str(temp_file_path)
+                    )
+                metrics.AUDIO_DECODE_SECONDS.labels(model).observe(
+                    timings.get("audio_decode")
+                )
+                audio_seconds = len(audio) / SAMPLE_RATE
+                cancel.check()
+            if (
+                settings.batch_audio_seconds
+                and audio_seconds > settings.batch_audio_seconds
+            ):
+                # 長い音声はバッチとして扱い、ライブのセッションを待たせない
+                priority = "batch"
+
+            with admission.admit(audio_seconds):
+                # 受け付けた場合だけ、音声の長さ × モデルの重みをクライアントの残量から引く
+                limiter.take(client_key, limiter.cost(audio_seconds, model))
+                # 推論はイベントループを塞がないようスレッドで実行する
+                transcription_result = await asyncio.to_thread(
+                    whisper_service.transcribe,
+                    audio,
+                    model,
+                    language,
+                    profile,
+                    timings,
+                    priority,
+                    client_key,
+                    cancel,
+                )
+
+        truncated = bool(transcription_result.get("truncated"))
+        total_seconds = time.perf_counter() - request_started
+        metrics.TRANSCRIBE_REQUESTS.labels(
+            model, "truncated" if truncated else "success"
+        ).inc()
+        metrics.REQUEST_SECONDS.labels(model).observe(total_seconds)
+
+        stage_timings = None
+        if settings.stage_timings_enabled:
+            timings.add("total", total_seconds)
+            stage_timings = timings.as_milliseconds()
+            response.headers["Server-Timing"] = timings.server_timing()
 
         return TranscriptionResponse(
             filename=file.filename or "unknown",
             content_type=file.content_type or "application/octet-stream",
             file_size=len(file_content),
             transcription=TranscriptionResult(**transcription_result),
-            status="completed",
+            status="truncated" if truncated else "completed",
+            timings=stage_timings,
         )
 
+    except (ServiceBusyError, RequestCancelledError) as e:
+        metrics.TRANSCRIBE_REQUESTS.labels(model, e.reason).inc()
+        raise
     except Exception as e:
         logger.error(f"Transcription failed: {str(e)}")
+        metrics.TRANSCRIBE_REQUESTS.labels(model, "error").inc()
         raise AudioProcessingError("transcription", str(e))
     finally:
+        watcher.cancel()
         if temp_file_path and temp_file_path.exists():
             temp_file_path.unlink()
 
 
+def stream_params_error(
+    whisper_service: WhisperService,
+    model: str,
+    revision_model: str | None,
+    profile: str,
+    final_pass: str,
+) -> str | None:
+    """ストリーミングのモデル・デコードプロファイル・最終パスが無効であればエラーメッセージを返す"""
+    if not whisper_service.is_valid_model(model):
+        return f"Invalid model: {model}. Available models: {whisper_service.get_available_models()}"
+    if revision_model is not None and not whisper_service.is_valid_model(
+        revision_model
+    ):
+        return f"Invalid revision model: {revision_model}. Available models: {whisper_service.get_available_models()}"
+    if profile not in DECODING_PROFILES:
+        return f"Invalid decoding profile: {profile}. Available profiles: {list(DECODING_PROFILES)}"
+    if final_pass not in FINAL_PASSES:
+        return f"Invalid final pass: {final_pass}. Available final passes: {list(FINAL_PASSES)}"
+    return None
+
+
+def rate_limit_message(e: RateLimitExceededError) -> ErrorMessage:
+    return ErrorMessage(
+        message=f"Rate limit exceeded, please retry after {e.retry_after} seconds",
+        code=e.reason,
+        retry_after=e.retry_after,
+    )
+
+
+def set_audio_format(
+    streaming_service: StreamingTranscriptionService, audio_info: Dict[str, Any]
+) -> ErrorMessage | None:
+    """audio_info の形式をセッションに設定する（未対応の形式はエラーメッセージを返す）"""
+    codec = audio_info.get("codec", PCM)
+    try:
+        # サンプルレート・チャンネル数・サンプル幅は範囲内の整数のみ受け付ける
+        info = AudioInfoMessage(
+            sample_rate=audio_info.get("sample_rate", settings.default_sample_rate),
+            channels=audio_info.get("channels", settings.default_channels),
+            sample_width=audio_info.get("sample_width", settings.default_sample_width),
+        )
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        return ErrorMessage(
+            message=f"Invalid audio_info {field}: {error['msg']}",
+            code="unsupported_format",
+        )
+    try:
+        streaming_service.set_audio_format(
+            info.sample_rate, info.channels, codec, info.sample_width
+        )
+    except UnsupportedAudioFormatError as e:
+        return ErrorMessage(
+            message=f"{e.message}. {e.details}",
+            code="unsupported_format" if codec == PCM else "unsupported_codec",
+        )
+    logger.info(
+        f"Audio info received: {info.sample_rate}Hz, {info.channels}ch, "
+        f"{info.sample_width * 8}-bit, codec={codec}"
+    )
+    return None
+
+
+def segment_messages(segments: List[Dict[str, Any]]) -> List[SegmentMessage]:
+    return [
+        SegmentMessage(
+            id=segment["id"],
+            start=segment["start"],
+            end=segment["end"],
+            text=segment["text"],
+        )
+        for segment in segments
+    ]
+
+
+async def final_transcription(
+    streaming_service: StreamingTranscriptionService,
+    remaining_data: bytes,
+    limiter: RateLimiter,
+    client_key: str,
+    on_segments: SegmentsCallback,
+) -> Dict[str, Any]:
+    """end を受け取ったときの最終結果
+
+    final_pass=full の場合はセッション全体を文字起こしし直す。その分の残量が
+    なければ、チャンクごとの結果をつなげた最終結果に切り替える。
+    """
+    if streaming_service.recording is not None:
+        audio_seconds = streaming_service.session_seconds
+        audio_seconds += streaming_service.audio_buffer.seconds(remaining_data)
+        try:
+            limiter.take(
+                client_key,
+                limiter.cost(audio_seconds, streaming_service.final_model),
+            )
+        except RateLimitExceededError:
+            logger.info("Rate limited full-session final pass, using chunk results")
+        else:
+            return await streaming_service.process_session_audio(
+                remaining_data, on_segments
+            )
+    return await streaming_service.process_final_audio(remaining_data)
+
+
+async def receive_unless_set(
+    websocket: WebSocket, *events: asyncio.Event
+) -> Message | None:
+    """次のメッセージを受信する（先にいずれかのイベントがセットされた場合は None）"""
+    receive = asyncio.ensure_future(websocket.receive())
+    waits = [asyncio.ensure_future(event.wait()) for event in events]
+    done, _ = await asyncio.wait({receive, *waits}, return_when=asyncio.FIRST_COMPLETED)
+    for wait in waits:
+        wait.cancel()
+    if receive in done:
+        return receive.result()
+    receive.cancel()
+    return None
+
+
 @app.websocket("/stream-transcribe")
 async def stream_transcribe(
     websocket: WebSocket,
     model: str = settings.default_model,
     language: str = settings.default_language,
+    profile: str = settings.streaming_decoding_profile,
+    revision_model: str | None = None,
+    session_id: str | None = None,
+    last_chunk_id: int = 0,
+    final_pass: str = settings.stream_final_pass,
 ) -> None:
     await websocket.accept()
 
     # WebSocketエンドポイントではFastAPIの依存性注入が使用できないため手動でサービスを取得
-    from .api.dependencies import get_whisper_service
+    from .api.dependencies import (
+        get_admission_controller,
+        get_stream_sessions,
+        get_whisper_service,
+    )
 
     whisper_service = get_whisper_service()
+    sessions = get_stream_sessions()
 
-    if not whisper_service.is_valid_model(model):
+    drain = get_drain_controller()
+    if drain.draining:
         error_msg = ErrorMessage(
-            message=f"Invalid model: {model}. Available models: {whisper_service.get_available_models()}"
+            message="Server is shutting down, please reconnect",
+            code="draining",
+            retry_after=drain.retry_after,
         )
         await websocket.send_text(error_msg.model_dump_json())
         await websocket.close()
         return
 
-    streaming_service = whisper_service.create_streaming_service(model, language)
+    limiter = get_rate_limiter()
+    if session_id is not None:
+        # 再接続: 保持しているセッションを元のモデル・クライアントのまま再開する
+        session = await sessions.attach(session_id)
+        if session is None:
+            error_msg = ErrorMessage(
+                message="Stream session not found or expired, please start a new session",
+                code="session_expired",
+            )
+            await websocket.send_text(error_msg.model_dump_json())
+            await websocket.close()
+            return
+        streaming_service = session.service
+        model = streaming_service.model_name
+        revision_model = streaming_service.revision_model
+        client_key = streaming_service.client
+    else:
+        admission = get_admission_controller()
+        if admission.is_overloaded():
+            retry_after = admission.retry_after()
+            error_msg = ErrorMessage(
+                message=f"Server is busy, please retry after {retry_after} seconds",
+                code="busy",
+                retry_after=retry_after,
+            )
+            await websocket.send_text(error_msg.model_dump_json())
+            await websocket.close()
+            return
 
-    ready_msg = ReadyMessage()
-    await websocket.send_text(ready_msg.model_dump_json())
+        invalid = stream_params_error(
+            whisper_service, model, revision_model, profile, final_pass
+        )
+        if invalid is not None:
+            error_msg = ErrorMessage(message=invalid)
+            await websocket.send_text(error_msg.model_dump_json())
+            await websocket.close()
+            return
 
+        client_key = limiter.client_key(websocket)
+        streaming_service = whisper_service.create_streaming_service(
+            model, language, profile, revision_model, client_key, final_pass
+        )
+        session = await sessions.create(streaming_service)
+
+    # 最初のチャンクを処理できる残量がなければセッションを始めない
     try:
-        while True:
-            message = await websocket.receive()
+        limiter.check(
+            client_key,
+            limiter.cost(
+                streaming_service.audio_buffer.chunk_duration, model, revision_model
+            ),
+        )
+    except RateLimitExceededError as e:
+        error_msg = rate_limit_message(e)
+        await websocket.send_text(error_msg.model_dump_json())
+        await websocket.close()
+        # 再開しようとしたセッションは残量が戻るまで保持する
+        if session_id is not None:
+            sessions.detach(session)
+        else:
+            sessions.close(session)
+        return
 
-            if message["type"] == "websocket.disconnect":
-                break
+    # 再文字起こし結果はバックグラウンドから送信されるため、送信を直列化する
+    send_lock = asyncio.Lock()
 
-            if message["type"] == "websocket.receive" and "bytes" in message:
-                audio_data = message["bytes"]
-                streaming_service.audio_buffer.add_data(audio_data)
+    async def send_revision(revised: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_text(RevisedMessage(**revised).model_dump_json())
 
-                chunk_data = streaming_service.audio_buffer.get_chunk_if_ready()
-                if chunk_data:
-                    partial_result = await streaming_service.process_audio_chunk(
-                        chunk_data
-                    )
-                    if partial_result:
-                        streaming_service.add_partial_text(partial_result["text"])
-                        partial_msg = PartialMessage(**partial_result)
+    async def send_segments(segments: List[Dict[str, Any]]) -> None:
+        async with send_lock:
+            for segment_msg in segment_messages(segments):
+                await websocket.send_text(segment_msg.model_dump_json())
+
+    def charge(pcm_data: bytes) -> None:
+        """処理する音声の秒数をクライアントの残量から引く（カスケード時は両モデル分）"""
+        audio_seconds = streaming_service.audio_buffer.seconds(pcm_data)
+        limiter.take(client_key, limiter.cost(audio_seconds, model, revision_model))
+
+    async def close_rate_limited(e: RateLimitExceededError) -> None:
+        """利用上限に達したら、ここまでの結果を final として送って閉じる"""
+        error_msg = rate_limit_message(e)
+        final_result = await streaming_service.process_final_audio(b"")
+        final_msg = FinalMessage(**final_result, reason=e.reason)
+        async with send_lock:
+            await websocket.send_text(error_msg.model_dump_json())
+            await websocket.send_text(final_msg.model_dump_json())
+        await websocket.close(code=1008)  # Policy Violation
+
+    # end・停止処理・利用上限で終了したセッションは破棄し、切断の場合は再接続に備えて残す
+    finished = False
+    metrics.ACTIVE_WEBSOCKET_SESSIONS.inc()
+    with drain.session() as drained:
+        try:
+            ready_msg = ReadyMessage(
+                session_id=session.id if sessions.enabled else None,
+                resumed=session_id is not None,
+                last_chunk_id=streaming_service.chunk_counter,
+                received_bytes=streaming_service.received_bytes,
+            )
+            async with send_lock:
+                await websocket.send_text(ready_msg.model_dump_json())
+                if session_id is None:
+                    metrics.WEBSOCKET_SESSIONS.labels(model).inc()
+                else:
+                    # 切断中に届かなかった部分結果と再文字起こし結果を送り直す
+                    for partial in streaming_service.partials_after(last_chunk_id):
+                        partial_msg = PartialMessage(**partial)
                         await websocket.send_text(partial_msg.model_dump_json())
+                missed = streaming_service.missed_revisions
+                streaming_service.missed_revisions = []
+                streaming_service.on_revision = send_revision
+                for revised in missed:
+                    revised_msg = RevisedMessage(**revised)
+                    await websocket.send_text(revised_msg.model_dump_json())
+
+            while True:
+                message = await receive_unless_set(
+                    websocket, drained, session.superseded
+                )
+
+                if message is None and not drained.is_set():
+                    # 同じセッションに別の接続から再接続された
+                    logger.info(f"Stream session {session.id} resumed elsewhere")
+                    break
 
-            elif message["type"] == "websocket.receive" and "text" in message:
-                try:
-                    control_msg = json.loads(message["text"])
-                    if control_msg.get("type") == "audio_info":
-                        sample_rate = control_msg.get(
-                            "sample_rate", settings.default_sample_rate
+                if message is None:
+                    # サーバーの停止処理: ここまでの結果を final として送って閉じる
+                    finished = True
+                    final_result = await streaming_service.process_final_audio(b"")
+                    final_msg = FinalMessage(**final_result, reason="draining")
+                    async with send_lock:
+                        await websocket.send_text(final_msg.model_dump_json())
+                    await websocket.close(code=1012)  # Service Restart
+                    break
+
+                if message["type"] == "websocket.disconnect":
+                    break
+
+                if message["type"] == "websocket.receive" and "bytes" in message:
+                    try:
+                        streaming_service.receive_audio(message["bytes"])
+                    except AudioProcessingError as e:
+                        error_msg = ErrorMessage(
+                            message=f"{e.message}: {e.details}", code="decode_error"
                         )
-                        streaming_service.audio_buffer.update_sample_rate(sample_rate)
-                        logger.info(f"Audio info received: {sample_rate}Hz")
+                        async with send_lock:
+                            await websocket.send_text(error_msg.model_dump_json())
+                        continue
 
-                    elif control_msg.get("type") == "end":
-                        remaining_data = (
-                            streaming_service.audio_buffer.get_remaining_data()
+                    chunk_data = streaming_service.audio_buffer.get_chunk_if_ready()
+                    if chunk_data:
+                        try:
+                            charge(chunk_data)
+                        except RateLimitExceededError as e:
+                            finished = True
+                            await close_rate_limited(e)
+                            break
+                        chunk_ready_at = time.perf_counter()
+                        partial_result = await streaming_service.process_audio_chunk(
+                            chunk_data
                         )
-                        final_result = await streaming_service.process_final_audio(
-                            remaining_data
+                        if partial_result:
+                            streaming_service.add_partial_text(
+                                partial_result["text"], partial_result["chunk_id"]
+                            )
+                            partial_msg = PartialMessage(**partial_result)
+                            async with send_lock:
+                                await websocket.send_text(partial_msg.model_dump_json())
+                            metrics.STREAM_CHUNK_LAG_SECONDS.labels(model).observe(
+                                time.perf_counter() - chunk_ready_at
+                            )
+
+                elif message["type"] == "websocket.receive" and "text" in message:
+                    try:
+                        control_msg = json.loads(message["text"])
+                        if control_msg.get("type") == "audio_info":
+                            format_error = set_audio_format(
+                                streaming_service, control_msg
+                            )
+                            if format_error is not None:
+                                async with send_lock:
+                                    await websocket.send_text(
+                                        format_error.model_dump_json()
+                                    )
+
+                        elif control_msg.get("type") == "end":
+                            finished = True
+                            remaining_data = streaming_service.take_remaining_audio()
+                            try:
+                                charge(remaining_data)
+                            except RateLimitExceededError as e:
+                                await close_rate_limited(e)
+                                break
+                            final_result = await final_transcription(
+                                streaming_service,
+                                remaining_data,
+                                limiter,
+                                client_key,
+                                send_segments,
+                            )
+
+                            final_msg = FinalMessage(**final_result)
+                            async with send_lock:
+                                await websocket.send_text(final_msg.model_dump_json())
+                            break
+
+                    except json.JSONDecodeError:
+                        error_msg = ErrorMessage(
+                            message="Invalid JSON in control message"
                         )
+                        await websocket.send_text(error_msg.model_dump_json())
 
-                        final_msg = FinalMessage(**final_result)
-                        await websocket.send_text(final_msg.model_dump_json())
-                        break
+        except WebSocketDisconnect:
+            logger.info("WebSocket connection disconnected")
+        except Exception as e:
+            logger.error(f"WebSocket error: {str(e)}")
+            error_msg = ErrorMessage(message=f"Server error: {str(e)}")
+            try:
+                await websocket.send_text(error_msg.model_dump_json())
+            except Exception:
+                pass
+        finally:
+            metrics.ACTIVE_WEBSOCKET_SESSIONS.dec()
+            if finished:
+                sessions.close(session)
+            else:
+                sessions.detach(session)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
 
-                except json.JSONDecodeError:
-                    error_msg = ErrorMessage(message="Invalid JSON in control message")
-                    await websocket.send_text(error_msg.model_dump_json())
 
-    except WebSocketDisconnect:
-        logger.info("WebSocket connection disconnected")
-    except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
-        error_msg = ErrorMessage(message=f"Server error: {str(e)}")
+# 多重化ストリーミングのバイナリフレームの先頭に付けるストリームID（ビッグエンディアン）
+MUX_HEADER = struct.Struct(">I")
+# ストリームの処理タスクに渡すもの（音声か制御メッセージ）
+MuxItem = bytes | Dict[str, Any]
+
+
+def mux_json(stream_id: int, message: StreamMessage) -> str:
+    """多重化接続で送るメッセージ（stream フィールドでストリームを示す）"""
+    return json.dumps(
+        {**message.model_dump(mode="json"), "stream": stream_id}, ensure_ascii=False
+    )
+
+
+@app.websocket("/stream-transcribe-mux")
+async def stream_transcribe_mux(websocket: WebSocket) -> None:
+    """1つの接続で複数のストリームを並行して文字起こしする
+
+    制御メッセージ（start / audio_info / end）は "stream" フィールドで対象の
+    ストリームを指定し、バイナリフレームは先頭4バイトのストリームIDに続けて
+    16-bit PCM を送る。ストリームごとに別のセッションとして処理し、
+    サーバーからのメッセージにも "stream" を付ける。
+    ストリームごとのキューは MUX_QUEUE_MAX_ITEMS までで、推論が追いつかずに
+    あふれたストリームは（接続の受信を止めず）エラーを送って終了する。
+    """
+    await websocket.accept()
+
+    from .api.dependencies import get_admission_controller, get_whisper_service
+
+    whisper_service = get_whisper_service()
+    admission = get_admission_controller()
+    limiter = get_rate_limiter()
+    client_key = limiter.client_key(websocket)
+
+    drain = get_drain_controller()
+    if drain.draining:
+        error_msg = ErrorMessage(
+            message="Server is shutting down, please reconnect",
+            code="draining",
+            retry_after=drain.retry_after,
+        )
+        await websocket.send_text(error_msg.model_dump_json())
+        await websocket.close()
+        return
+
+    # ストリームごとの処理タスクから並行して送信されるため、送信を直列化する
+    send_lock = asyncio.Lock()
+    streams: Dict[int, asyncio.Queue[MuxItem]] = {}
+    tasks: Set[asyncio.Task[None]] = set()
+
+    async def send(stream_id: int | None, message: StreamMessage) -> None:
+        text = (
+            message.model_dump_json()
+            if stream_id is None
+            else mux_json(stream_id, message)
+        )
+        async with send_lock:
+            await websocket.send_text(text)
+
+    def stop_stream(stream_id: int, item: MuxItem) -> None:
+        """ストリームの処理タスクに終了を伝え、以降のメッセージは受け付けない
+
+        キューが一杯の場合は未処理のメッセージをすべて破棄してから伝える。
+        """
+        queue = streams.pop(stream_id)
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+        queue.put_nowait(item)
+
+    def deliver(stream_id: int, item: MuxItem) -> None:
+        """ストリームの処理タスクにメッセージを渡す（あふれたらストリームを終了する）"""
         try:
-            await websocket.send_text(error_msg.model_dump_json())
-        except Exception:
-            pass
-    finally:
+            streams[stream_id].put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning(f"Stream {stream_id} queue is full, closing the stream")
+            stop_stream(stream_id, {"type": "overflow"})
+
+    async def run_stream(
+        stream_id: int,
+        streaming_service: StreamingTranscriptionService,
+        queue: asyncio.Queue[MuxItem],
+    ) -> None:
+        """1つのストリームの音声と制御メッセージを順に処理する"""
+        model = streaming_service.model_name
+        revision_model = streaming_service.revision_model
+
+        async def send_revision(revised: Dict[str, Any]) -> None:
+            await send(stream_id, RevisedMessage(**revised))
+
+        async def send_segments(segments: List[Dict[str, Any]]) -> None:
+            for segment_msg in segment_messages(segments):
+                await send(stream_id, segment_msg)
+
+        def charge(pcm_data: bytes) -> None:
+            audio_seconds = streaming_service.audio_buffer.seconds(pcm_data)
+            limiter.take(client_key, limiter.cost(audio_seconds, model, revision_model))
+
+        async def finish(pcm_data: bytes, reason: str | None = None) -> None:
+            final_result = await streaming_service.process_final_audio(pcm_data)
+            await send(stream_id, FinalMessage(**final_result, reason=reason))
+
+        streaming_service.on_revision = send_revision
+        metrics.WEBSOCKET_SESSIONS.labels(model).inc()
+        metrics.ACTIVE_WEBSOCKET_SESSIONS.inc()
         try:
-            await websocket.close()
-        except Exception:
-            pass
+            while True:
+                item = await queue.get()
+                if isinstance(item, bytes):
+                    try:
+                        streaming_service.receive_audio(item)
+                    except AudioProcessingError as e:
+                        await send(
+                            stream_id,
+                            ErrorMessage(
+                                message=f"{e.message}: {e.details}",
+                                code="decode_error",
+                            ),
+                        )
+                        continue
+                    while (
+                        chunk_data
+                        := streaming_service.audio_buffer.get_chunk_if_ready()
+                    ):
+                        try:
+                            charge(chunk_data)
+                        except RateLimitExceededError as e:
+                            # 利用上限に達したストリームだけを終了する
+                            await send(stream_id, rate_limit_message(e))
+                            await finish(b"", e.reason)
+                            return
+                        chunk_ready_at = time.perf_counter()
+                        partial_result = await streaming_service.process_audio_chunk(
+                            chunk_data
+                        )
+                        if partial_result:
+                            streaming_service.add_partial_text(
+                                partial_result["text"], partial_result["chunk_id"]
+                            )
+                            await send(stream_id, PartialMessage(**partial_result))
+                            metrics.STREAM_CHUNK_LAG_SECONDS.labels(model).observe(
+                                time.perf_counter() - chunk_ready_at
+                            )
+
+                elif item["type"] == "audio_info":
+                    format_error = set_audio_format(streaming_service, item)
+                    if format_error is not None:
+                        await send(stream_id, format_error)
+
+                elif item["type"] == "end":
+                    remaining_data = streaming_service.take_remaining_audio()
+                    try:
+                        charge(remaining_data)
+                    except RateLimitExceededError as e:
+                        await send(stream_id, rate_limit_message(e))
+                        await finish(b"", e.reason)
+                        return
+                    final_result = await final_transcription(
+                        streaming_service,
+                        remaining_data,
+                        limiter,
+                        client_key,
+                        send_segments,
+                    )
+                    await send(stream_id, FinalMessage(**final_result))
+                    return
+
+                elif item["type"] == "draining":
+                    await finish(b"", "draining")
+                    return
+
+                elif item["type"] == "overflow":
+                    await send(
+                        stream_id,
+                        ErrorMessage(
+                            message=f"Stream {stream_id} fell behind, "
+                            f"more than {settings.mux_queue_max_items} "
+                            "messages were pending",
+                            code="stream_overflow",
+                        ),
+                    )
+                    await finish(b"", "overflow")
+                    return
+
+        except Exception as e:
+            logger.error(f"Stream {stream_id} error: {str(e)}")
+            try:
+                await send(stream_id, ErrorMessage(message=f"Server error: {str(e)}"))
+            except Exception:
+                pass
+        finally:
+            metrics.ACTIVE_WEBSOCKET_SESSIONS.dec()
+            streaming_service.close()
+            if streams.get(stream_id) is queue:
+                del streams[stream_id]
+
+    async def start_stream(stream_id: int, control: Dict[str, Any]) -> None:
+        if stream_id in streams:
+            await send(
+                stream_id, ErrorMessage(message=f"Stream {stream_id} is already active")
+            )
+            return
+        if len(streams) >= settings.mux_max_streams:
+            await send(
+                stream_id,
+                ErrorMessage(
+                    message=f"Too many streams on this connection (max {settings.mux_max_streams})",
+                    code="too_many_streams",
+                ),
+            )
+            return
+        if admission.is_overloaded():
+            retry_after = admission.retry_after()
+            await send(
+                stream_id,
+                ErrorMessage(
+                    message=f"Server is busy, please retry after {retry_after} seconds",
+                    code="busy",
+                    retry_after=retry_after,
+                ),
+            )
+            return
+
+        model = control.get("model", settings.default_model)
+        language = control.get("language", settings.default_language)
+        profile = control.get("profile", settings.streaming_decoding_profile)
+        revision_model = control.get("revision_model")
+        final_pass = control.get("final_pass", settings.stream_final_pass)
+        invalid = stream_params_error(
+            whisper_service, model, revision_model, profile, final_pass
+        )
+        if invalid is not None:
+            await send(stream_id, ErrorMessage(message=invalid))
+            return
+
+        streaming_service = whisper_service.create_streaming_service(
+            model, language, profile, revision_model, client_key, final_pass
+        )
+        try:
+            limiter.check(
+                client_key,
+                limiter.cost(
+                    streaming_service.audio_buffer.chunk_duration, model, revision_model
+                ),
+            )
+        except RateLimitExceededError as e:
+            await send(stream_id, rate_limit_message(e))
+            return
+
+        await send(stream_id, ReadyMessage())
+        queue: asyncio.Queue[MuxItem] = asyncio.Queue(
+            maxsize=settings.mux_queue_max_items
+        )
+        streams[stream_id] = queue
+        task = asyncio.create_task(run_stream(stream_id, streaming_service, queue))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    with drain.session() as drained:
+        try:
+            while True:
+                message = await receive_unless_set(websocket, drained)
+
+                if message is None:
+                    # サーバーの停止処理: 各ストリームのここまでの結果を final として送って閉じる
+                    for stream_id in list(streams):
+                        stop_stream(stream_id, {"type": "draining"})
+                    await asyncio.gather(*tasks)
+                    await websocket.close(code=1012)  # Service Restart
+                    break
+
+                if message["type"] == "websocket.disconnect":
+                    break
+
+                if message["type"] == "websocket.receive" and "bytes" in message:
+                    frame = message["bytes"]
+                    if len(frame) < MUX_HEADER.size:
+                        await send(None, ErrorMessage(message="Frame has no stream id"))
+                        continue
+                    (stream_id,) = MUX_HEADER.unpack_from(frame)
+                    if stream_id not in streams:
+                        await send(
+                            stream_id,
+                            ErrorMessage(
+                                message=f"Unknown stream: {stream_id}",
+                                code="unknown_stream",
+                            ),
+                        )
+                        continue
+                    deliver(stream_id, frame[MUX_HEADER.size :])
+
+                elif message["type"] == "websocket.receive" and "text" in message:
+                    try:
+                        control_msg = json.loads(message["text"])
+                    except json.JSONDecodeError:
+                        error_msg = ErrorMessage(
+                            message="Invalid JSON in control message"
+                        )
+                        await send(None, error_msg)
+                        continue
+
+                    stream_id = control_msg.get("stream")
+                    if not isinstance(stream_id, int) or not (
+                        0 <= stream_id < 2 ** (8 * MUX_HEADER.size)
+                    ):
+                        error_msg = ErrorMessage(
+                            message="Control message requires a stream id"
+                        )
+                        await send(None, error_msg)
+                        continue
+
+                    control_type = control_msg.get("type")
+                    if control_type == "start":
+                        await start_stream(stream_id, control_msg)
+                    elif stream_id not in streams:
+                        await send(
+                            stream_id,
+                            ErrorMessage(
+                                message=f"Unknown stream: {stream_id}",
+                                code="unknown_stream",
+                            ),
+                        )
+                    elif control_type in ("audio_info", "end"):
+                        deliver(stream_id, control_msg)
+                        if control_type == "end" and stream_id in streams:
+                            # 終了処理中も同じIDで新しいストリームを始められる
+                            del streams[stream_id]
+
+        except WebSocketDisconnect:
+            logger.info("WebSocket connection disconnected")
+        except Exception as e:
+            logger.error(f"WebSocket error: {str(e)}")
+            try:
+                await send(None, ErrorMessage(message=f"Server error: {str(e)}"))
+            except Exception:
+                pass
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
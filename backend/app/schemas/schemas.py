@@ -15,8 +15,12 @@ class TranscriptionSegment(BaseModel):
 class TranscriptionResult(BaseModel):
     text: str
     language: str
+    language_probability: float | None = None
     segments: List[Dict[str, Any]]
     model_used: str
+    decoding_profile: str | None = None
+    # 期限切れ・切断で途中の30秒窓までしか処理していない
+    truncated: bool = False
 
 
 class TranscriptionResponse(BaseModel):
@@ -25,6 +29,7 @@ class TranscriptionResponse(BaseModel):
     file_size: int
     transcription: TranscriptionResult
     status: str
+    timings: Dict[str, float] | None = None  # 処理段階ごとの所要時間（ミリ秒）
 
 
 class ModelsResponse(BaseModel):
@@ -48,6 +53,15 @@ class ModelInfoResponse(BaseModel):
     file_path: str | None = None
     file_size: int | None = None
     last_modified: float | None = None
+    # ロード中の版（カスタムモデルはファイル内容のハッシュ）とロードした時刻・所要時間（秒）
+    version: str | None = None
+    loaded_at: float | None = None
+    load_time: float | None = None
+    # 更新されたファイルの新しい版をロード中かどうか
+    reloading: bool = False
+    replicas: int | None = None
+    # ワーカーのスレッド数とコア割り当て
+    cpu: Dict[str, Any] | None = None
     message: str | None = None
 
 
@@ -69,6 +83,14 @@ class StreamMessage(BaseModel):
 
 class ReadyMessage(StreamMessage):
     type: Literal["ready"] = "ready"
+    # 再接続に使うセッションID（セッションを保持しない設定の場合は None）
+    session_id: str | None = None
+    # 再接続で既存のセッションを再開した場合は True
+    resumed: bool = False
+    # 処理済みの最後のチャンク番号
+    last_chunk_id: int = 0
+    # セッションが受信済みの音声のバイト数（再開したクライアントはここから送り直す）
+    received_bytes: int = 0
 
 
 class PartialMessage(StreamMessage):
@@ -77,19 +99,52 @@ class PartialMessage(StreamMessage):
     start: float
     end: float
     chunk_id: int
+    decoding_profile: str | None = None
+    language: str | None = None
+    language_probability: float | None = None
+    timings: Dict[str, float] | None = (
+        None  # チャンク処理の段階ごとの所要時間（ミリ秒）
+    )
+
+
+class RevisedMessage(StreamMessage):
+    """カスケードモードで大きいモデルが再文字起こしした結果（同じchunk_idの部分結果を置き換える）"""
+
+    type: Literal["revised"] = "revised"
+    text: str
+    start: float
+    end: float
+    chunk_id: int
+    model_used: str
+
+
+class SegmentMessage(StreamMessage):
+    """final_pass=full でセッション全体を文字起こしし直す間、確定した順に届くセグメント"""
+
+    type: Literal["segment"] = "segment"
+    id: int
+    start: float
+    end: float
+    text: str
 
 
 class FinalMessage(StreamMessage):
     type: Literal["final"] = "final"
     text: str
     language: str
+    language_probability: float | None = None
     segments: List[Dict[str, Any]]
     model_used: str
+    decoding_profile: str | None = None
+    # サーバーの停止によりセッションを終了した場合は "draining"
+    reason: str | None = None
 
 
 class ErrorMessage(StreamMessage):
     type: Literal["error"] = "error"
     message: str
+    code: str | None = None
+    retry_after: int | None = None
 
 
 class EndMessage(StreamMessage):
@@ -98,6 +153,9 @@ class EndMessage(StreamMessage):
 
 class AudioInfoMessage(StreamMessage):
     type: Literal["audio_info"] = "audio_info"
-    sample_rate: int
-    channels: int
-    sample_width: int
+    sample_rate: int = Field(ge=8000, le=192000)
+    channels: int = Field(ge=1, le=8)
+    # 2: 16-bit整数 / 4: 32-bit浮動小数点（圧縮コーデックでは使わない）
+    sample_width: Literal[2, 4] = 2
+    # 音声の形式（pcm: 16-bit整数か32-bit浮動小数点のPCM / opus: 1メッセージ1パケットのOpus / flac: FLACフレーム）
+    codec: Literal["pcm", "opus", "flac"] = "pcm"
@@ -0,0 +1,123 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from ..core import metrics
+from ..core.exceptions import ServiceBusyError
+
+logger = logging.getLogger(__name__)
+
+# 処理時間/音声長（リアルタイム係数）の移動平均の重み
+RTF_SMOOTHING = 0.2
+
+
+class AdmissionController:
+    """推論キューの深さと未処理音声の秒数に基づく受付制御
+
+    新しい仕事（/transcribe、WebSocketセッション）はしきい値を超えていれば拒否し、
+    受付済みセッションのチャンクは拒否せずに負荷として計上だけする。
+    しきい値が0の項目は制限しない。
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int,
+        max_pending_audio_seconds: float,
+        initial_realtime_factor: float = 1.0,
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.max_pending_audio_seconds = max_pending_audio_seconds
+        self.realtime_factor = initial_realtime_factor
+        self.queue_depth = 0
+        self.pending_audio_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def is_overloaded(self, audio_seconds: float = 0.0) -> bool:
+        """新しい仕事を受け付けると上限を超えるかどうか"""
+        with self._lock:
+            return self._is_overloaded(audio_seconds)
+
+    def _is_overloaded(self, audio_seconds: float) -> bool:
+        # 何も処理していない時は上限より長い音声でも受け付ける
+        if self.max_queue_depth and self.queue_depth >= self.max_queue_depth:
+            return True
+        if (
+            self.max_pending_audio_seconds
+            and self.pending_audio_seconds > 0
+            and self.pending_audio_seconds + audio_seconds
+            > self.max_pending_audio_seconds
+        ):
+            return True
+        return False
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.pending_audio_seconds * self.realtime_factor))
+
+    def retry_after(self) -> int:
+        """未処理の音声を処理し終えるまでの推定秒数"""
+        with self._lock:
+            return self._retry_after()
+
+    def _busy_error(self) -> ServiceBusyError:
+        logger.warning(
+            f"Rejecting work: queue_depth={self.queue_depth}, "
+            f"pending_audio_seconds={self.pending_audio_seconds:.1f}"
+        )
+        return ServiceBusyError(self._retry_after())
+
+    def check(self, audio_seconds: float = 0.0) -> None:
+        """過負荷なら ServiceBusyError を送出"""
+        with self._lock:
+            if self._is_overloaded(audio_seconds):
+                raise self._busy_error()
+
+    @contextmanager
+    def admit(self, audio_seconds: float) -> Iterator[None]:
+        """受付判定を行い、処理が終わるまで負荷として計上する"""
+        with self._lock:
+            if self._is_overloaded(audio_seconds):
+                raise self._busy_error()
+            self._acquire(audio_seconds)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(audio_seconds, time.monotonic() - started)
+
+    @contextmanager
+    def track(self, audio_seconds: float) -> Iterator[None]:
+        """受付済みの仕事を拒否せずに負荷として計上する"""
+        with self._lock:
+            self._acquire(audio_seconds)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(audio_seconds, time.monotonic() - started)
+
+    def _acquire(self, audio_seconds: float) -> None:
+        self.queue_depth += 1
+        self.pending_audio_seconds += audio_seconds
+        self._update_metrics()
+
+    def _release(self, audio_seconds: float, elapsed: float) -> None:
+        with self._lock:
+            self.queue_depth -= 1
+            self.pending_audio_seconds = max(
+                0.0, self.pending_audio_seconds - audio_seconds
+            )
+            if audio_seconds > 0:
+                observed = elapsed / audio_seconds
+                self.realtime_factor += RTF_SMOOTHING * (
+                    observed - self.realtime_factor
+                )
+            self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        metrics.INFERENCE_QUEUE_DEPTH.set(self.queue_depth)
+        metrics.PENDING_AUDIO_SECONDS.set(self.pending_audio_seconds)
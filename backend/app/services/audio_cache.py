@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import whisper  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# 16-bit PCMと正規化float32の変換係数
+PCM_SCALE = 32768.0
+
+
+class AudioDecodeCache:
+    """デコード済み音声（16kHz モノラル）のディスクキャッシュ
+
+    アップロード内容のハッシュをキーに int16 PCM を .npy で保存し、
+    読み出し時はメモリマップする。合計サイズが上限を超えた場合は
+    最終アクセス時刻（mtime）の古いものから削除する（LRU）。
+    mtime をアクセス記録に使うため、複数ワーカー間でも同じ順序で追い出される。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int,
+        decoder: Callable[[str], np.ndarray] | None = None,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.decoder = decoder or whisper.load_audio
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def content_key(file_path: str | Path) -> str:
+        """ファイル内容のハッシュ値を取得"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def get(self, key: str) -> np.ndarray | None:
+        """キャッシュ済みのPCMを取得（メモリマップ）"""
+        entry = self._entry_path(key)
+        try:
+            pcm: np.ndarray = np.load(entry, mmap_mode="r")
+            os.utime(entry)  # LRU用にアクセス時刻を更新
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return pcm
+
+    def put(self, key: str, audio: np.ndarray) -> np.ndarray:
+        """正規化済み音声をint16 PCMとして保存"""
+        pcm = np.clip(np.round(audio * PCM_SCALE), -32768, 32767).astype(np.int16)
+        entry = self._entry_path(key)
+
+        # 書き込み途中のファイルを他プロセスが読まないよう一時ファイル経由で置き換える
+        fd, temp_name = tempfile.mkstemp(suffix=".npy.tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, pcm)
+            os.replace(temp_name, entry)
+        except Exception:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+        return pcm
+
+    def load(self, file_path: str | Path, key: str | None = None) -> np.ndarray:
+        """音声ファイルを16kHz モノラル float32 で取得（キャッシュがあればデコードを省略）"""
+        if key is None:
+            key = self.content_key(file_path)
+
+        pcm = self.get(key)
+        if pcm is None:
+            logger.info(f"Audio cache miss: {key[:12]}")
+            audio = self.decoder(str(file_path))
+            try:
+                self.put(key, audio)
+            except OSError as e:
+                logger.warning(f"Failed to write audio cache entry: {str(e)}")
+            return audio
+
+        logger.info(f"Audio cache hit: {key[:12]}")
+        return pcm.astype(np.float32) / PCM_SCALE
+
+    def total_bytes(self) -> int:
+        """キャッシュの合計サイズ"""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self) -> list[Path]:
+        return [entry for entry in self.cache_dir.glob("*.npy") if entry.is_file()]
+
+    def evict(self) -> None:
+        """合計サイズが上限以下になるまで古いエントリを削除"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            logger.info(f"Audio cache evicted: {entry.name}")
@@ -0,0 +1,138 @@
+"""ストリーミング入力の圧縮音声（Opus / FLAC）の逐次デコード
+
+デコードには PyAV（avパッケージ）を使う。avがインストールされていない場合は
+PCM（16-bit リトルエンディアン）のみ受け付ける。
+"""
+
+import io
+import logging
+from typing import Any, List
+
+from ..core.exceptions import AudioProcessingError, UnsupportedAudioFormatError
+
+logger = logging.getLogger(__name__)
+
+PCM = "pcm"
+# 圧縮コーデックと PyAV のデコーダー名
+COMPRESSED_CODECS = {"opus": "opus", "flac": "flac"}
+# デコード結果のサンプルレート（Whisper の入力と同じ）
+DECODED_SAMPLE_RATE = 16000
+# FLACストリームの先頭の4バイト
+FLAC_MARKER = b"fLaC"
+
+
+def _import_av() -> Any:
+    try:
+        import av  # type: ignore
+    except ImportError:
+        return None
+    return av
+
+
+def available_codecs() -> List[str]:
+    """この環境で受け付けるコーデック"""
+    if _import_av() is None:
+        return [PCM]
+    return [PCM, *COMPRESSED_CODECS]
+
+
+def flac_header_length(data: bytes) -> int | None:
+    """FLACストリームの先頭（"fLaC" とメタデータブロック）の長さ
+
+    メタデータブロックがまだ揃っていなければ None を返す。
+    """
+    if data[:4] != FLAC_MARKER[: len(data)]:
+        raise AudioProcessingError("flac decoding", "Stream does not start with fLaC")
+    position = len(FLAC_MARKER)
+    while position + 4 <= len(data):
+        last = data[position] & 0x80
+        position += 4 + int.from_bytes(data[position + 1 : position + 4], "big")
+        if last:
+            return position if position <= len(data) else None
+    return None
+
+
+class StreamDecoder:
+    """1セッション分の圧縮音声を、届いた順にデコードし続ける
+
+    一時ファイルや外部プロセスは使わず、デコーダーの状態をセッションの間保持する。
+    FLAC は "fLaC" とメタデータブロックから始まるストリームを任意の位置で区切って
+    送ってよい。届いた分をデマルチプレクサでフレームに区切り、途中で切れている
+    可能性のある最後のフレームは次のデータが届くまで保持する。
+    Opus はコンテナを使わず、1つのバイナリメッセージに1つのパケットを入れて送る。
+    出力は 16kHz モノラルの 16-bit PCM。
+    """
+
+    def __init__(self, codec: str, sample_rate: int, channels: int = 1):
+        av = _import_av()
+        if codec not in COMPRESSED_CODECS or av is None:
+            raise UnsupportedAudioFormatError(codec, available_codecs())
+        self.codec = codec
+        self._av = av
+        self.context = av.CodecContext.create(COMPRESSED_CODECS[codec], "r")
+        if codec == "opus":
+            # Opus のパケットにはチャンネル数とサンプルレートが含まれないため宣言に従う
+            self.context.sample_rate = sample_rate
+            self.context.layout = "mono" if channels == 1 else "stereo"
+        self.resampler = av.AudioResampler(
+            format="s16", layout="mono", rate=DECODED_SAMPLE_RATE
+        )
+        # FLAC のストリームの先頭と、まだデコードしていないフレームのバイト列
+        self._flac_header: bytes | None = None
+        self._pending = b""
+
+    def _flac_packets(self, data: bytes | None) -> List[Any]:
+        """届いた分のうち、続きが届いて完全だと分かったフレーム（None で残りすべて）"""
+        if data is not None:
+            self._pending += data
+        if self._flac_header is None:
+            header_length = flac_header_length(self._pending)
+            if header_length is None:
+                return []
+            self._flac_header = self._pending[:header_length]
+            self._pending = self._pending[header_length:]
+            # STREAMINFO（最初のメタデータブロックの本体）をデコーダーに渡す
+            self.context.extradata = self._flac_header[8:42]
+
+        header = self._flac_header
+        with self._av.open(
+            io.BytesIO(header + self._pending), format="flac"
+        ) as demuxer:
+            packets = [
+                packet
+                for packet in demuxer.demux(demuxer.streams.audio[0])
+                if packet.size
+            ]
+        if data is None:
+            self._pending = b""
+        elif packets:
+            last = packets.pop()
+            self._pending = self._pending[last.pos - len(header) :]
+        return [self._av.Packet(bytes(packet)) for packet in packets] + (
+            [None] if data is None else []
+        )
+
+    def _packets(self, data: bytes | None) -> List[Any]:
+        if self.codec == "flac":
+            return self._flac_packets(data)
+        if data is None:
+            return [None]
+        return [self._av.Packet(data)]
+
+    def decode(self, data: bytes | None) -> bytes:
+        """届いたバイト列をデコードする（None でデコーダーに残っている分を出力する）"""
+        pcm = bytearray()
+        try:
+            for packet in self._packets(data):
+                for frame in self.context.decode(packet):
+                    for resampled in self.resampler.resample(frame):
+                        pcm.extend(resampled.to_ndarray().tobytes())
+            if data is None:
+                for resampled in self.resampler.resample(None):
+                    pcm.extend(resampled.to_ndarray().tobytes())
+        except self._av.error.FFmpegError as e:
+            raise AudioProcessingError(f"{self.codec} decoding", str(e))
+        return bytes(pcm)
+
+    def flush(self) -> bytes:
+        return self.decode(None)
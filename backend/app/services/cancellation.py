@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from ..core.exceptions import RequestCancelledError
+
+# 打ち切りの理由
+DEADLINE = "deadline"
+DISCONNECTED = "disconnected"
+
+# クライアントの切断を確認する間隔（秒）
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class Cancellation:
+    """リクエストの期限とクライアントの切断による推論の打ち切り
+
+    推論スレッドは30秒窓の区切りで reason を確認し、打ち切られていれば
+    そこまでの結果を返す。順番待ちの間に打ち切られた仕事は開始しない。
+    """
+
+    def __init__(self, timeout: float | None = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._reason: str | None = None
+
+    @classmethod
+    def until(cls, deadline: float) -> "Cancellation":
+        """壁時計の時刻（time.time()）を期限にする（別プロセスに期限を渡す場合）"""
+        return cls(max(deadline - time.time(), 1e-9))
+
+    def cancel(self, reason: str = DISCONNECTED) -> None:
+        if self._reason is None:
+            self._reason = reason
+
+    def remaining(self) -> float | None:
+        """期限までの秒数（期限がなければ None）"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    @property
+    def reason(self) -> str | None:
+        """打ち切られていればその理由（deadline / disconnected）"""
+        if self._reason is None:
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                self._reason = DEADLINE
+        return self._reason
+
+    def check(self) -> None:
+        """打ち切られていれば RequestCancelledError を送出"""
+        reason = self.reason
+        if reason is not None:
+            raise RequestCancelledError(reason)
+
+
+def effective_timeout(*timeouts: float | None) -> float | None:
+    """指定されたタイムアウト（0以下と None は指定なし）のうち最も短いもの"""
+    positive = [timeout for timeout in timeouts if timeout and timeout > 0]
+    return min(positive) if positive else None
+
+
+async def watch_disconnect(
+    request: Request,
+    cancel: Cancellation,
+    interval: float = DISCONNECT_POLL_SECONDS,
+) -> None:
+    """クライアントが切断したら cancel を打ち切る（タスクとして実行し、応答後に止める）"""
+    while cancel.reason is None:
+        if await request.is_disconnected():
+            cancel.cancel(DISCONNECTED)
+            return
+        await asyncio.sleep(interval)
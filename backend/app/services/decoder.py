@@ -0,0 +1,287 @@
+import logging
+from typing import Any, Callable, Dict, List
+
+import torch
+from whisper.audio import (  # type: ignore
+    HOP_LENGTH,
+    N_FRAMES,
+    SAMPLE_RATE,
+    pad_or_trim,
+)
+from whisper.decoding import DecodingOptions, DecodingResult  # type: ignore
+from whisper.tokenizer import get_tokenizer  # type: ignore
+from whisper.utils import exact_div  # type: ignore
+
+from ..core.timing import StageTimings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def encode_window(model: Any, mel_segment: torch.Tensor) -> torch.Tensor:
+    """30秒窓のlog-melをエンコード（shape = (n_audio_ctx, n_audio_state)）
+
+    decode / detect_language はエンコード済み特徴量を受け取るとエンコーダーを省略するため、
+    同じ窓の言語判定と温度フォールバックの再デコードで1回の計算を共有できる。
+    """
+    with torch.no_grad():
+        features: torch.Tensor = model.embed_audio(mel_segment.unsqueeze(0))[0]
+    return features
+
+
+def detect_language(model: Any, audio_features: torch.Tensor) -> tuple[str, float]:
+    """エンコード済みの窓から言語を判定し、言語コードと確率を返す"""
+    if not model.is_multilingual:
+        return "en", 1.0
+    _, probs = model.detect_language(audio_features)
+    language = max(probs, key=probs.get)
+    return language, float(probs[language])
+
+
+def transcribe_mel(
+    model: Any,
+    mel: torch.Tensor,
+    *,
+    language: str | None = None,
+    temperature: float | tuple[float, ...] = DEFAULT_TEMPERATURES,
+    compression_ratio_threshold: float | None = 2.4,
+    logprob_threshold: float | None = -1.0,
+    no_speech_threshold: float | None = 0.6,
+    condition_on_previous_text: bool = True,
+    initial_prompt: str | None = None,
+    timings: StageTimings | None = None,
+    checkpoint: Callable[[float], Any] | None = None,
+    on_segments: Callable[[List[Dict[str, Any]]], None] | None = None,
+    **decode_options: Any,
+) -> Dict[str, Any]:
+    """計算済みlog-melを30秒窓ごとにデコード
+
+    whisper.transcribe の窓ループと同じ処理を、音声ではなくlog-mel
+    （shape = (n_mels, 内容フレーム数)、無音パディングなし）を入力として行う。
+    language が None の場合は先頭窓から1回だけ言語を判定する。
+    単語タイムスタンプ・クリップ指定・ハルシネーション対策には対応しない。
+    timings を渡すとエンコード（encode）とデコード（decode）の時間を窓ごとに加算する。
+    checkpoint は2つ目以降の窓の前に窓の秒数を渡して呼び出し、返されたモデル
+    （同じ重みのレプリカ）で続きを処理する。優先度の高い仕事に譲るために使う。
+    checkpoint が None を返した場合はそこで打ち切り、それまでの結果を
+    truncated=True として返す（期限切れや切断）。
+    on_segments は窓ごとに、その窓で確定したセグメントを渡して呼び出す。
+    """
+    if timings is None:
+        timings = StageTimings()
+
+    dtype = torch.float32
+    if model.device != torch.device("cpu") and decode_options.get("fp16", True):
+        dtype = torch.float16
+    decode_options["fp16"] = dtype == torch.float16
+
+    content_frames = mel.shape[-1]
+
+    def window_features(seek: int, segment_size: int) -> torch.Tensor:
+        mel_segment = mel[:, seek : seek + segment_size]
+        mel_segment = pad_or_trim(mel_segment, N_FRAMES).to(model.device).to(dtype)
+        with timings.measure("encode"):
+            return encode_window(model, mel_segment)
+
+    # 言語判定に使った先頭窓の特徴量はデコードでも再利用する
+    first_window: torch.Tensor | None = None
+    language_probability: float | None = None
+    if language is None:
+        first_window = window_features(0, min(N_FRAMES, content_frames))
+        with timings.measure("decode"):
+            language, language_probability = detect_language(model, first_window)
+
+    task: str = decode_options.get("task", "transcribe")
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=language,
+        task=task,
+    )
+
+    def decode_with_fallback(segment: torch.Tensor) -> DecodingResult:
+        temperatures = (
+            [temperature] if isinstance(temperature, (int, float)) else temperature
+        )
+        decode_result = None
+
+        for t in temperatures:
+            kwargs = {**decode_options}
+            if t > 0:
+                kwargs.pop("beam_size", None)
+                kwargs.pop("patience", None)
+            else:
+                kwargs.pop("best_of", None)
+
+            options = DecodingOptions(**kwargs, language=language, temperature=t)
+            decode_result = model.decode(segment, options)
+
+            needs_fallback = False
+            if (
+                compression_ratio_threshold is not None
+                and decode_result.compression_ratio > compression_ratio_threshold
+            ):
+                needs_fallback = True  # 繰り返しが多すぎる
+            if (
+                logprob_threshold is not None
+                and decode_result.avg_logprob < logprob_threshold
+            ):
+                needs_fallback = True  # 平均対数確率が低すぎる
+            if (
+                no_speech_threshold is not None
+                and decode_result.no_speech_prob > no_speech_threshold
+                and logprob_threshold is not None
+                and decode_result.avg_logprob < logprob_threshold
+            ):
+                needs_fallback = False  # 無音
+            if not needs_fallback:
+                break
+
+        return decode_result
+
+    seek = 0
+    input_stride = exact_div(N_FRAMES, model.dims.n_audio_ctx)
+    time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+    all_tokens: List[int] = []
+    all_segments: List[Dict[str, Any]] = []
+    prompt_reset_since = 0
+    truncated = False
+
+    if initial_prompt is not None:
+        initial_prompt_tokens = tokenizer.encode(" " + initial_prompt.strip())
+        all_tokens.extend(initial_prompt_tokens)
+    else:
+        initial_prompt_tokens = []
+
+    def new_segment(
+        *, start: float, end: float, tokens: torch.Tensor, result: DecodingResult
+    ) -> Dict[str, Any]:
+        token_list = tokens.tolist()
+        text_tokens = [token for token in token_list if token < tokenizer.eot]
+        return {
+            "seek": seek,
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode(text_tokens),
+            "tokens": token_list,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+
+    while seek < content_frames:
+        time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
+        segment_size = min(N_FRAMES, content_frames - seek)
+        segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        if checkpoint is not None and seek > 0:
+            model = checkpoint(segment_duration)
+            if model is None:
+                truncated = True
+                break
+        if seek == 0 and first_window is not None:
+            audio_features = first_window
+        else:
+            audio_features = window_features(seek, segment_size)
+
+        decode_options["prompt"] = all_tokens[prompt_reset_since:]
+        with timings.measure("decode"):
+            result = decode_with_fallback(audio_features)
+        tokens = torch.tensor(result.tokens)
+
+        if no_speech_threshold is not None:
+            should_skip = result.no_speech_prob > no_speech_threshold
+            if logprob_threshold is not None and result.avg_logprob > logprob_threshold:
+                should_skip = False
+
+            if should_skip:
+                seek += segment_size  # 次の窓の先頭まで進める
+                continue
+
+        current_segments = []
+
+        timestamp_tokens: torch.Tensor = tokens.ge(tokenizer.timestamp_begin)
+        single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+
+        consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+        consecutive.add_(1)
+        if len(consecutive) > 0:
+            # タイムスタンプトークンが連続する位置でセグメントを区切る
+            slices = consecutive.tolist()
+            if single_timestamp_ending:
+                slices.append(len(tokens))
+
+            last_slice = 0
+            for current_slice in slices:
+                sliced_tokens = tokens[last_slice:current_slice]
+                start_timestamp_pos = (
+                    sliced_tokens[0].item() - tokenizer.timestamp_begin
+                )
+                end_timestamp_pos = sliced_tokens[-1].item() - tokenizer.timestamp_begin
+                current_segments.append(
+                    new_segment(
+                        start=time_offset + start_timestamp_pos * time_precision,
+                        end=time_offset + end_timestamp_pos * time_precision,
+                        tokens=sliced_tokens,
+                        result=result,
+                    )
+                )
+                last_slice = current_slice
+
+            if single_timestamp_ending:
+                seek += segment_size
+            else:
+                # 未完了のセグメントは捨て、最後のタイムスタンプから再開する
+                last_timestamp_pos = (
+                    tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+                )
+                seek += last_timestamp_pos * input_stride
+        else:
+            duration = segment_duration
+            timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+            if (
+                len(timestamps) > 0
+                and timestamps[-1].item() != tokenizer.timestamp_begin
+            ):
+                last_timestamp_pos = timestamps[-1].item() - tokenizer.timestamp_begin
+                duration = last_timestamp_pos * time_precision
+
+            current_segments.append(
+                new_segment(
+                    start=time_offset,
+                    end=time_offset + duration,
+                    tokens=tokens,
+                    result=result,
+                )
+            )
+            seek += segment_size
+
+        # 長さゼロまたは空テキストのセグメントは内容を消す
+        for segment in current_segments:
+            if segment["start"] == segment["end"] or segment["text"].strip() == "":
+                segment["text"] = ""
+                segment["tokens"] = []
+
+        new_segments = [
+            {"id": i, **segment}
+            for i, segment in enumerate(current_segments, start=len(all_segments))
+        ]
+        all_segments.extend(new_segments)
+        if on_segments is not None and new_segments:
+            on_segments(new_segments)
+        all_tokens.extend(
+            [token for segment in current_segments for token in segment["tokens"]]
+        )
+
+        if not condition_on_previous_text or result.temperature > 0.5:
+            # 高い温度で得た出力は次の窓のプロンプトに使わない
+            prompt_reset_since = len(all_tokens)
+
+    return {
+        "text": tokenizer.decode(all_tokens[len(initial_prompt_tokens) :]),
+        "segments": all_segments,
+        "language": language,
+        "language_probability": language_probability,
+        "truncated": truncated,
+    }
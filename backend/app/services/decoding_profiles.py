@@ -0,0 +1,60 @@
+from typing import Any, Dict
+
+from pydantic import BaseModel
+
+from .decoder import DEFAULT_TEMPERATURES
+
+
+class DecodingProfile(BaseModel):
+    """デコード設定のプリセット"""
+
+    name: str
+    description: str
+    beam_size: int | None = None
+    best_of: int | None = None
+    temperature: tuple[float, ...] = DEFAULT_TEMPERATURES
+    compression_ratio_threshold: float | None = 2.4
+    logprob_threshold: float | None = -1.0
+    no_speech_threshold: float | None = 0.6
+    condition_on_previous_text: bool = True
+    without_timestamps: bool = False
+
+    def decode_options(self) -> Dict[str, Any]:
+        """transcribe_mel に渡すキーワード引数"""
+        options = self.model_dump(exclude={"name", "description"})
+        for key in ("beam_size", "best_of"):
+            if options[key] is None:
+                options.pop(key)
+        return options
+
+
+DECODING_PROFILES: Dict[str, DecodingProfile] = {
+    "fast": DecodingProfile(
+        name="fast",
+        description="貪欲法の1パスのみ。再デコードなしで処理時間が音声長にほぼ比例する",
+        temperature=(0.0,),
+        compression_ratio_threshold=None,
+        logprob_threshold=None,
+        condition_on_previous_text=False,
+        without_timestamps=True,
+    ),
+    "balanced": DecodingProfile(
+        name="balanced",
+        description="Whisperの標準設定（貪欲法 + 温度フォールバック）",
+    ),
+    "accurate": DecodingProfile(
+        name="accurate",
+        description="ビームサーチ（beam_size=5, best_of=5）+ 温度フォールバック",
+        beam_size=5,
+        best_of=5,
+    ),
+}
+
+
+def get_decoding_profile(name: str) -> DecodingProfile:
+    """名前からデコードプロファイルを取得"""
+    if name not in DECODING_PROFILES:
+        raise ValueError(
+            f"Invalid decoding profile: {name}. Available profiles: {list(DECODING_PROFILES)}"
+        )
+    return DECODING_PROFILES[name]
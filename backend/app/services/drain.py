@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from types import FrameType
+from typing import Any, Callable, Iterator, Set
+
+from ..core.exceptions import ServiceBusyError
+
+logger = logging.getLogger(__name__)
+
+
+class DrainController:
+    """停止・再デプロイ時に処理中のリクエストを終えてから停止する
+
+    SIGTERM を受け取ると準備未完了（/ready が503）に切り替え、新しいリクエストを
+    Retry-After 付きで拒否する。処理中の /transcribe は grace_seconds まで完了を待ち、
+    ストリーミングのセッションにはそこまでの結果を final として送って閉じさせる。
+    その後、元のシグナルハンドラー（uvicorn の停止処理）を呼び出す。
+    """
+
+    def __init__(self, grace_seconds: float = 30.0, retry_after: int = 5):
+        self.grace_seconds = grace_seconds
+        self.retry_after = retry_after
+        self.draining = False
+        self._in_flight = 0
+        self._sessions: Set[asyncio.Event] = set()
+        self._drain_task: asyncio.Task[None] | None = None
+
+    @property
+    def in_flight(self) -> int:
+        """処理中の /transcribe とストリーミングセッションの数"""
+        return self._in_flight
+
+    def check(self) -> None:
+        """停止処理中であれば ServiceBusyError を送出"""
+        if self.draining:
+            raise ServiceBusyError(self.retry_after, reason="draining")
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    @contextmanager
+    def session(self) -> Iterator[asyncio.Event]:
+        """ストリーミングセッションを登録し、停止処理の開始時にセットされるイベントを返す"""
+        drained = asyncio.Event()
+        if self.draining:
+            drained.set()
+        self._sessions.add(drained)
+        try:
+            with self.track():
+                yield drained
+        finally:
+            self._sessions.discard(drained)
+
+    async def drain(self) -> int:
+        """新しいリクエストの受付を止め、処理中のものが終わるまで最大 grace_seconds 待つ
+
+        待ち終えた時点で残っている数を返す。
+        """
+        self.draining = True
+        for drained in self._sessions:
+            drained.set()
+        logger.info(f"Draining {self._in_flight} in-flight request(s)")
+
+        deadline = time.monotonic() + self.grace_seconds
+        while self._in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._in_flight:
+            logger.warning(
+                f"Grace period expired with {self._in_flight} request(s) in flight"
+            )
+        return self._in_flight
+
+    def install_signal_handlers(self) -> None:
+        """SIGTERM / SIGINT で停止処理を行ってから元のハンドラーを呼ぶようにする
+
+        イベントループ上（uvicorn の lifespan の起動時）で呼び出す。
+        2回目のシグナルはそのまま元のハンドラーに渡す（強制終了）。
+        メインスレッド以外（TestClient など）ではシグナルハンドラーを設定できないため何もしない。
+        """
+        if threading.current_thread() is not threading.main_thread():
+            logger.info("Not in the main thread, skipping drain signal handlers")
+            return
+        loop = asyncio.get_running_loop()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(
+                signum: int,
+                frame: FrameType | None,
+                previous: Callable[[int, FrameType | None], Any] = previous,
+            ) -> None:
+                if self.draining:
+                    previous(signum, frame)
+                    return
+                self.draining = True
+                loop.call_soon_threadsafe(self._start_drain, previous, signum, frame)
+
+            signal.signal(signum, handler)
+
+    def _start_drain(
+        self,
+        previous: Callable[[int, FrameType | None], Any],
+        signum: int,
+        frame: FrameType | None,
+    ) -> None:
+        async def drain_then_exit() -> None:
+            await self.drain()
+            previous(signum, frame)
+
+        self._drain_task = asyncio.create_task(drain_then_exit())
@@ -0,0 +1,347 @@
+"""APIプロセスと推論ワーカープロセスの間でタスクを受け渡すブローカー
+
+キューはRedisのリスト操作（LPUSH / BRPOP）で表現する。接続先は次のいずれか。
+
+- unix:///path/to.sock  ワーカー側で起動したローカルストアにUnixソケットで接続
+                        （pickleでやり取りするため、認証キーが必須。ソケットは
+                        所有者のみがアクセスできるディレクトリに作成する）
+- redis://host:6379/0   Redis互換のサーバー（redisパッケージが必要）
+- memory://             同一プロセス内のストア（テスト・単一プロセス用）
+"""
+
+import json
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+import numpy as np
+
+from .scheduler import PRIORITY_CLASSES, priority_rank
+
+logger = logging.getLogger(__name__)
+
+TASK_QUEUE = "tasks"
+RESULT_TTL_SECONDS = 600
+
+_HEADER_LENGTH = struct.Struct(">I")
+
+
+def _json_default(value: Any) -> Any:
+    # numpy のスカラー（np.float32 など）をPythonの数値に変換
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(header: Dict[str, Any], audio: np.ndarray | None = None) -> bytes:
+    """ヘッダー（JSON）と波形を1つのバイト列にまとめる
+
+    波形は float32 で送る。16-bit PCMはそのまま（半分の大きさで）送る。
+    """
+    dtype = "<f4"
+    if audio is not None and audio.dtype == np.int16:
+        dtype = "<i2"
+        header = {**header, "audio_dtype": "int16"}
+    encoded = json.dumps(header, default=_json_default).encode()
+    body = b"" if audio is None else np.asarray(audio, dtype=dtype).tobytes()
+    return _HEADER_LENGTH.pack(len(encoded)) + encoded + body
+
+
+def decode_message(payload: bytes) -> Tuple[Dict[str, Any], np.ndarray | None]:
+    (length,) = _HEADER_LENGTH.unpack_from(payload)
+    start = _HEADER_LENGTH.size
+    header: Dict[str, Any] = json.loads(payload[start : start + length])
+    body = payload[start + length :]
+    # torch.from_numpy が書き込み可能な配列を要求するためコピーする
+    dtype = "<i2" if header.get("audio_dtype") == "int16" else "<f4"
+    audio = np.frombuffer(body, dtype=dtype).copy() if body else None
+    return header, audio
+
+
+class InMemoryStore:
+    """ブローカーが使うRedisのコマンドのみを実装したスレッドセーフなストア
+
+    Unixソケット経由で共有する場合もこのクラスをサーバー側で保持する。
+    """
+
+    def __init__(self) -> None:
+        self._lists: Dict[str, Deque[bytes]] = {}
+        self._expires: Dict[str, float] = {}
+        self._hashes: Dict[str, Dict[str, bytes]] = {}
+        self._condition = threading.Condition()
+
+    def _purge(self, key: str) -> None:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._lists.pop(key, None)
+            self._expires.pop(key, None)
+
+    def lpush(self, key: str, *values: bytes) -> int:
+        with self._condition:
+            self._purge(key)
+            items = self._lists.setdefault(key, deque())
+            for value in values:
+                items.appendleft(value)
+            self._condition.notify_all()
+            return len(items)
+
+    def brpop(self, keys: List[str], timeout: float = 0) -> Tuple[str, bytes] | None:
+        """keys のいずれかの末尾から1件取り出す（timeout 0 は無期限に待つ）"""
+        deadline = None if timeout == 0 else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                for key in keys:
+                    self._purge(key)
+                    items = self._lists.get(key)
+                    if items:
+                        value = items.pop()
+                        if not items:
+                            del self._lists[key]
+                            self._expires.pop(key, None)
+                        return key, value
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def rpoplpush(self, source: str, destination: str) -> bytes | None:
+        """source の末尾から1件取り出して destination の先頭に積む"""
+        with self._condition:
+            self._purge(source)
+            items = self._lists.get(source)
+            if not items:
+                return None
+            value = items.pop()
+            if not items:
+                del self._lists[source]
+                self._expires.pop(source, None)
+            self._lists.setdefault(destination, deque()).appendleft(value)
+            self._condition.notify_all()
+            return value
+
+    def llen(self, key: str) -> int:
+        with self._condition:
+            self._purge(key)
+            return len(self._lists.get(key, ()))
+
+    def expire(self, key: str, seconds: float) -> bool:
+        with self._condition:
+            if key not in self._lists:
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def hset(self, name: str, key: str, value: bytes) -> int:
+        with self._condition:
+            fields = self._hashes.setdefault(name, {})
+            created = key not in fields
+            fields[key] = value
+            return int(created)
+
+    def hgetall(self, name: str) -> Dict[str, bytes]:
+        with self._condition:
+            return dict(self._hashes.get(name, {}))
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self._condition:
+            fields = self._hashes.get(name, {})
+            return sum(fields.pop(key, None) is not None for key in keys)
+
+    def delete(self, *keys: str) -> int:
+        with self._condition:
+            removed = 0
+            for key in keys:
+                if self._lists.pop(key, None) is not None:
+                    removed += 1
+                self._expires.pop(key, None)
+            return removed
+
+
+class InferenceBroker:
+    """タスクキューと結果の受け渡し
+
+    タスクは共有のリスト、または宛先のワーカー専用のリストに積み、
+    結果はタスクIDごとのリストに返す。ワーカーは状態（ロード済みのモデル、
+    負荷）を定期的に登録し、APIプロセスはそれをもとに宛先を決める。
+    client はRedis互換（lpush / brpop / rpoplpush / llen / expire / hset / hgetall / hdel）
+    であればよい。
+    """
+
+    def __init__(self, client: Any, prefix: str = "whisper:inference"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _task_key(self, worker_id: str | None, priority: str = "interactive") -> str:
+        name = TASK_QUEUE if worker_id is None else f"{TASK_QUEUE}:{worker_id}"
+        if priority != "interactive":
+            name = f"{name}:{priority}"
+        return self._key(name)
+
+    def submit(
+        self,
+        payload: bytes,
+        worker_id: str | None = None,
+        priority: str = "interactive",
+    ) -> None:
+        """タスクを積む（worker_id を指定するとそのワーカーだけが受け取る）
+
+        優先度クラスごとに別のリストに積む。
+        """
+        priority_rank(priority)
+        self.client.lpush(self._task_key(worker_id, priority), payload)
+
+    def next_task(self, timeout: float, worker_id: str | None = None) -> bytes | None:
+        """優先度の高いクラスから、同じクラスでは自分宛てのタスクを優先して受け取る
+
+        BRPOP は指定した順にリストを調べる。
+        """
+        keys = []
+        for priority in PRIORITY_CLASSES:
+            if worker_id is not None:
+                keys.append(self._task_key(worker_id, priority))
+            keys.append(self._task_key(None, priority))
+        item = self.client.brpop(keys, timeout=_timeout(timeout))
+        return None if item is None else item[1]
+
+    def requeue_tasks(self, worker_id: str) -> int:
+        """ワーカー専用のキューに残ったタスクを共有のキューに戻す（戻した数を返す）
+
+        停止したワーカーや、ハートビートが途絶えたワーカー宛てのタスクを
+        他のワーカーが受け取れるようにする。RPOPLPUSH で1件ずつ移すため、
+        途中で失敗してもタスクは失われない。
+        """
+        moved = 0
+        for priority in PRIORITY_CLASSES:
+            source = self._task_key(worker_id, priority)
+            destination = self._task_key(None, priority)
+            while self.client.rpoplpush(source, destination) is not None:
+                moved += 1
+        return moved
+
+    def publish_result(self, task_id: str, payload: bytes) -> None:
+        key = self._key(f"result:{task_id}")
+        self.client.lpush(key, payload)
+        # 待っているクライアントがいない結果は一定時間後に消える
+        self.client.expire(key, RESULT_TTL_SECONDS)
+
+    def wait_result(self, task_id: str, timeout: float) -> bytes | None:
+        key = self._key(f"result:{task_id}")
+        item = self.client.brpop([key], timeout=_timeout(timeout))
+        return None if item is None else item[1]
+
+    def pending(self, worker_id: str | None = None) -> int:
+        """推論ワーカーが受け取っていないタスクの数"""
+        return sum(
+            int(self.client.llen(self._task_key(worker_id, priority)))
+            for priority in PRIORITY_CLASSES
+        )
+
+    def register_worker(self, worker_id: str, status: Dict[str, Any]) -> None:
+        """ワーカーの状態を登録（updated に登録時刻を記録する）"""
+        status = {**status, "updated": time.time()}
+        self.client.hset(self._key("workers"), worker_id, json.dumps(status).encode())
+
+    def unregister_worker(self, worker_id: str) -> None:
+        self.client.hdel(self._key("workers"), worker_id)
+
+    def workers(self, max_age: float) -> Dict[str, Dict[str, Any]]:
+        """max_age 秒以内に状態を登録したワーカー"""
+        now = time.time()
+        live = {}
+        for worker_id, value in self.client.hgetall(self._key("workers")).items():
+            status = json.loads(value)
+            if now - status.get("updated", 0) <= max_age:
+                if isinstance(worker_id, bytes):
+                    worker_id = worker_id.decode()
+                live[worker_id] = status
+        return live
+
+
+def _timeout(seconds: float) -> int:
+    # Redis 6未満のBRPOPは整数秒のみ受け付け、0は無期限を意味する
+    return max(1, math.ceil(seconds))
+
+
+class _StoreServer(BaseManager):
+    pass
+
+
+class _StoreClient(BaseManager):
+    pass
+
+
+_StoreClient.register("store")
+
+_memory_store = InMemoryStore()
+
+
+def _require_authkey(authkey: bytes) -> None:
+    # 接続を受け付けたプロセスはpickleを復元するため、既定の認証キーは使わせない
+    if not authkey:
+        raise ValueError(
+            "INFERENCE_BROKER_AUTHKEY must be set for unix:// brokers "
+            "(e.g. the output of `openssl rand -hex 32`)"
+        )
+
+
+def _private_socket_dir(path: str) -> Path:
+    """ソケットを置くディレクトリを所有者のみがアクセスできる状態で用意する"""
+    directory = Path(path).parent
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    stat = directory.stat()
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise PermissionError(
+            f"Socket directory {directory} must be owned by this user with mode 0700"
+        )
+    return directory
+
+
+def serve_local_store(path: str, authkey: bytes) -> None:
+    """Unixソケットでストアを公開する（プロセスが終了するまで戻らない）
+
+    認証キーが空の場合は ValueError、ソケットのディレクトリが他のユーザーから
+    アクセスできる場合は PermissionError を送出する。ソケットはモード0600で作成する。
+    """
+    _require_authkey(authkey)
+    _private_socket_dir(path)
+    store = InMemoryStore()
+    # 前回の起動で残ったソケットファイルを削除する
+    Path(path).unlink(missing_ok=True)
+    _StoreServer.register("store", callable=lambda: store)
+    manager = _StoreServer(address=path, authkey=authkey)
+    previous_umask = os.umask(0o177)
+    try:
+        server = manager.get_server()
+    finally:
+        os.umask(previous_umask)
+    os.chmod(path, 0o600)
+    logger.info(f"Serving inference queue on unix://{path}")
+    server.serve_forever()
+
+
+def create_broker(url: str, authkey: bytes = b"") -> InferenceBroker:
+    """URLからブローカーを作成（unix:// は認証キーが必須）"""
+    if url.startswith("memory://"):
+        return InferenceBroker(_memory_store)
+    if url.startswith("unix://"):
+        _require_authkey(authkey)
+        manager = _StoreClient(address=url[len("unix://") :], authkey=authkey)
+        manager.connect()
+        return InferenceBroker(manager.store())  # type: ignore[attr-defined]
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("The redis package is required for redis:// broker URLs")
+        return InferenceBroker(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported broker URL: {url}")
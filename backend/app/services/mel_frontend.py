@@ -0,0 +1,208 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+from whisper.audio import HOP_LENGTH, N_FFT, mel_filters  # type: ignore
+
+# 右端のフレームが無音（ゼロ）を参照できるだけのパディング
+# whisper.transcribe は30秒分の無音を付加するが、フレーム計算に必要なのは窓長分のみ
+EDGE_PADDING = N_FFT
+N_FREQ_BINS = N_FFT // 2 + 1
+
+
+def _hann_window(device: torch.device) -> torch.Tensor:
+    return torch.hann_window(N_FFT, device=device)
+
+
+def _as_tensor(audio: np.ndarray | torch.Tensor) -> torch.Tensor:
+    if torch.is_tensor(audio):
+        return audio.float()
+    return torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+
+
+def power_spectrogram(audio: torch.Tensor) -> torch.Tensor:
+    """パワースペクトログラムを計算（バッチ入力対応）
+
+    audio: shape = (samples,) または (batch, samples)
+    戻り値: shape = (..., N_FREQ_BINS, frames)
+    """
+    audio = F.pad(audio, (0, EDGE_PADDING))
+    stft = torch.stft(
+        audio,
+        N_FFT,
+        HOP_LENGTH,
+        window=_hann_window(audio.device),
+        return_complex=True,
+    )
+    return stft[..., :-1].abs() ** 2
+
+
+def log10_mel(power: torch.Tensor, n_mels: int) -> torch.Tensor:
+    """パワースペクトログラムのメル帯域ごとのlog10（正規化前）
+
+    フレームごとに独立して計算できるため、ストリーミングで逐次計算して保持できる。
+    """
+    filters = mel_filters(power.device, n_mels)
+    return torch.clamp(filters @ power, min=1e-10).log10()
+
+
+def normalize_log_mel(
+    log_spec: torch.Tensor, num_frames: int | None = None
+) -> torch.Tensor:
+    """正規化前のlog10 melをWhisper形式に正規化
+
+    ダイナミックレンジの基準（最大値）はクリップごとに求める。
+    """
+    peak = log_spec.amax(dim=(-2, -1), keepdim=True)
+    log_spec = torch.maximum(log_spec, peak - 8.0)
+    log_spec = (log_spec + 4.0) / 4.0
+    if num_frames is not None:
+        log_spec = log_spec[..., :num_frames]
+    return log_spec
+
+
+def log_mel_from_power(
+    power: torch.Tensor, n_mels: int, num_frames: int | None = None
+) -> torch.Tensor:
+    """パワースペクトログラムからWhisper形式の正規化済みlog-melを計算"""
+    return normalize_log_mel(log10_mel(power, n_mels), num_frames)
+
+
+class LogMelFrontend:
+    """Whisperモデル前段のlog-melフロントエンド"""
+
+    def __init__(self, device: str | torch.device = "cpu"):
+        self.device = torch.device(device)
+
+    def compute(self, audio: np.ndarray | torch.Tensor, n_mels: int) -> torch.Tensor:
+        """1クリップ分のlog-melを計算（shape = (n_mels, samples // HOP_LENGTH)）"""
+        samples = _as_tensor(audio).to(self.device)
+        power = power_spectrogram(samples)
+        return log_mel_from_power(power, n_mels, samples.shape[-1] // HOP_LENGTH)
+
+    def compute_batch(
+        self, clips: list[np.ndarray | torch.Tensor], n_mels: int
+    ) -> list[torch.Tensor]:
+        """複数クリップのlog-melを1回のバッチSTFTで計算"""
+        if not clips:
+            return []
+
+        tensors = [_as_tensor(clip) for clip in clips]
+        max_length = max(tensor.shape[-1] for tensor in tensors)
+        batch = torch.stack(
+            [F.pad(tensor, (0, max_length - tensor.shape[-1])) for tensor in tensors]
+        ).to(self.device)
+
+        # 末尾のゼロ埋めはwhisper.transcribeの無音パディングと同じ扱いになる
+        mels = log_mel_from_power(power_spectrogram(batch), n_mels)
+        return [
+            mel[:, : tensor.shape[-1] // HOP_LENGTH]
+            for mel, tensor in zip(mels, tensors)
+        ]
+
+    def from_power(self, power: torch.Tensor, n_mels: int) -> torch.Tensor:
+        """事前に計算済みのパワースペクトログラムからlog-melを計算"""
+        return log_mel_from_power(power.to(self.device), n_mels)
+
+    def from_log10_mel(self, log_spec: torch.Tensor) -> torch.Tensor:
+        """保持しておいた正規化前のlog10 mel（log10_mel）からlog-melを計算"""
+        return normalize_log_mel(log_spec.to(self.device))
+
+
+class IncrementalSpectrogram:
+    """ストリーミング入力のパワースペクトログラムを逐次計算
+
+    新しいサンプルが届くたびに、窓が揃ったフレームだけを追加で計算して保持する。
+    フレーム i はサンプル i * HOP_LENGTH を中心とする窓（whisperと同じ center=True）。
+    """
+
+    def __init__(self) -> None:
+        self.num_samples = 0
+        # 先頭の反射パディングを含む信号のうち、未確定フレームに必要な部分
+        self._tail = torch.zeros(0)
+        self._tail_start = 0
+        self._started = False
+        self._frames = torch.zeros(N_FREQ_BINS, 0)
+        self._frames_start = 0
+
+    @property
+    def num_frames(self) -> int:
+        """確定済みフレーム数"""
+        return self._frames_start + self._frames.shape[-1]
+
+    def extend(self, samples: np.ndarray | torch.Tensor) -> None:
+        """サンプルを追加し、計算可能になったフレームを確定する"""
+        new_samples = _as_tensor(samples)
+        self.num_samples += new_samples.shape[-1]
+        self._tail = torch.cat([self._tail, new_samples])
+
+        if not self._started:
+            pad = N_FFT // 2
+            if self._tail.shape[-1] <= pad:
+                return
+            # 先頭はwhisperと同じく反射パディング
+            reflected = self._tail[1 : pad + 1].flip(0)
+            self._tail = torch.cat([reflected, self._tail])
+            self._started = True
+
+        available = self._tail_start + self._tail.shape[-1]
+        total = (available - N_FFT) // HOP_LENGTH + 1
+        count = total - self.num_frames
+        if count <= 0:
+            return
+
+        offset = self.num_frames * HOP_LENGTH - self._tail_start
+        segment = self._tail[offset : offset + (count - 1) * HOP_LENGTH + N_FFT]
+        frames = torch.stft(
+            segment,
+            N_FFT,
+            HOP_LENGTH,
+            window=_hann_window(segment.device),
+            center=False,
+            return_complex=True,
+        )
+        self._frames = torch.cat([self._frames, frames.abs() ** 2], dim=-1)
+
+        # 次のフレームの計算に必要なサンプルだけを残す
+        keep_from = self.num_frames * HOP_LENGTH - self._tail_start
+        self._tail = self._tail[keep_from:]
+        self._tail_start += keep_from
+
+    def frames(self, start: int, end: int) -> torch.Tensor:
+        """フレーム [start, end) のパワースペクトログラムを取得
+
+        未確定の末尾フレームは、以降を無音とみなして暫定的に計算する（保持はしない）。
+        """
+        if start < self._frames_start:
+            raise ValueError(f"Frames before {self._frames_start} were discarded")
+
+        committed = self._frames[
+            :, start - self._frames_start : end - self._frames_start
+        ]
+        first_missing = max(start, self.num_frames)
+        if end <= first_missing:
+            return committed
+
+        if not self._started:
+            # 反射パディングに足りない短い入力は単独クリップとして計算
+            provisional = power_spectrogram(self._tail)
+            return provisional[:, start:end]
+
+        offset = first_missing * HOP_LENGTH - self._tail_start
+        padded = F.pad(self._tail[offset:], (0, EDGE_PADDING))
+        provisional = torch.stft(
+            padded,
+            N_FFT,
+            HOP_LENGTH,
+            window=_hann_window(padded.device),
+            center=False,
+            return_complex=True,
+        )
+        provisional = provisional[:, : end - first_missing].abs() ** 2
+        return torch.cat([committed, provisional], dim=-1)
+
+    def discard_before(self, frame: int) -> None:
+        """不要になった確定済みフレームを解放"""
+        drop = min(frame, self.num_frames) - self._frames_start
+        if drop > 0:
+            self._frames = self._frames[:, drop:]
+            self._frames_start += drop
@@ -0,0 +1,166 @@
+import copy
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Set, Tuple
+
+import torch
+
+from .scheduler import CancelCheck, FairScheduler
+
+logger = logging.getLogger(__name__)
+
+
+def create_replica(model: Any) -> Any:
+    """重みを共有したモデルの複製を作成
+
+    パラメータとバッファはそのまま共有し、モジュールの構造だけを複製する。
+    decode はモジュールにkv-cacheフックを登録するため、レプリカごとに
+    別のモジュールオブジェクトが必要だが、推論中に重みは変更されない。
+    """
+    shared = {id(tensor): tensor for tensor in [*model.parameters(), *model.buffers()]}
+    return copy.deepcopy(model, memo=shared)
+
+
+def thread_state() -> Tuple[int, Set[int] | None]:
+    """呼び出し元のスレッドの intra-op スレッド数とコアの割り当て"""
+    affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    return torch.get_num_threads(), affinity
+
+
+def restore_thread_state(threads: int, affinity: Set[int] | None) -> None:
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    if affinity is not None and os.sched_getaffinity(0) != affinity:
+        os.sched_setaffinity(0, affinity)
+
+
+class ReplicaLease:
+    """借りているレプリカ
+
+    長い推論は窓の区切りで checkpoint を呼び出し、より優先すべき仕事が待っていれば
+    レプリカを譲って並び直す。再開後は別のレプリカになることがある。
+    """
+
+    def __init__(
+        self,
+        pool: "ModelReplicaPool",
+        slot: Tuple[Any, List[int] | None],
+        priority: str,
+        client: str,
+        cancelled: CancelCheck | None = None,
+    ):
+        self.pool = pool
+        self.slot: Tuple[Any, List[int] | None] | None = slot
+        self.priority = priority
+        self.client = client
+        self.cancelled = cancelled
+        # 借りる前のスレッドの設定（返却時とコアを固定しないレプリカに移るときに戻す）
+        self.saved_threads, self.saved_affinity = thread_state()
+
+    @property
+    def model(self) -> Any:
+        assert self.slot is not None
+        return self.slot[0]
+
+    def checkpoint(self, cost: float = 0.0) -> Any:
+        """次の区切りまでの量（音声の秒数）を申告し、続きに使うレプリカを返す
+
+        譲って待っている間に打ち切られた場合は RequestCancelledError を送出する
+        （レプリカは返却済み）。
+        """
+        previous = self.slot
+        self.slot = None
+        slot = self.pool.scheduler.checkpoint(
+            previous, self.priority, self.client, cost, self.cancelled
+        )
+        self.slot = slot
+        if slot is not previous:
+            self.pool._bind(slot[1], self.saved_affinity)
+        return self.model
+
+
+class ModelReplicaPool:
+    """同一モデルのレプリカを貸し出すプール
+
+    呼び出し元は checkout() でレプリカを借り、処理が終わると返却する。
+    すべて貸し出し中の場合は返却されるまで待つため、同時に実行される推論の数は
+    レプリカ数までに制限される。待っている仕事には優先度クラスとクライアント間の
+    公平性に基づいて割り当てる（FairScheduler）。threads が指定されていれば、
+    借りたスレッドの intra-op スレッド数をその値に設定する（replicas × threads が
+    推論に使うコア数の目安になる）。core_sets を渡すと、レプリカごとに割り当てた
+    コアへ借りたスレッドを固定する（組の数がレプリカ数より少ない場合は順に使い回す）。
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        replicas: int = 1,
+        threads: int = 0,
+        core_sets: List[List[int]] | None = None,
+    ):
+        self.model = model
+        self.replicas = max(1, replicas)
+        self.threads = threads
+        slots = []
+        for index in range(self.replicas):
+            replica = model if index == 0 else create_replica(model)
+            cores = core_sets[index % len(core_sets)] if core_sets else None
+            slots.append((replica, cores))
+        self.scheduler = FairScheduler(slots)
+        if self.replicas > 1:
+            logger.info(f"Created {self.replicas} replicas sharing model weights")
+
+    @property
+    def available(self) -> int:
+        """貸し出し可能なレプリカ数"""
+        return self.scheduler.free
+
+    @property
+    def in_use(self) -> int:
+        """貸し出し中のレプリカ数"""
+        return self.replicas - self.scheduler.free
+
+    def _bind(self, cores: List[int] | None, default: Set[int] | None) -> None:
+        """借りたスレッドをレプリカの設定にする（cores がなければ default のコアに戻す）"""
+        if self.threads > 0 and torch.get_num_threads() != self.threads:
+            torch.set_num_threads(self.threads)
+        affinity = set(cores) if cores else default
+        if (
+            affinity
+            and hasattr(os, "sched_setaffinity")
+            and os.sched_getaffinity(0) != affinity
+        ):
+            # pid 0 は呼び出し元のスレッドのみを対象にする
+            os.sched_setaffinity(0, affinity)
+
+    @contextmanager
+    def lease(
+        self,
+        priority: str = "interactive",
+        client: str = "",
+        cost: float = 0.0,
+        cancelled: CancelCheck | None = None,
+    ) -> Iterator[ReplicaLease]:
+        """レプリカを借りる（cost は最初の区切りまでの量）
+
+        cancelled が理由を返した仕事は、割り当て前なら開始せずに
+        RequestCancelledError を送出する。
+        """
+        slot = self.scheduler.acquire(priority, client, cost, cancelled)
+        lease = ReplicaLease(self, slot, priority, client, cancelled)
+        try:
+            self._bind(slot[1], lease.saved_affinity)
+            yield lease
+        finally:
+            # 共有のスレッドプールで後に動く処理に設定を持ち越さない
+            restore_thread_state(lease.saved_threads, lease.saved_affinity)
+            if lease.slot is not None:
+                self.scheduler.release(lease.slot)
+
+    @contextmanager
+    def checkout(
+        self, priority: str = "interactive", client: str = "", cost: float = 0.0
+    ) -> Iterator[Any]:
+        with self.lease(priority, client, cost) as lease:
+            yield lease.model
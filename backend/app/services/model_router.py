@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+from .inference_broker import InferenceBroker
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRouter:
+    """モデルをロード済みの推論ワーカーにタスクを振り分ける
+
+    振り分け先は次の順に決める。
+
+    1. モデルをロード済みで、処理中のタスクがスレッド数未満のワーカーのうち最も空いているもの
+    2. ロード済みのワーカーがない、またはすべて埋まっている場合は、ロード済みでない
+       ワーカーのうちモデルの空き枠があり、最も空いている（同じならメモリ使用量の少ない）もの。
+       利用の多いモデルはこうして複数のワーカーに広がる
+    3. それもなければロード済みのワーカーのうち最も空いているもの
+
+    ワーカーが1台も登録されていない場合は None（共有のキューに積む）を返す。
+    ロードを依頼したワーカーは、状態に反映されるまで（最長 assignment_ttl 秒）
+    ロード済みとみなし、同じモデルが一度に多くのワーカーへロードされるのを防ぐ。
+    """
+
+    def __init__(
+        self,
+        broker: InferenceBroker,
+        heartbeat_timeout: float = 10.0,
+        refresh_interval: float = 1.0,
+        assignment_ttl: float = 60.0,
+    ):
+        self.broker = broker
+        self.heartbeat_timeout = heartbeat_timeout
+        self.refresh_interval = refresh_interval
+        self.assignment_ttl = assignment_ttl
+        # (モデル名, ワーカーID) -> ロードを依頼した時刻
+        self._assignments: Dict[Tuple[str, str], float] = {}
+        self._workers: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at = 0.0
+        # このプロセスから送って結果を待っているタスクの数（登録される状態の遅れを補う）
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def workers(self) -> Dict[str, Dict[str, Any]]:
+        """登録されているワーカーの状態（refresh_interval 秒ごとに再取得）"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._refreshed_at >= self.refresh_interval:
+                self._workers = self.broker.workers(self.heartbeat_timeout)
+                self._refreshed_at = now
+                self._assignments = {
+                    (model_name, worker_id): assigned_at
+                    for (
+                        model_name,
+                        worker_id,
+                    ), assigned_at in self._assignments.items()
+                    if worker_id in self._workers
+                    and model_name not in self._workers[worker_id]["models"]
+                    and now - assigned_at < self.assignment_ttl
+                }
+            return self._workers
+
+    def _load(self, worker_id: str, status: Dict[str, Any]) -> int:
+        busy: int = status.get("busy", 0) + status.get("queued", 0)
+        return busy + self._in_flight.get(worker_id, 0)
+
+    def route(self, model_name: str) -> str | None:
+        workers = self.workers()
+        if not workers:
+            return None
+
+        with self._lock:
+            load = {
+                worker_id: self._load(worker_id, status)
+                for worker_id, status in workers.items()
+            }
+
+            holders = [
+                w
+                for w, s in workers.items()
+                if model_name in s["models"] or (model_name, w) in self._assignments
+            ]
+            free_holders = [
+                w for w in holders if load[w] < workers[w].get("threads", 1)
+            ]
+            if free_holders:
+                return min(free_holders, key=lambda w: load[w])
+
+            def has_room(status: Dict[str, Any]) -> bool:
+                max_models: int = status.get("max_models", 0)
+                return max_models == 0 or len(status["models"]) < max_models
+
+            candidates = [
+                w for w, s in workers.items() if w not in holders and has_room(s)
+            ]
+            if holders:
+                # 新しいワーカーにロードするのは、ロード済みのワーカーより空いている場合だけ
+                least_loaded = min(load[w] for w in holders)
+                candidates = [w for w in candidates if load[w] < least_loaded]
+            if candidates:
+                chosen = min(
+                    candidates,
+                    key=lambda w: (load[w], workers[w].get("model_bytes", 0)),
+                )
+                logger.info(f"Routing model {model_name} to worker {chosen}")
+                self._assignments[(model_name, chosen)] = time.monotonic()
+                return chosen
+            if holders:
+                return min(holders, key=lambda w: load[w])
+            # どのワーカーにも空き枠がない場合は、LRUで入れ替えるワーカーを選ぶ
+            chosen = min(workers, key=lambda w: load[w])
+            self._assignments[(model_name, chosen)] = time.monotonic()
+            return chosen
+
+    @contextmanager
+    def track(self, worker_id: str | None) -> Iterator[None]:
+        """worker_id に送ったタスクの結果を待っている間、負荷として数える"""
+        if worker_id is None:
+            yield
+            return
+        with self._lock:
+            self._in_flight[worker_id] = self._in_flight.get(worker_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[worker_id] -= 1
+                if not self._in_flight[worker_id]:
+                    del self._in_flight[worker_id]
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+# ハッシュを計算するときに一度に読み込むバイト数
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+# 版として表示するハッシュの桁数
+VERSION_LENGTH = 12
+
+
+def file_fingerprint(path: str | Path) -> Tuple[int, int]:
+    """ファイルの変更検出に使う (mtime_ns, サイズ)"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_version(path: str | Path) -> str:
+    """ファイル内容のSHA-256から版の文字列を作る"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()[:VERSION_LENGTH]
+
+
+class ModelVersion:
+    """ロード済みモデルの版とロードにかかった時間
+
+    カスタムモデルはファイル内容のハッシュを版とし、(mtime, サイズ) が変わった
+    場合だけハッシュを計算し直して更新を判定する。標準モデルの版は None。
+    """
+
+    def __init__(
+        self,
+        version: str | None = None,
+        fingerprint: Tuple[int, int] | None = None,
+        load_time: float = 0.0,
+    ):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.load_time = load_time
+        self.loaded_at = time.time()
+
+    @classmethod
+    def of_file(cls, path: str | Path) -> "ModelVersion":
+        """ファイルの現在の版（ロード前に計算し、load_time は後から設定する）"""
+        fingerprint = file_fingerprint(path)
+        return cls(file_version(path), fingerprint)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "load_time": self.load_time,
+        }
@@ -0,0 +1,71 @@
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+# 1回の計測で記録するスタックの最大深さ（深い再帰で出力が肥大化しないように）
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerBusyError(Exception):
+    """別の計測が実行中"""
+
+
+class SamplingProfiler:
+    """全スレッドのスタックを一定間隔で取得するサンプリングプロファイラ
+
+    sys._current_frames() を読むだけなので計測対象のスレッドを止めず、
+    推論中のワーカーにも使える。計測は経過時間ベースのため、ロック待ちや
+    I/O待ちのスレッドも待機箇所のスタックとして記録される。
+    PyTorchの演算はC++側で実行されるため、呼び出し元のPythonフレームに集計される。
+    """
+
+    def __init__(self) -> None:
+        self._running = threading.Lock()
+
+    def profile(self, duration: float, interval: float = 0.005) -> Counter[str]:
+        """duration 秒間サンプリングし、折りたたみ形式のスタックごとの回数を返す"""
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusyError("Another profiling session is running")
+
+        try:
+            samples: Counter[str] = Counter()
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                thread_names = {
+                    thread.ident: thread.name for thread in threading.enumerate()
+                }
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    thread_name = thread_names.get(thread_id, str(thread_id))
+                    samples[collapse_stack(thread_name, frame)] += 1
+                time.sleep(interval)
+            return samples
+        finally:
+            self._running.release()
+
+
+def collapse_stack(thread_name: str, frame: FrameType | None) -> str:
+    """スタックを呼び出し元から順にセミコロンで連結（flamegraph.pl / speedscope 形式）"""
+    names: list[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    names.append(thread_name.replace(";", "_"))
+    return ";".join(reversed(names))
+
+
+def format_collapsed(samples: Counter[str]) -> str:
+    """折りたたみ形式のテキスト（1行に「スタック 回数」）"""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+# グローバルインスタンス（ワーカープロセスごとに1つ）
+profiler = SamplingProfiler()
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from starlette.requests import HTTPConnection
+
+from ..core.exceptions import RateLimitExceededError
+
+logger = logging.getLogger(__name__)
+
+# この回数の更新ごとに、満タンに戻ったバケットを削除する
+PRUNE_EVERY = 1000
+
+
+def refill(
+    tokens: float,
+    updated: float,
+    now: float,
+    rate: float,
+    capacity: float,
+    cost: float,
+    consume: bool = True,
+) -> Tuple[float, float]:
+    """トークンバケットを補充して cost を引き出す
+
+    (新しいトークン数, 待つべき秒数) を返す。待つ必要がある場合と consume が
+    False の場合（残量の確認のみ）はトークンを引かない。
+    容量より大きい cost はバケットが満タンなら受け付け、トークンを負にする
+    （長い音声も受け付けられるが、その分だけ次の受付が遅れる）。
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    needed = min(cost, capacity)
+    if tokens < needed:
+        return tokens, (needed - tokens) / rate
+    return tokens - cost if consume else tokens, 0.0
+
+
+class InMemoryBucketStore:
+    """プロセス内のトークンバケット（ワーカーが1つの場合やテスト用）"""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(
+        self,
+        key: str,
+        cost: float,
+        rate: float,
+        capacity: float,
+        consume: bool = True,
+    ) -> float:
+        """cost を引き出す。足りなければ引き出さずに待つべき秒数を返す"""
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, wait = refill(tokens, updated, now, rate, capacity, cost, consume)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+
+class SqliteBucketStore:
+    """SQLiteファイルに保存するトークンバケット
+
+    同じホストのワーカープロセス間で状態を共有する。読み出しから書き込みまでを
+    BEGIN IMMEDIATE のトランザクションで行うため、同時に引き出しても二重には使えない。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._updates = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def take(
+        self,
+        key: str,
+        cost: float,
+        rate: float,
+        capacity: float,
+        consume: bool = True,
+    ) -> float:
+        """cost を引き出す。足りなければ引き出さずに待つべき秒数を返す"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = refill(tokens, updated, now, rate, capacity, cost, consume)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) "
+                "VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            self._updates += 1
+            if self._updates % PRUNE_EVERY == 0:
+                # 補充で満タンに戻ったバケットは存在しないものと同じ
+                conn.execute(
+                    "DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+BucketStore = InMemoryBucketStore | SqliteBucketStore
+
+
+def parse_model_weights(value: str) -> Dict[str, float]:
+    """モデルごとの重み（tiny=0.5,base=1 形式）を読み込む"""
+    weights = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class RateLimiter:
+    """クライアントごとに音声の秒数で課金するトークンバケット
+
+    1リクエストの重さは音声の長さ × モデルの重み（base を1とした計算量の目安、
+    設定にないモデルは1）で見積もる。rate はクライアントが1秒あたりに使える
+    重み付き音声秒数、burst はバケットの容量。rate が0の場合は制限しない。
+    """
+
+    def __init__(
+        self,
+        store: BucketStore,
+        rate: float,
+        burst: float,
+        model_weights: Dict[str, float] | None = None,
+        key_header: str = "X-API-Key",
+    ):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.model_weights = model_weights or {}
+        self.key_header = key_header
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def client_key(self, conn: HTTPConnection) -> str:
+        """APIキー（ヘッダー）があればそれを、なければクライアントのIPを識別子にする"""
+        api_key = conn.headers.get(self.key_header)
+        if api_key:
+            # ストアにAPIキーそのものを残さない
+            return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        return "ip:" + (conn.client.host if conn.client else "unknown")
+
+    def cost(self, audio_seconds: float, *models: str | None) -> float:
+        """音声の秒数をモデルの重みで換算する（複数のモデルで処理する場合は合計）"""
+        weight = sum(self.model_weights.get(model, 1.0) for model in models if model)
+        return audio_seconds * weight
+
+    def take(self, key: str, cost: float, consume: bool = True) -> None:
+        """cost を引き出す。残りが足りなければ RateLimitExceededError を送出"""
+        if not self.enabled:
+            return
+        wait = self.store.take(key, cost, self.rate, self.burst, consume)
+        if wait > 0:
+            retry_after = max(1, math.ceil(wait))
+            logger.info(f"Rate limited {key}: cost={cost:.1f}, retry after {wait:.1f}s")
+            raise RateLimitExceededError(retry_after)
+
+    def check(self, key: str, cost: float = 0.0) -> None:
+        """残量が cost に満たなければ RateLimitExceededError を送出（引き出さない）"""
+        self.take(key, cost, consume=False)
+
+
+def create_bucket_store(path: str) -> BucketStore:
+    """path が空ならプロセス内、それ以外はSQLiteファイルのストアを作成"""
+    if not path:
+        return InMemoryBucketStore()
+    return SqliteBucketStore(Path(path))
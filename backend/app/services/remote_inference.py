@@ -0,0 +1,320 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import torch
+
+from ..core.exceptions import RequestCancelledError
+from ..core.timing import StageTimings
+from .cancellation import Cancellation
+from .inference_broker import InferenceBroker, decode_message, encode_message
+from .model_router import ModelRouter
+from .whisper_service import WhisperModelManager, estimate_model_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteInferenceError(Exception):
+    """推論ワーカーで処理が失敗した"""
+
+
+class RemoteInferenceClient:
+    """APIプロセス側: 推論をブローカー経由でワーカープロセスに依頼する
+
+    音声のデコードはAPIプロセスで行い、16kHz モノラルの波形だけを送る。
+    WhisperModelManager.transcribe と同じ引数で呼び出せる。
+    router を渡すと、モデルをロード済みのワーカーにタスクを振り分ける。
+    """
+
+    def __init__(
+        self,
+        broker: InferenceBroker,
+        model_manager: WhisperModelManager,
+        timeout: float = 600.0,
+        router: ModelRouter | None = None,
+    ):
+        self.broker = broker
+        self.model_manager = model_manager
+        self.timeout = timeout
+        self.router = router
+
+    def _request(
+        self,
+        header: Dict[str, Any],
+        audio: np.ndarray | None = None,
+        priority: str = "interactive",
+        cancel: Cancellation | None = None,
+    ) -> Dict[str, Any]:
+        task_id = uuid.uuid4().hex
+        timeout = self.timeout
+        remaining = cancel.remaining() if cancel is not None else None
+        if remaining is not None:
+            # 期限はワーカーに壁時計の時刻で渡し、結果もそれ以上は待たない
+            header = {**header, "deadline": time.time() + remaining}
+            timeout = max(0.0, min(timeout, remaining))
+        worker_id = None
+        if self.router is not None:
+            worker_id = self.router.route(header["model"])
+        with self.router.track(worker_id) if self.router else nullcontext():
+            self.broker.submit(
+                encode_message({**header, "id": task_id}, audio), worker_id, priority
+            )
+            payload = self._wait_result(task_id, timeout, worker_id)
+        if payload is None:
+            if cancel is not None and cancel.reason is not None:
+                raise RequestCancelledError(cancel.reason)
+            raise TimeoutError(
+                f"No inference worker responded within {timeout:.1f} seconds"
+            )
+        response, _ = decode_message(payload)
+        if response.get("cancelled"):
+            raise RequestCancelledError(response["cancelled"])
+        if not response.get("ok"):
+            raise RemoteInferenceError(response.get("error", "unknown error"))
+        return response
+
+    def _wait_result(
+        self, task_id: str, timeout: float, worker_id: str | None
+    ) -> bytes | None:
+        """結果を待つ
+
+        ワーカー専用のキューに積んだ場合は、ハートビートの間隔ごとにそのワーカーが
+        生きているかを確認し、途絶えていれば専用のキューのタスクを共有のキューに戻して
+        他のワーカーに処理させる。
+        """
+        if worker_id is None or self.router is None:
+            return self.broker.wait_result(task_id, timeout)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            payload = self.broker.wait_result(
+                task_id, min(remaining, self.router.heartbeat_timeout)
+            )
+            if payload is not None or deadline - time.monotonic() <= 0:
+                return payload
+            if worker_id not in self.broker.workers(self.router.heartbeat_timeout):
+                moved = self.broker.requeue_tasks(worker_id)
+                logger.warning(
+                    f"Inference worker {worker_id} stopped responding, "
+                    f"moved {moved} task(s) to the shared queue"
+                )
+                return self.broker.wait_result(
+                    task_id, max(0.0, deadline - time.monotonic())
+                )
+
+    def load_model(self, model_name: str) -> None:
+        self._request({"op": "load", "model": model_name})
+
+    def transcribe(
+        self,
+        audio: str | np.ndarray,
+        model_name: str = "base",
+        language: str = "ja",
+        spectrogram: torch.Tensor | None = None,
+        profile: str = "balanced",
+        timings: StageTimings | None = None,
+        priority: str = "interactive",
+        client: str = "",
+        cancel: Cancellation | None = None,
+        log_mel: torch.Tensor | None = None,
+        on_segments: Callable[[List[Dict[str, Any]]], None] | None = None,
+    ) -> Dict[str, Any]:
+        """ワーカーで文字起こし
+
+        spectrogram と log_mel は送らず、ワーカー側で波形から計算し直す
+        （16-bit PCMの波形は変換せずに送る）。
+        on_segments には結果が届いた時点ですべてのセグメントを渡す。
+        timings にはワーカーで計測した段階と、往復の待ち時間（dispatch）を加える。
+        cancel の期限はワーカーに渡す（クライアントの切断は伝えない）。
+        """
+        if timings is None:
+            timings = StageTimings()
+        if isinstance(audio, str):
+            with timings.measure("audio_decode"):
+                audio = self.model_manager.load_audio(audio)
+
+        started = time.perf_counter()
+        response = self._request(
+            {
+                "op": "transcribe",
+                "model": model_name,
+                "language": language,
+                "profile": profile,
+                "priority": priority,
+                "client": client,
+            },
+            audio,
+            priority,
+            cancel,
+        )
+        elapsed = time.perf_counter() - started
+
+        worker_seconds = response.get("timings", {})
+        for stage, seconds in worker_seconds.items():
+            timings.add(stage, seconds)
+        timings.add("dispatch", max(0.0, elapsed - sum(worker_seconds.values())))
+        result: Dict[str, Any] = response["result"]
+        if on_segments is not None and result.get("segments"):
+            on_segments(result["segments"])
+        return result
+
+
+class InferenceWorker:
+    """ワーカープロセス側: ブローカーからタスクを受け取り推論する
+
+    自分宛てのタスクと共有のタスクを受け取り、ロード済みのモデルと負荷を
+    定期的にブローカーへ登録する。max_models を超えてモデルをロードした場合は、
+    処理中でないモデルのうち最も長く使われていないものを解放する。
+    """
+
+    def __init__(
+        self,
+        broker: InferenceBroker,
+        model_manager: WhisperModelManager,
+        worker_id: str | None = None,
+        threads: int = 1,
+        max_models: int = 0,
+    ):
+        self.broker = broker
+        self.model_manager = model_manager
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.threads = max(1, threads)
+        self.max_models = max_models
+        self.stopping = threading.Event()
+        self._busy: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._state_lock = threading.Lock()
+
+    def status(self) -> Dict[str, Any]:
+        """ブローカーに登録する状態"""
+        models = list(self.model_manager.loaded_models)
+        with self._state_lock:
+            busy = sum(self._busy.values())
+        return {
+            "models": models,
+            "model_bytes": sum(
+                estimate_model_bytes(self.model_manager.loaded_models.get(name))
+                for name in models
+            ),
+            "max_models": self.max_models,
+            "threads": self.threads,
+            "busy": busy,
+            "queued": self.broker.pending(self.worker_id),
+        }
+
+    def heartbeat(self) -> None:
+        self.broker.register_worker(self.worker_id, self.status())
+
+    def _begin(self, model_name: str) -> None:
+        with self._state_lock:
+            self._busy[model_name] = self._busy.get(model_name, 0) + 1
+            self._last_used[model_name] = time.monotonic()
+
+    def _end(self, model_name: str) -> None:
+        with self._state_lock:
+            self._busy[model_name] -= 1
+            if not self._busy[model_name]:
+                del self._busy[model_name]
+            self._last_used[model_name] = time.monotonic()
+
+    def evict(self) -> List[str]:
+        """モデル数が上限を超えている場合、使われていないモデルから解放する"""
+        if self.max_models <= 0:
+            return []
+        with self._state_lock:
+            loaded = list(self.model_manager.loaded_models)
+            idle = [name for name in loaded if name not in self._busy]
+            idle.sort(key=lambda name: self._last_used.get(name, 0.0))
+            victims = idle[: max(0, len(loaded) - self.max_models)]
+            for name in victims:
+                self._last_used.pop(name, None)
+        for name in victims:
+            self.model_manager.unload_model(name)
+        return victims
+
+    def handle(self, payload: bytes) -> bytes:
+        """1件のタスクを処理し、結果のメッセージを返す"""
+        header, audio = decode_message(payload)
+        task_id = header.get("id")
+        model_name = header.get("model", "")
+        was_loaded = model_name in self.model_manager.loaded_models
+        self._begin(model_name)
+        try:
+            if header["op"] == "load":
+                self.model_manager.load_model(header["model"])
+                return encode_message({"id": task_id, "ok": True})
+            if header["op"] == "transcribe":
+                if audio is None:
+                    raise ValueError("Transcription task has no audio")
+                timings = StageTimings()
+                deadline = header.get("deadline")
+                result = self.model_manager.transcribe(
+                    audio,
+                    header["model"],
+                    header["language"],
+                    profile=header["profile"],
+                    timings=timings,
+                    priority=header.get("priority", "interactive"),
+                    client=header.get("client", ""),
+                    cancel=Cancellation.until(deadline) if deadline else None,
+                )
+                return encode_message(
+                    {
+                        "id": task_id,
+                        "ok": True,
+                        "result": result,
+                        "timings": timings.seconds,
+                    }
+                )
+            raise ValueError(f"Unknown task: {header['op']}")
+        except RequestCancelledError as e:
+            logger.info(f"Inference task {task_id} cancelled: {e.reason}")
+            return encode_message({"id": task_id, "ok": False, "cancelled": e.reason})
+        except Exception as e:
+            logger.error(f"Inference task {task_id} failed: {e}")
+            return encode_message({"id": task_id, "ok": False, "error": str(e)})
+        finally:
+            self._end(model_name)
+            # ロード済みのモデルが変わった場合はすぐに登録し直して振り分けに反映する
+            if self.evict() or not was_loaded:
+                self.heartbeat()
+
+    def run_once(self, timeout: float = 1.0) -> bool:
+        """タスクを1件処理する（timeout 秒以内にタスクがなければ False）"""
+        payload = self.broker.next_task(timeout, self.worker_id)
+        if payload is None:
+            return False
+        header, _ = decode_message(payload)
+        self.broker.publish_result(header["id"], self.handle(payload))
+        return True
+
+    def run(self, heartbeat_interval: float = 2.0) -> None:
+        """stopping がセットされるまで threads 本のスレッドでタスクを処理する"""
+
+        def loop() -> None:
+            while not self.stopping.is_set():
+                self.run_once()
+
+        runners = [
+            threading.Thread(target=loop, name=f"inference-{index}", daemon=True)
+            for index in range(self.threads)
+        ]
+        for runner in runners:
+            runner.start()
+        try:
+            while True:
+                self.heartbeat()
+                if self.stopping.wait(heartbeat_interval):
+                    break
+        finally:
+            for runner in runners:
+                runner.join()
+            self.broker.unregister_worker(self.worker_id)
+            # 受け取る前に停止したタスクは他のワーカーに任せる
+            self.broker.requeue_tasks(self.worker_id)
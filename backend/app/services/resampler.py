@@ -0,0 +1,186 @@
+import math
+from typing import Dict, List
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..core.exceptions import UnsupportedAudioFormatError
+
+# Whisper の入力のサンプルレート
+TARGET_SAMPLE_RATE = 16000
+# フィルタの片側の長さ（元・変換先のうち高い方のレートのサンプル数）
+HALF_LENGTH_PER_RATIO = 10
+KAISER_BETA = 5.0
+# 受け付ける入力のサンプルレートと、変換の up / down の上限
+# （フィルタ長は max(up, down) に比例するため、16kHz と公約数の小さいレートは拒否する）
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+MAX_RATE_FACTOR = 1000
+MAX_CHANNELS = 8
+
+# sample_width（バイト）ごとのサンプル形式（リトルエンディアン）
+SAMPLE_FORMATS: Dict[int, np.dtype] = {2: np.dtype("<i2"), 4: np.dtype("<f4")}
+
+
+class StreamResampler:
+    """ポリフェーズ（窓関数法のsinc）による逐次リサンプリング
+
+    in_rate から out_rate への up / down 倍の変換を、Kaiser窓のローパスフィルタを
+    位相ごとに分けて行う。直前の入力をフィルタ長だけ保持するため、チャンクの境界で
+    結果が途切れず、一度に変換した場合と同じ出力になる。
+    """
+
+    def __init__(self, in_rate: int, out_rate: int = TARGET_SAMPLE_RATE):
+        ratio = math.gcd(in_rate, out_rate)
+        self.up = out_rate // ratio
+        self.down = in_rate // ratio
+        if max(self.up, self.down) > MAX_RATE_FACTOR:
+            raise UnsupportedAudioFormatError(
+                f"{in_rate}Hz", supported_sample_rates(out_rate)
+            )
+        half_length = HALF_LENGTH_PER_RATIO * max(self.up, self.down)
+        # 出力をフィルタの中心に合わせ、遅延をなくす
+        self.delay = half_length
+
+        length = 2 * half_length + 1
+        cutoff = 0.5 / max(self.up, self.down)
+        t = np.arange(length) - half_length
+        taps = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, KAISER_BETA)
+        taps *= self.up / taps.sum()
+
+        # bank[p] は位相 p の係数（入力の古い順に並べる）
+        self.taps_per_phase = -(-length // self.up)
+        padded = np.zeros(self.up * self.taps_per_phase)
+        padded[:length] = taps
+        self.bank = (
+            padded.reshape(self.taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+        )
+
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._received = 0
+        self._produced = 0
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """届いた入力で計算できる分の出力を返す"""
+        if self.passthrough:
+            return samples.astype(np.float32, copy=False)
+
+        extended = np.concatenate([self._history, samples.astype(np.float32)])
+        start = self._received - len(self._history)
+        self._received += len(samples)
+
+        last = (self._received * self.up - 1 - self.delay) // self.down
+        outputs = np.arange(self._produced, last + 1)
+        self._history = extended[len(extended) - len(self._history) :]
+        if len(outputs) == 0:
+            return np.zeros(0, dtype=np.float32)
+        self._produced = last + 1
+
+        position = outputs * self.down + self.delay
+        newest = position // self.up - start
+        windows = sliding_window_view(extended, self.taps_per_phase)
+        result: np.ndarray = np.einsum(
+            "ij,ij->i",
+            windows[newest - self.taps_per_phase + 1],
+            self.bank[position % self.up],
+        )
+        return result
+
+    def flush(self) -> np.ndarray:
+        """入力の終わりまでの残りの出力を返す（入力の長さ × up / down まで）"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        expected = -(-self._received * self.up // self.down)
+        produced = self._produced
+        padding = np.zeros(-(-(self.delay + 1) // self.up) + 1, dtype=np.float32)
+        result = self.process(padding)
+        return result[: max(0, expected - produced)]
+
+
+def supported_sample_widths() -> List[str]:
+    return ["16-bit int", "32-bit float"]
+
+
+def supported_sample_rates(out_rate: int = TARGET_SAMPLE_RATE) -> List[str]:
+    """受け付けるサンプルレート（out_rate との比が MAX_RATE_FACTOR 以内のもの）"""
+    return [
+        f"{MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE}Hz",
+        f"up/down ratio to {out_rate}Hz within {MAX_RATE_FACTOR}",
+    ]
+
+
+class PcmConverter:
+    """クライアントのPCMを16kHz モノラルの16-bit PCMに変換する
+
+    sample_width が2なら16-bit整数、4なら32-bit浮動小数点として読み、
+    チャンネルを平均してモノラルにしてからリサンプリングする。
+    メッセージの境界で途切れたサンプルは次のメッセージと合わせて変換する。
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, sample_width: int = 2):
+        if not all(
+            isinstance(value, int) and not isinstance(value, bool)
+            for value in (sample_rate, channels, sample_width)
+        ):
+            raise UnsupportedAudioFormatError(
+                f"{sample_rate!r}Hz, {channels!r}ch, {sample_width!r} bytes",
+                supported_sample_widths(),
+            )
+        if sample_width not in SAMPLE_FORMATS or not 1 <= channels <= MAX_CHANNELS:
+            raise UnsupportedAudioFormatError(
+                f"{sample_rate}Hz, {channels}ch, {sample_width * 8}-bit",
+                supported_sample_widths(),
+            )
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise UnsupportedAudioFormatError(
+                f"{sample_rate}Hz", supported_sample_rates()
+            )
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.dtype = SAMPLE_FORMATS[sample_width]
+        self.resampler = StreamResampler(sample_rate)
+        self._pending = b""
+
+    @property
+    def passthrough(self) -> bool:
+        """変換の必要がない形式（16kHz モノラルの16-bit PCM）"""
+        return (
+            self.resampler.passthrough and self.channels == 1 and self.sample_width == 2
+        )
+
+    def convert(self, data: bytes) -> bytes:
+        if self.passthrough:
+            return data
+        data = self._pending + data
+        frame_size = self.channels * self.sample_width
+        usable = len(data) // frame_size * frame_size
+        self._pending = data[usable:]
+
+        samples = np.frombuffer(data[:usable], self.dtype).astype(np.float32)
+        if self.sample_width == 2:
+            samples /= 32768.0
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return to_pcm16(self.resampler.process(samples))
+
+    def flush(self) -> bytes:
+        self._pending = b""
+        if self.passthrough:
+            return b""
+        return to_pcm16(self.resampler.flush())
+
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    return np.clip(np.round(samples * 32768.0), -32768, 32767).astype("<i2").tobytes()
+
+
+def as_float32(samples: np.ndarray) -> np.ndarray:
+    """16-bit PCMの波形を float32 に変換する（float32 はそのまま返す）"""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return samples
@@ -0,0 +1,153 @@
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..core.exceptions import RequestCancelledError
+
+# 優先度クラス（先頭ほど優先）。上位のクラスの待ちがある間、下位のクラスには割り当てない
+PRIORITY_CLASSES = ("realtime", "interactive", "batch")
+# クライアントごとの仮想終了時刻をこの数まで保持する（超えたら追いついたものを消す）
+MAX_TRACKED_CLIENTS = 1024
+# 打ち切りを確認しながら待つ場合の確認間隔（秒）
+CANCEL_POLL_SECONDS = 0.1
+
+# 打ち切られていればその理由を返す関数
+CancelCheck = Callable[[], str | None]
+
+
+def priority_rank(priority: str) -> int:
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(
+            f"Invalid priority: {priority}. Available priorities: {PRIORITY_CLASSES}"
+        )
+    return PRIORITY_CLASSES.index(priority)
+
+
+class Ticket:
+    """割り当てを待っている1件の仕事"""
+
+    def __init__(self, rank: int, client: str, tag: float, seq: int):
+        self.rank = rank
+        self.client = client
+        self.tag = tag
+        self.seq = seq
+
+
+class FairScheduler:
+    """優先度クラスとクライアント間の公平性に基づいてスロット（レプリカ）を割り当てる
+
+    クラス間は厳密な優先順位で、同じクラスの中ではクライアントごとに
+    start-time fair queuing を行う。仕事は開始時刻タグ
+    max(クラスの仮想時刻, クライアントの前回の仮想終了時刻) の小さい順に割り当てられ、
+    クライアントの仮想終了時刻は処理する量（音声の秒数）だけ進む。
+    長い仕事は checkpoint で区切りごとに並び直し、より優先すべき仕事が待っていれば
+    スロットを譲る。
+    """
+
+    def __init__(self, slots: List[Any]):
+        self._free = list(slots)
+        self._waiting: List[Ticket] = []
+        self._virtual: Dict[int, float] = {}
+        self._finish: Dict[Tuple[int, str], float] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def free(self) -> int:
+        """空いているスロット数"""
+        with self._cond:
+            return len(self._free)
+
+    def waiting(self, priority: str | None = None) -> int:
+        """割り当てを待っている仕事の数"""
+        with self._cond:
+            if priority is None:
+                return len(self._waiting)
+            rank = priority_rank(priority)
+            return sum(1 for ticket in self._waiting if ticket.rank == rank)
+
+    def _start_tag(self, rank: int, client: str) -> float:
+        return max(self._virtual.get(rank, 0.0), self._finish.get((rank, client), 0.0))
+
+    def _order(self, ticket: Ticket) -> Tuple[int, float, int]:
+        # 並んでいる間に同じクライアントの別の仕事が処理された場合はその分だけ後ろに回す
+        finish = self._finish.get((ticket.rank, ticket.client), 0.0)
+        return ticket.rank, max(ticket.tag, finish), ticket.seq
+
+    def _serve(self, rank: int, client: str, start: float, cost: float) -> None:
+        """start から cost の量を処理したものとして仮想時刻を進める"""
+        self._virtual[rank] = max(self._virtual.get(rank, 0.0), start)
+        self._finish[(rank, client)] = start + cost
+        if len(self._finish) > MAX_TRACKED_CLIENTS:
+            # 仮想時刻に追いついたクライアントは、記録がなくても同じタグになる
+            self._finish = {
+                key: finish
+                for key, finish in self._finish.items()
+                if finish > self._virtual.get(key[0], 0.0)
+            }
+
+    def acquire(
+        self,
+        priority: str,
+        client: str = "",
+        cost: float = 0.0,
+        cancelled: CancelCheck | None = None,
+    ) -> Any:
+        """スロットが割り当てられるまで待つ（cost は最初の区切りまでの量）
+
+        待っている間に cancelled が理由を返した場合は、並びから外して
+        RequestCancelledError を送出する（期限の過ぎた仕事は開始しない）。
+        """
+        rank = priority_rank(priority)
+        with self._cond:
+            ticket = Ticket(
+                rank, client, self._start_tag(rank, client), next(self._seq)
+            )
+            self._waiting.append(ticket)
+            while True:
+                reason = cancelled() if cancelled is not None else None
+                if reason is not None:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+                    raise RequestCancelledError(reason)
+                if self._free and min(self._waiting, key=self._order) is ticket:
+                    break
+                self._cond.wait(CANCEL_POLL_SECONDS if cancelled else None)
+            self._waiting.remove(ticket)
+            self._serve(rank, client, self._order(ticket)[1], cost)
+            slot = self._free.pop()
+            # スロットが残っていれば次の仕事も割り当てられる
+            self._cond.notify_all()
+            return slot
+
+    def release(self, slot: Any) -> None:
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    def checkpoint(
+        self,
+        slot: Any,
+        priority: str,
+        client: str = "",
+        cost: float = 0.0,
+        cancelled: CancelCheck | None = None,
+    ) -> Any:
+        """長い仕事の区切りで呼び出す
+
+        より優先すべき仕事が待っていればスロットを返して並び直し、割り当てられた
+        スロット（別のものの場合がある）を返す。待ちがなければそのまま続ける。
+        並び直している間に打ち切られた場合はスロットを返したまま
+        RequestCancelledError を送出する。
+        """
+        rank = priority_rank(priority)
+        with self._cond:
+            start = self._start_tag(rank, client)
+            if not any(
+                self._order(ticket) < (rank, start, -1) for ticket in self._waiting
+            ):
+                self._serve(rank, client, start, cost)
+                return slot
+            self._free.append(slot)
+            self._cond.notify_all()
+        return self.acquire(priority, client, cost, cancelled)
@@ -0,0 +1,89 @@
+import logging
+import tempfile
+from typing import IO, List
+
+import numpy as np
+import torch
+
+from .mel_frontend import log10_mel
+from .resampler import as_float32
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecording:
+    """ストリーミングセッション全体の音声を、終了時の文字起こしし直しのために保持する
+
+    音声は16kHz モノラルの16-bit PCMのまま保持し、spill_bytes を超えたら一時ファイルに
+    書き出してメモリマップで読む。n_mels が分かっている場合は、チャンクの処理で計算済みの
+    パワースペクトログラムからメル帯域のlog10（float16）も保持し、STFTを計算し直さない。
+    """
+
+    def __init__(self, spill_bytes: int, n_mels: int | None = None):
+        self.spill_bytes = spill_bytes
+        self.n_mels = n_mels
+        self.num_bytes = 0
+        self._memory = bytearray()
+        self._spill: IO[bytes] | None = None
+        self._mel_frames: List[torch.Tensor] = []
+        self.mel_frame_count = 0
+
+    @property
+    def num_samples(self) -> int:
+        return self.num_bytes // 2
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill is not None
+
+    @property
+    def keeps_mel(self) -> bool:
+        return self.n_mels is not None
+
+    def append(self, pcm_data: bytes) -> None:
+        """16-bit PCMを追加する"""
+        if self._spill is None and len(self._memory) + len(pcm_data) > self.spill_bytes:
+            self._spill = tempfile.TemporaryFile(prefix="whisper-session-")
+            self._spill.write(self._memory)
+            self._memory = bytearray()
+            logger.info(f"Session audio spilled to disk after {self.num_bytes} bytes")
+        if self._spill is not None:
+            self._spill.write(pcm_data)
+        else:
+            self._memory.extend(pcm_data)
+        self.num_bytes += len(pcm_data)
+
+    def add_frames(self, power: torch.Tensor) -> None:
+        """確定済みフレームのパワースペクトログラムをメルにして保持する"""
+        if self.n_mels is None or power.shape[-1] == 0:
+            return
+        self._mel_frames.append(log10_mel(power, self.n_mels).half())
+        self.mel_frame_count += power.shape[-1]
+
+    def pcm(self) -> np.ndarray:
+        """保持している音声の16-bit PCM（書き出した後はメモリマップ、コピーしない）"""
+        if self._spill is None:
+            return np.frombuffer(self._memory, np.int16)
+        self._spill.flush()
+        return np.memmap(
+            self._spill, dtype=np.int16, mode="r", shape=(self.num_samples,)
+        )
+
+    def samples(self) -> np.ndarray:
+        """保持している音声の波形（float32）"""
+        return as_float32(self.pcm())
+
+    def log_mel(self, tail: torch.Tensor) -> torch.Tensor | None:
+        """保持したフレームに tail（残りのフレームのパワー）を続けた正規化前のlog10 mel"""
+        if self.n_mels is None:
+            return None
+        frames = [frame.float() for frame in self._mel_frames]
+        return torch.cat([*frames, log10_mel(tail, self.n_mels)], dim=-1)
+
+    def close(self) -> None:
+        """保持している音声とメルを破棄する（一時ファイルは削除される）"""
+        self._memory = bytearray()
+        self._mel_frames = []
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import secrets
+from typing import Dict
+
+from .streaming_service import StreamingTranscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSession:
+    """再接続で再開できるストリーミングセッション"""
+
+    def __init__(self, session_id: str, service: StreamingTranscriptionService):
+        self.id = session_id
+        self.service = service
+        # 接続中のWebSocketが保持する（同時に2つの接続が同じセッションを使わない）
+        self.lock = asyncio.Lock()
+        # 再接続された場合にセットし、前の接続を閉じさせる
+        self.superseded = asyncio.Event()
+        self._expiry: asyncio.TimerHandle | None = None
+
+
+class StreamSessionStore:
+    """切断されたストリーミングセッションを grace_seconds の間保持する
+
+    セッションの状態（バッファ、確定済みのテキスト、チャンク番号）を残しておき、
+    同じセッションIDで再接続したクライアントはそこから続けられる。
+    grace_seconds が0の場合は保持しない。
+    セッションはデコーダーやモデルの状態を持つためプロセス内にのみ保持する。
+    uvicorn --workers で複数のワーカーを起動する場合、再接続が別のワーカーに
+    届くと session_expired になるため、再開には同じワーカーに振り分ける
+    ロードバランサー（スティッキーセッション）か1ワーカーでの起動が必要。
+    """
+
+    def __init__(self, grace_seconds: float = 60.0, workers: int = 1):
+        self.grace_seconds = grace_seconds
+        self._sessions: Dict[str, StreamSession] = {}
+        if self.enabled and workers > 1:
+            logger.warning(
+                f"Stream sessions are kept per worker ({workers} workers): "
+                "resuming requires sticky routing to the same worker"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.grace_seconds > 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def create(self, service: StreamingTranscriptionService) -> StreamSession:
+        """新しいセッションを登録し、接続中の状態で返す"""
+        session = StreamSession(secrets.token_urlsafe(16), service)
+        await session.lock.acquire()
+        if self.enabled:
+            self._sessions[session.id] = session
+        return session
+
+    async def attach(self, session_id: str) -> StreamSession | None:
+        """保持しているセッションに再接続する（期限切れ・不明なIDは None）
+
+        前の接続が切断に気付いていない場合は閉じさせ、処理中のチャンクを
+        終えるまで待ってから引き継ぐ。
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.superseded.set()
+        await session.lock.acquire()
+        if self._sessions.get(session_id) is not session:
+            session.lock.release()
+            return None
+        session.superseded = asyncio.Event()
+        if session._expiry is not None:
+            session._expiry.cancel()
+            session._expiry = None
+        logger.info(f"Stream session {session_id} resumed")
+        return session
+
+    def detach(self, session: StreamSession) -> None:
+        """接続が切れたセッションを grace_seconds の間だけ残す"""
+        session.service.on_revision = None
+        if self._sessions.get(session.id) is session:
+            session._expiry = asyncio.get_running_loop().call_later(
+                self.grace_seconds, self._expire, session
+            )
+        else:
+            session.service.close()
+        session.lock.release()
+
+    def close(self, session: StreamSession) -> None:
+        """終了したセッションを破棄する（再接続できなくなる）"""
+        if self._sessions.get(session.id) is session:
+            del self._sessions[session.id]
+        session.service.close()
+        session.lock.release()
+
+    def _expire(self, session: StreamSession) -> None:
+        if self._sessions.get(session.id) is session and not session.lock.locked():
+            del self._sessions[session.id]
+            session.service.close()
+            logger.info(f"Stream session {session.id} expired")
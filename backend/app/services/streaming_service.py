@@ -1,12 +1,43 @@
-import tempfile
-import wave
-from typing import Dict, Any
+import asyncio
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Tuple,
+)
 import logging
-from pathlib import Path
-from .whisper_service import whisper_manager
+
+import numpy as np
+import torch
+from whisper.audio import HOP_LENGTH  # type: ignore
+
+from ..core.config import settings
+from ..core.timing import StageTimings
+from .admission import AdmissionController
+from .audio_codecs import PCM, StreamDecoder
+from .mel_frontend import IncrementalSpectrogram
+from .remote_inference import RemoteInferenceClient
+from .resampler import PcmConverter
+from .session_recording import SessionRecording
+from .whisper_service import AUTO_LANGUAGE, whisper_manager
 
 logger = logging.getLogger(__name__)
 
+# 再接続時に送り直せるよう保持する直近の部分結果の数
+MAX_REPLAY_PARTIALS = 64
+
+# 最終結果の作り方（chunk: 残りの音声だけを文字起こしする / full: セッション全体を
+# final_model で文字起こしし直す）
+FINAL_PASSES = ("chunk", "full")
+
 
 class AudioBuffer:
     def __init__(self, sample_rate: int = 16000, chunk_duration: float = 2.0):
@@ -15,20 +46,13 @@ class AudioBuffer:
         self.chunk_size = int(sample_rate * chunk_duration)
         self.buffer: bytearray = bytearray()
         self.processed_chunks = 0
-        self.detected_sample_rate: int | None = None
 
     def add_data(self, data: bytes) -> None:
         self.buffer.extend(data)
 
-    def update_sample_rate(self, sample_rate: int) -> None:
-        """実際の音声ファイルのサンプルレートに更新"""
-        if self.detected_sample_rate != sample_rate:
-            self.detected_sample_rate = sample_rate
-            self.sample_rate = sample_rate
-            self.chunk_size = int(sample_rate * self.chunk_duration)
-            logger.info(
-                f"Sample rate updated to {sample_rate} Hz, chunk_size: {self.chunk_size}"
-            )
+    def seconds(self, data: bytes) -> float:
+        """16-bit PCMのバイト列の長さ（秒）"""
+        return len(data) / 2 / self.sample_rate
 
     def get_chunk_if_ready(self) -> bytes | None:
         if len(self.buffer) >= self.chunk_size * 2:  # 16-bit samples
@@ -43,77 +67,397 @@ class AudioBuffer:
         return remaining
 
 
+# 再文字起こし待ちのチャンク（chunk_id, start, end, PCM, 16kHz入力の特徴量）
+ChunkFeatures = Tuple[np.ndarray, torch.Tensor]
+RevisionJob = Tuple[int, float, float, bytes, ChunkFeatures]
+# 確定したセグメントを受け取るコールバック
+SegmentsCallback = Callable[[List[Dict[str, Any]]], Coroutine[Any, Any, None]]
+
+
 class StreamingTranscriptionService:
-    def __init__(self, model_name: str = "base", language: str = "ja"):
+    def __init__(
+        self,
+        model_name: str = "base",
+        language: str = "ja",
+        profile: str = "balanced",
+        revision_model: str | None = None,
+        admission: AdmissionController | None = None,
+        remote: RemoteInferenceClient | None = None,
+        client: str = "",
+        final_pass: str = "chunk",
+    ):
         self.model_name = model_name
         self.language = language
+        self.profile = profile
+        # カスケードモード: model_name で部分結果を返し、revision_model で確定区間を再文字起こしする
+        self.revision_model = revision_model
+        # 受付済みセッションのチャンクは拒否せず、推論中の負荷としてのみ計上する
+        self.admission = admission
+        # 設定されている場合は推論をワーカープロセスに依頼する
+        self.remote = remote
+        # 推論の順番待ちでクライアント間の公平性に使う識別子
+        self.client = client
+        self.on_revision: Callable[[Dict[str, Any]], Awaitable[None]] | None = None
+        # 切断中（on_revision がない間）に完了した再文字起こし結果
+        self.missed_revisions: List[Dict[str, Any]] = []
+        self.recent_partials: Deque[Dict[str, Any]] = deque(maxlen=MAX_REPLAY_PARTIALS)
+        self.chunk_texts: Dict[int, str] = {}
+        self._revision_queue: asyncio.Queue[RevisionJob] = asyncio.Queue()
+        self._revision_worker: asyncio.Task[None] | None = None
+        # language="auto" の場合、最初のチャンクで判定した言語をセッション中使い回す
+        self.detected_language: str | None = None
+        self.language_probability: float | None = None
+        # バッファには常に16kHz モノラルの16-bit PCMを入れる
         self.audio_buffer = AudioBuffer()
+        # 圧縮音声を受け取る場合のデコーダー（PCMの場合は None）
+        self.decoder: StreamDecoder | None = None
+        # PCMを16kHz モノラルに変換する（リサンプリングのフィルタ状態を保持する）
+        self.pcm_input = PcmConverter(self.audio_buffer.sample_rate)
+        # セッション開始からの受信バイト数（再接続したクライアントはここから送り直す）
+        self.received_bytes = 0
         self.accumulated_text = ""
         self.chunk_counter = 0
+        # 16kHz入力のパワースペクトログラムをチャンク到着ごとに逐次計算
+        self.spectrogram = IncrementalSpectrogram()
+        self.processed_samples = 0
+        # final_pass="full" の場合は、終了時に文字起こしし直すためにセッション全体を保持する
+        self.final_pass = final_pass
+        self.recording: SessionRecording | None = None
+        if final_pass == "full":
+            self.recording = SessionRecording(settings.stream_final_spill_bytes)
+
+    @property
+    def effective_language(self) -> str:
+        """文字起こしに使う言語（自動判定済みならその結果）"""
+        return self.detected_language or self.language
+
+    def _remember_language(self, result: Dict[str, Any]) -> None:
+        if (
+            self.language == AUTO_LANGUAGE
+            and self.detected_language is None
+            and result.get("language")
+        ):
+            self.detected_language = result["language"]
+            self.language_probability = result.get("language_probability")
+            logger.info(
+                f"Detected language: {self.detected_language} ({self.language_probability})"
+            )
+
+    @property
+    def final_model(self) -> str:
+        """最終結果に使うモデル"""
+        return self.revision_model or self.model_name
+
+    def set_audio_format(
+        self,
+        sample_rate: int,
+        channels: int = 1,
+        codec: str = PCM,
+        sample_width: int = 2,
+    ) -> None:
+        """audio_info で宣言された入力の形式に切り替える
+
+        PCM（sample_width が2なら16-bit整数、4なら32-bit浮動小数点）はプロセス内で
+        ダウンミックスとリサンプリングを行い、圧縮コーデックの場合はセッション用の
+        デコーダーを作成する。どちらも16kHz モノラルにしてバッファに入れる。
+        未対応の形式は UnsupportedAudioFormatError を送出する。
+        """
+        if codec == PCM:
+            self.pcm_input = PcmConverter(sample_rate, channels, sample_width)
+            self.decoder = None
+            return
+        self.decoder = StreamDecoder(codec, sample_rate, channels)
+
+    def receive_audio(self, data: bytes) -> None:
+        """クライアントから届いた音声を16kHz モノラルに変換してバッファに追加する"""
+        self.received_bytes += len(data)
+        if self.decoder is not None:
+            self.audio_buffer.add_data(self.decoder.decode(data))
+        else:
+            self.audio_buffer.add_data(self.pcm_input.convert(data))
+
+    def take_remaining_audio(self) -> bytes:
+        """デコーダーやフィルタに残っている分も含めて、未処理の音声をすべて取り出す"""
+        if self.decoder is not None:
+            self.audio_buffer.add_data(self.decoder.flush())
+        else:
+            self.audio_buffer.add_data(self.pcm_input.flush())
+        return self.audio_buffer.get_remaining_data()
+
+    @property
+    def session_seconds(self) -> float:
+        """ここまでに処理した音声の長さ（秒）"""
+        return self.processed_samples / self.audio_buffer.sample_rate
+
+    def _track_load(self, audio_seconds: float) -> ContextManager[None]:
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.track(audio_seconds)
+
+    def _extract_features(self, pcm_data: bytes) -> ChunkFeatures:
+        """16kHz入力の波形とパワースペクトログラムを逐次計算"""
+        pcm_data = pcm_data[: len(pcm_data) // 2 * 2]
+        samples = np.frombuffer(pcm_data, np.int16).astype(np.float32) / 32768.0
+        recording = self.recording
+        if recording is not None:
+            if self.processed_samples == 0 and self.remote is None:
+                # 最終パスのモデルがロード済みならメルも保持する（ワーカーでは使えない）
+                recording.n_mels = whisper_manager.mel_bins(self.final_model)
+            recording.append(pcm_data)
+
+        start_frame = self.processed_samples // HOP_LENGTH
+        self.spectrogram.extend(samples)
+        self.processed_samples += len(samples)
+        end_frame = self.processed_samples // HOP_LENGTH
+
+        power = self.spectrogram.frames(start_frame, end_frame)
+        if recording is not None and recording.keeps_mel:
+            # 確定済みのフレームだけを保持する（未確定の末尾は最終パスで計算する）
+            committed = min(end_frame, self.spectrogram.num_frames)
+            recording.add_frames(
+                self.spectrogram.frames(recording.mel_frame_count, committed)
+            )
+        self.spectrogram.discard_before(end_frame)
+        return samples, power
+
+    def _transcribe(
+        self,
+        pcm_data: bytes,
+        features: ChunkFeatures,
+        model_name: str,
+        timings: StageTimings | None = None,
+        priority: str = "realtime",
+    ) -> Dict[str, Any]:
+        """16-bit PCMを文字起こし（ライブのチャンクと最終結果は realtime で推論する）"""
+        samples, power = features
+        result = (self.remote or whisper_manager).transcribe(
+            samples,
+            model_name,
+            self.effective_language,
+            spectrogram=power,
+            profile=self.profile,
+            timings=timings,
+            priority=priority,
+            client=self.client,
+        )
+        self._remember_language(result)
+        return result
 
     async def process_audio_chunk(self, chunk_data: bytes) -> Dict[str, Any] | None:
         if len(chunk_data) < 1000:  # 最小チャンクサイズチェック
             return None
 
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                with wave.open(temp_file.name, "wb") as wav_file:
-                    wav_file.setnchannels(1)
-                    wav_file.setsampwidth(2)
-                    wav_file.setframerate(self.audio_buffer.sample_rate)
-                    wav_file.writeframes(chunk_data)
-
-                result = whisper_manager.transcribe(
-                    temp_file.name, self.model_name, self.language
+            started = time.perf_counter()
+            timings = StageTimings() if settings.stage_timings_enabled else None
+            if timings is None:
+                features = self._extract_features(chunk_data)
+            else:
+                with timings.measure("features"):
+                    features = self._extract_features(chunk_data)
+            with self._track_load(self.audio_buffer.seconds(chunk_data)):
+                result = await asyncio.to_thread(
+                    self._transcribe, chunk_data, features, self.model_name, timings
                 )
 
-                Path(temp_file.name).unlink()
+            self.chunk_counter += 1
+            start = self.chunk_counter * self.audio_buffer.chunk_duration
+            end = (self.chunk_counter + 1) * self.audio_buffer.chunk_duration
+            if self.revision_model:
+                self._schedule_revision(
+                    (self.chunk_counter, start, end, chunk_data, features)
+                )
 
-                self.chunk_counter += 1
-                return {
-                    "text": result["text"],
-                    "start": self.chunk_counter * self.audio_buffer.chunk_duration,
-                    "end": (self.chunk_counter + 1) * self.audio_buffer.chunk_duration,
-                    "chunk_id": self.chunk_counter,
-                }
+            partial = {
+                "text": result["text"],
+                "start": start,
+                "end": end,
+                "chunk_id": self.chunk_counter,
+                "decoding_profile": self.profile,
+                "language": self.detected_language or result.get("language"),
+                "language_probability": self.language_probability,
+            }
+            if timings is not None:
+                timings.add("total", time.perf_counter() - started)
+                partial["timings"] = timings.as_milliseconds()
+            self.recent_partials.append(partial)
+            return partial
 
         except Exception as e:
             logger.error(f"Chunk processing failed: {str(e)}")
             return None
 
+    def _schedule_revision(self, job: RevisionJob) -> None:
+        self._revision_queue.put_nowait(job)
+        if self._revision_worker is None or self._revision_worker.done():
+            self._revision_worker = asyncio.create_task(self._run_revisions())
+
+    async def _run_revisions(self) -> None:
+        """確定済みチャンクを順番に大きいモデルで再文字起こしする"""
+        while True:
+            job = await self._revision_queue.get()
+            try:
+                revised = await self._revise_chunk(job)
+                if revised and self.on_revision:
+                    await self.on_revision(revised)
+                elif revised:
+                    self.missed_revisions.append(revised)
+            except Exception as e:
+                logger.error(f"Chunk revision failed: {str(e)}")
+            finally:
+                self._revision_queue.task_done()
+
+    async def _revise_chunk(self, job: RevisionJob) -> Dict[str, Any] | None:
+        chunk_id, start, end, pcm_data, features = job
+        assert self.revision_model is not None
+        with self._track_load(self.audio_buffer.seconds(pcm_data)):
+            # 再文字起こしはライブのチャンクより後に回す
+            result = await asyncio.to_thread(
+                self._transcribe,
+                pcm_data,
+                features,
+                self.revision_model,
+                None,
+                "interactive",
+            )
+        self.apply_revision(chunk_id, result["text"])
+        return {
+            "text": result["text"],
+            "start": start,
+            "end": end,
+            "chunk_id": chunk_id,
+            "model_used": self.revision_model,
+        }
+
+    async def wait_for_revisions(self) -> None:
+        """送信待ちの再文字起こしがすべて完了するまで待つ"""
+        if self._revision_worker is not None:
+            await self._revision_queue.join()
+
+    def cancel_revisions(self) -> None:
+        if self._revision_worker is not None:
+            self._revision_worker.cancel()
+
+    def close(self) -> None:
+        """セッションの終了時に呼び出す（再文字起こしを止め、保持していた音声を破棄する）"""
+        self.cancel_revisions()
+        if self.recording is not None:
+            self.recording.close()
+            self.recording = None
+
+    def _accumulated_result(self) -> Dict[str, Any]:
+        """チャンクごとの結果をつなげた最終結果"""
+        return {
+            "text": self.accumulated_text,
+            "language": self.detected_language or "unknown",
+            "language_probability": self.language_probability,
+            "segments": [],
+            "model_used": self.final_model,
+            "decoding_profile": self.profile,
+        }
+
     async def process_final_audio(self, remaining_data: bytes) -> Dict[str, Any]:
+        await self.wait_for_revisions()
+        self.cancel_revisions()
+
         if len(remaining_data) < 100:
-            return {
-                "text": self.accumulated_text,
-                "language": "unknown",
-                "segments": [],
-                "model_used": self.model_name,
-            }
+            return self._accumulated_result()
 
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                with wave.open(temp_file.name, "wb") as wav_file:
-                    wav_file.setnchannels(1)
-                    wav_file.setsampwidth(2)
-                    wav_file.setframerate(self.audio_buffer.sample_rate)
-                    wav_file.writeframes(remaining_data)
-
-                result = whisper_manager.transcribe(
-                    temp_file.name, self.model_name, self.language
+            features = self._extract_features(remaining_data)
+            with self._track_load(self.audio_buffer.seconds(remaining_data)):
+                return await asyncio.to_thread(
+                    self._transcribe, remaining_data, features, self.final_model
                 )
-                Path(temp_file.name).unlink()
-
-                return result
 
         except Exception as e:
             logger.error(f"Final processing failed: {str(e)}")
-            return {
-                "text": self.accumulated_text,
-                "language": "unknown",
-                "segments": [],
-                "model_used": self.model_name,
-            }
+            return self._accumulated_result()
+
+    def _transcribe_session(
+        self,
+        pcm: np.ndarray,
+        log_mel: torch.Tensor | None,
+        on_segments: Callable[[List[Dict[str, Any]]], None],
+    ) -> Dict[str, Any]:
+        # 長い音声になるため、ライブのチャンクより後に回す
+        result = (self.remote or whisper_manager).transcribe(
+            pcm,
+            self.final_model,
+            self.effective_language,
+            profile=self.profile,
+            priority="interactive",
+            client=self.client,
+            log_mel=log_mel,
+            on_segments=on_segments,
+        )
+        self._remember_language(result)
+        return result
 
-    def add_partial_text(self, text: str) -> None:
+    async def process_session_audio(
+        self, remaining_data: bytes, on_segments: SegmentsCallback | None = None
+    ) -> Dict[str, Any]:
+        """セッション全体を final_model で文字起こしし直す（final_pass="full"）
+
+        保持していた音声と、チャンクの処理で計算済みのメルを使う。30秒窓ごとに
+        確定したセグメントを on_segments で順に渡し、すべてを含む最終結果を返す。
+        失敗した場合はチャンクごとの結果をつなげたものを返す。
+        """
+        recording = self.recording
+        if recording is None:
+            return await self.process_final_audio(remaining_data)
+        await self.wait_for_revisions()
+        self.cancel_revisions()
+
+        loop = asyncio.get_running_loop()
+
+        def send_segments(segments: List[Dict[str, Any]]) -> None:
+            # 推論スレッドから送信し、送り終わるまで次の窓に進まない
+            if on_segments is not None:
+                asyncio.run_coroutine_threadsafe(on_segments(segments), loop).result()
+
+        try:
+            if remaining_data:
+                self._extract_features(remaining_data)
+            if recording.num_samples == 0:
+                return self._accumulated_result()
+
+            log_mel = None
+            if recording.keeps_mel:
+                end_frame = self.processed_samples // HOP_LENGTH
+                tail = self.spectrogram.frames(recording.mel_frame_count, end_frame)
+                log_mel = recording.log_mel(tail)
+            # float32 への変換はメルを計算し直す場合だけ行う
+            pcm = recording.pcm()
+            with self._track_load(self.session_seconds):
+                return await asyncio.to_thread(
+                    self._transcribe_session, pcm, log_mel, send_segments
+                )
+
+        except Exception as e:
+            logger.error(f"Full-session final processing failed: {str(e)}")
+            return self._accumulated_result()
+        finally:
+            recording.close()
+            self.recording = None
+
+    def partials_after(self, chunk_id: int) -> List[Dict[str, Any]]:
+        """chunk_id より後の部分結果（再接続したクライアントが受け取っていないもの）"""
+        return [
+            partial
+            for partial in self.recent_partials
+            if partial["chunk_id"] > chunk_id
+        ]
+
+    def add_partial_text(self, text: str, chunk_id: int | None = None) -> None:
+        if chunk_id is not None:
+            self.chunk_texts[chunk_id] = text.strip()
         if text.strip():
             self.accumulated_text += " " + text.strip()
+
+    def apply_revision(self, chunk_id: int, text: str) -> None:
+        """チャンクの部分結果を再文字起こし結果で置き換える"""
+        self.chunk_texts[chunk_id] = text.strip()
+        self.accumulated_text = "".join(
+            " " + chunk_text for chunk_text in self.chunk_texts.values() if chunk_text
+        )
@@ -1,14 +1,35 @@
 import whisper  # type: ignore
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Set, Tuple
 import logging
 import os
 import re
+import threading
+import time
 from pathlib import Path
 
+import numpy as np
+import torch
+from whisper.audio import CHUNK_LENGTH, HOP_LENGTH, SAMPLE_RATE  # type: ignore
+
+from ..core import metrics
 from ..core.config import settings
+from ..core.cpu import active_cpu_config
+from ..core.exceptions import RequestCancelledError
+from ..core.timing import StageTimings
+from .audio_cache import AudioDecodeCache
+from .cancellation import Cancellation
+from .decoder import transcribe_mel
+from .decoding_profiles import get_decoding_profile
+from .mel_frontend import LogMelFrontend
+from .model_pool import ModelReplicaPool
+from .model_version import ModelVersion, file_fingerprint
+from .resampler import as_float32
 
 logger = logging.getLogger(__name__)
 
+# 言語を自動判定する場合の言語コード
+AUTO_LANGUAGE = "auto"
+
 # 標準のWhisperモデル
 STANDARD_MODELS = [
     "tiny",
@@ -26,6 +47,28 @@ class WhisperModelManager:
         self.loaded_models: Dict[str, Any] = {}
         self.model_dir = settings.model_cache_dir
         self.model_dir.mkdir(parents=True, exist_ok=True)
+        self.audio_cache: AudioDecodeCache | None = None
+        if settings.audio_cache_enabled:
+            self.audio_cache = AudioDecodeCache(
+                settings.audio_cache_dir, settings.audio_cache_max_bytes
+            )
+        self.frontend = LogMelFrontend()
+        # decodeはモデルにkv-cacheフックを登録するため、同一モデルオブジェクトの
+        # 同時実行を防ぎ、レプリカを貸し出して並列に推論する
+        self._pools: Dict[str, ModelReplicaPool] = {}
+        self._pools_guard = threading.Lock()
+        self._load_lock = threading.Lock()
+        # カスタムモデルのファイルが更新されたら、バックグラウンドで新しい版をロードして
+        # 切り替える。古い版のプールは処理中の推論が終わるまで retired に残す
+        self.versions: Dict[str, ModelVersion] = {}
+        self.reload_interval = settings.model_reload_interval
+        self._checked_at: Dict[str, float] = {}
+        self._reloading: Set[str] = set()
+        self._failed_fingerprints: Dict[str, Tuple[int, int]] = {}
+        self._retired: List[ModelReplicaPool] = []
+        # ゲージに反映済みのロード済みモデル数とバイト数
+        self._reported_models = 0
+        self._reported_bytes = 0
 
     def _scan_local_models(self) -> List[str]:
         """ローカルに保存されたモデルファイルをスキャン（標準モデル + カスタムモデル）"""
@@ -122,7 +165,7 @@ class WhisperModelManager:
         is_custom = self.is_custom_model(model_name)
         is_loaded = model_name in self.loaded_models
 
-        info = {
+        info: Dict[str, Any] = {
             "model": model_name,
             "exists": True,
             "is_custom": is_custom,
@@ -145,6 +188,16 @@ class WhisperModelManager:
                     model_file.stat().st_mtime if model_file.exists() else 0
                 )
 
+        version = self.versions.get(model_name) if is_loaded else None
+        info["version"] = version.version if version else None
+        info["loaded_at"] = version.loaded_at if version else None
+        info["load_time"] = version.load_time if version else None
+        info["reloading"] = model_name in self._reloading
+
+        pool = self._pools.get(model_name)
+        info["replicas"] = pool.replicas if pool else settings.model_replicas
+        info["cpu"] = active_cpu_config().as_dict()
+
         return info
 
     def load_model(self, model_name: str) -> Any:
@@ -153,58 +206,363 @@ class WhisperModelManager:
                 f"Invalid model name: {model_name}. Available models: {self.get_available_models()}"
             )
 
-        if model_name not in self.loaded_models:
-            logger.info(f"Loading Whisper model: {model_name}")
+        model = self.loaded_models.get(model_name)
+        if model is not None:
+            self._reload_if_due(model_name)
+            return model
+        with self._load_lock:
+            if model_name not in self.loaded_models:
+                self._load_model(model_name)
+        return self.loaded_models[model_name]
 
-            try:
-                if self.is_custom_model(model_name):
-                    # カスタムモデル（ファインチューニング済み）のロード
-                    model_path = self.get_model_path(model_name)
-                    if not model_path:
-                        raise ValueError(f"Custom model file not found: {model_name}")
-
-                    logger.info(f"Loading custom model from: {model_path}")
-                    model = whisper.load_model(model_path)
-                    logger.info(f"Custom model {model_name} loaded successfully")
-                else:
-                    # 標準モデルのロード
-                    # モデルをカスタムディレクトリに保存するための環境変数設定
-                    os.environ["WHISPER_CACHE"] = str(self.model_dir)
+    def _load_model(self, model_name: str) -> None:
+        """モデルファイルを読み込む（_load_lock を保持して呼び出す）"""
+        logger.info(f"Loading Whisper model: {model_name}")
+        started = time.perf_counter()
 
-                    model = whisper.load_model(
-                        model_name, download_root=str(self.model_dir)
-                    )
-                    logger.info(f"Standard model {model_name} loaded successfully")
+        try:
+            version = ModelVersion()
+            if self.is_custom_model(model_name):
+                # カスタムモデル（ファインチューニング済み）のロード
+                model_path = self.get_model_path(model_name)
+                if not model_path:
+                    raise ValueError(f"Custom model file not found: {model_name}")
+
+                logger.info(f"Loading custom model from: {model_path}")
+                version = ModelVersion.of_file(model_path)
+                model = whisper.load_model(model_path)
+                logger.info(
+                    f"Custom model {model_name} (version {version.version}) "
+                    "loaded successfully"
+                )
+            else:
+                # 標準モデルのロード
+                # モデルをカスタムディレクトリに保存するための環境変数設定
+                os.environ["WHISPER_CACHE"] = str(self.model_dir)
 
-                self.loaded_models[model_name] = model
+                model = whisper.load_model(
+                    model_name, download_root=str(self.model_dir)
+                )
+                logger.info(f"Standard model {model_name} loaded successfully")
 
-            except Exception as e:
-                logger.error(f"Failed to load model {model_name}: {str(e)}")
-                raise Exception(f"Failed to load model {model_name}: {str(e)}")
+            version.load_time = time.perf_counter() - started
+            version.loaded_at = time.time()
+            self.loaded_models[model_name] = model
+            self.versions[model_name] = version
+            self._checked_at[model_name] = time.monotonic()
+            metrics.MODEL_LOAD_SECONDS.labels(model_name).observe(version.load_time)
+            self._update_loaded_model_metrics()
 
-        return self.loaded_models[model_name]
+        except Exception as e:
+            logger.error(f"Failed to load model {model_name}: {str(e)}")
+            raise Exception(f"Failed to load model {model_name}: {str(e)}")
+
+    def _reload_if_due(self, model_name: str) -> None:
+        """前回の確認から reload_interval 秒以上経っていればファイルの更新を確認する"""
+        if self.reload_interval <= 0 or model_name in self._reloading:
+            return
+        now = time.monotonic()
+        if now - self._checked_at.get(model_name, 0.0) < self.reload_interval:
+            return
+        self._checked_at[model_name] = now
+        self.reload_if_changed(model_name)
+
+    def reload_if_changed(self, model_name: str) -> threading.Thread | None:
+        """カスタムモデルのファイルが変わっていれば新しい版のロードを開始する
+
+        ロードはバックグラウンドのスレッドで行い、その間は現在の版で推論を続ける。
+        開始したスレッドを返す（更新がなければ None）。
+        """
+        version = self.versions.get(model_name)
+        if version is None or version.fingerprint is None:
+            return None
+        model_path = self.get_model_path(model_name)
+        if model_path is None:
+            return None
+        try:
+            fingerprint = file_fingerprint(model_path)
+        except OSError:
+            return None
+        if fingerprint in (
+            version.fingerprint,
+            self._failed_fingerprints.get(model_name),
+        ):
+            return None
+
+        with self._pools_guard:
+            if model_name in self._reloading:
+                return None
+            self._reloading.add(model_name)
+        thread = threading.Thread(
+            target=self._reload_model,
+            args=(model_name, model_path),
+            name=f"reload-{model_name}",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _reload_model(self, model_name: str, model_path: str) -> None:
+        try:
+            self._swap_model(model_name, model_path)
+        except Exception as e:
+            logger.error(f"Failed to reload model {model_name}: {str(e)}")
+            # 同じファイルのロードを繰り返さない（次に更新されたら再度試す）
+            try:
+                self._failed_fingerprints[model_name] = file_fingerprint(model_path)
+            except OSError:
+                pass
+        finally:
+            with self._pools_guard:
+                self._reloading.discard(model_name)
+        self._release_retired()
+
+    def _swap_model(self, model_name: str, model_path: str) -> None:
+        """新しい版をロードし、ロード済みのモデルとプールをまとめて切り替える"""
+        started = time.perf_counter()
+        version = ModelVersion.of_file(model_path)
+        current = self.versions.get(model_name)
+        if current is not None and version.version == current.version:
+            # 内容が同じ（touch されただけ）なら変更検出用の値だけ更新する
+            current.fingerprint = version.fingerprint
+            return
+
+        logger.info(
+            f"Loading version {version.version} of custom model {model_name} "
+            "in the background"
+        )
+        model = whisper.load_model(model_path)
+        cpu = active_cpu_config()
+        pool = ModelReplicaPool(
+            model, settings.model_replicas, cpu.intra_op_threads, cpu.replica_cores
+        )
+        version.load_time = time.perf_counter() - started
+        version.loaded_at = time.time()
+
+        with self._load_lock:
+            if model_name not in self.loaded_models:
+                # ロード中に解放された
+                return
+            with self._pools_guard:
+                old_pool = self._pools.get(model_name)
+                self.loaded_models[model_name] = model
+                self._pools[model_name] = pool
+                self.versions[model_name] = version
+                self._failed_fingerprints.pop(model_name, None)
+                if old_pool is not None:
+                    self._retired.append(old_pool)
+            metrics.MODEL_LOAD_SECONDS.labels(model_name).observe(version.load_time)
+            self._update_loaded_model_metrics()
+        logger.info(
+            f"Switched custom model {model_name} from version "
+            f"{current.version if current else None} to {version.version}"
+        )
+
+    def _release_retired(self) -> None:
+        """切り替え前の版のプールのうち、処理中の推論がなくなったものを解放する"""
+        with self._pools_guard:
+            if not self._retired:
+                return
+            busy = [pool for pool in self._retired if pool.in_use]
+            released = len(self._retired) - len(busy)
+            self._retired = busy
+        if released:
+            logger.info(f"Released {released} previous model version(s)")
+
+    def unload_model(self, model_name: str) -> bool:
+        """ロード済みのモデルを解放（処理中の推論は借りたレプリカで最後まで実行される）"""
+        with self._load_lock:
+            if self.loaded_models.pop(model_name, None) is None:
+                return False
+            with self._pools_guard:
+                self._pools.pop(model_name, None)
+                self.versions.pop(model_name, None)
+            self._update_loaded_model_metrics()
+        logger.info(f"Unloaded Whisper model: {model_name}")
+        return True
+
+    def _update_loaded_model_metrics(self) -> None:
+        """ロード済みモデルの増減をゲージに加える
+
+        同じプロセスの複数のマネージャー（APIのDIコンテナとストリーミング・ワーカーの
+        whisper_manager）が同じゲージを使うため、値を上書きせずに差分だけを反映する。
+        """
+        count = len(self.loaded_models)
+        size = sum(estimate_model_bytes(model) for model in self.loaded_models.values())
+        metrics.LOADED_MODELS.inc(count - self._reported_models)
+        metrics.LOADED_MODEL_BYTES.inc(size - self._reported_bytes)
+        self._reported_models = count
+        self._reported_bytes = size
+
+    def mel_bins(self, model_name: str) -> int | None:
+        """ロード済みモデルの入力のメル帯域数（ロードされていなければ None）"""
+        model = self.loaded_models.get(model_name)
+        return model.dims.n_mels if model is not None else None
+
+    def get_pool(self, model_name: str) -> ModelReplicaPool:
+        """モデルのレプリカプールを取得（初回はモデルをロードして作成）"""
+        model = self.load_model(model_name)
+        with self._pools_guard:
+            # ロード後に新しい版へ切り替わっていれば、そちらのプールを使う
+            model = self.loaded_models.get(model_name, model)
+            pool = self._pools.get(model_name)
+            if pool is None or pool.model is not model:
+                cpu = active_cpu_config()
+                pool = ModelReplicaPool(
+                    model,
+                    settings.model_replicas,
+                    cpu.intra_op_threads,
+                    cpu.replica_cores,
+                )
+                self._pools[model_name] = pool
+            return pool
+
+    def load_audio(self, audio: str | np.ndarray) -> np.ndarray:
+        """音声を16kHz モノラル float32で取得（キャッシュ有効時はデコードを省略）"""
+        if not isinstance(audio, str):
+            return audio
+        if self.audio_cache is None:
+            decoded: np.ndarray = whisper.load_audio(audio)
+            return decoded
+        return self.audio_cache.load(audio)
 
     def transcribe(
-        self, audio_file_path: str, model_name: str = "base", language: str = "ja"
+        self,
+        audio: str | np.ndarray,
+        model_name: str = "base",
+        language: str = "ja",
+        spectrogram: torch.Tensor | None = None,
+        profile: str = "balanced",
+        timings: StageTimings | None = None,
+        priority: str = "interactive",
+        client: str = "",
+        cancel: Cancellation | None = None,
+        log_mel: torch.Tensor | None = None,
+        on_segments: Callable[[List[Dict[str, Any]]], None] | None = None,
     ) -> Dict[str, Any]:
-        model = self.load_model(model_name)
+        """音声を文字起こし
+
+        audio はファイルパスまたは16kHz モノラルの波形（float32 または16-bit PCM）。
+        16-bit PCMはメルを計算する場合だけ float32 に変換する。
+        spectrogram（パワースペクトログラム）が渡された場合はSTFTを省略する。
+        log_mel（正規化前のlog10 mel）のメル帯域数がモデルと一致する場合は
+        メルの計算も省略する。
+        profile はデコードプロファイル名（fast / balanced / accurate）。
+        language が "auto" の場合は先頭30秒の窓から言語を判定する。
+        timings を渡すと段階ごとの所要時間（model_load, audio_decode, model_wait,
+        mel, encode, decode）を記録する。
+        priority（realtime / interactive / batch）と client はレプリカを待つ順序に使い、
+        長い音声は30秒窓ごとに優先度の高い仕事へレプリカを譲る。
+        cancel が打ち切られた場合、レプリカを待っている間なら RequestCancelledError を
+        送出し、処理を始めた後なら次の30秒窓の前で止めて truncated=True の
+        途中結果を返す。
+        on_segments は30秒窓ごとに確定したセグメントを渡して呼び出す。
+        """
+        if timings is None:
+            timings = StageTimings()
+        decoding_profile = get_decoding_profile(profile)
+        with timings.measure("model_load"):
+            pool = self.get_pool(model_name)
 
         try:
+            source = audio if isinstance(audio, str) else "in-memory audio"
             logger.info(
-                f"Starting transcription for: {audio_file_path} with model: {model_name}"
+                f"Starting transcription for: {source} with model: {model_name}"
+            )
+            if spectrogram is None:
+                if isinstance(audio, str):
+                    with timings.measure("audio_decode"):
+                        samples = self.load_audio(audio)
+                    metrics.AUDIO_DECODE_SECONDS.labels(model_name).observe(
+                        timings.get("audio_decode")
+                    )
+                else:
+                    samples = audio
+                audio_seconds = len(samples) / SAMPLE_RATE
+            else:
+                audio_seconds = spectrogram.shape[-1] * HOP_LENGTH / SAMPLE_RATE
+
+            def cancelled() -> str | None:
+                return cancel.reason if cancel is not None else None
+
+            wait_started = time.perf_counter()
+            with (
+                pool.lease(
+                    priority,
+                    client,
+                    min(audio_seconds, CHUNK_LENGTH),
+                    cancelled if cancel is not None else None,
+                ) as lease,
+                metrics.INFERENCE_IN_PROGRESS.track_inprogress(),
+            ):
+                timings.add("model_wait", time.perf_counter() - wait_started)
+                model = lease.model
+
+                def checkpoint(window_seconds: float) -> Any:
+                    if cancelled() is not None:
+                        return None
+                    # 譲って待った時間もレプリカの待ち時間に含める
+                    with timings.measure("model_wait"):
+                        try:
+                            return lease.checkpoint(window_seconds)
+                        except RequestCancelledError:
+                            return None
+
+                with timings.measure("mel"):
+                    if log_mel is not None and log_mel.shape[0] == model.dims.n_mels:
+                        mel = self.frontend.from_log10_mel(log_mel)
+                    elif spectrogram is None:
+                        mel = self.frontend.compute(
+                            as_float32(samples), model.dims.n_mels
+                        )
+                    else:
+                        mel = self.frontend.from_power(spectrogram, model.dims.n_mels)
+                result = transcribe_mel(
+                    model,
+                    mel,
+                    language=None if language == AUTO_LANGUAGE else language,
+                    timings=timings,
+                    checkpoint=checkpoint,
+                    on_segments=on_segments,
+                    **decoding_profile.decode_options(),
+                )
+
+            inference_seconds = sum(
+                timings.get(stage) for stage in ("mel", "encode", "decode")
             )
-            result = model.transcribe(audio_file_path, language=language)
+            metrics.INFERENCE_SECONDS.labels(model_name).observe(inference_seconds)
+            if audio_seconds > 0:
+                metrics.REALTIME_FACTOR.labels(model_name).observe(
+                    inference_seconds / audio_seconds
+                )
 
             return {
                 "text": result["text"].strip(),
                 "language": result["language"],
+                "language_probability": result.get("language_probability"),
                 "segments": result["segments"],
                 "model_used": model_name,
+                "decoding_profile": decoding_profile.name,
+                "truncated": result.get("truncated", False),
             }
 
+        except RequestCancelledError:
+            logger.info(f"Transcription cancelled before start: {cancelled()}")
+            raise
         except Exception as e:
             logger.error(f"Transcription failed: {str(e)}")
             raise Exception(f"Transcription failed: {str(e)}")
+        finally:
+            self._release_retired()
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """モデルのパラメータとバッファの合計バイト数を見積もる"""
+    try:
+        tensors = [*model.parameters(), *model.buffers()]
+    except (AttributeError, TypeError):
+        return 0
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
 
 
 # グローバルインスタンス
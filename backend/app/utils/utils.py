@@ -1,3 +1,4 @@
+import io
 import tempfile
 import wave
 from pathlib import Path
@@ -5,6 +6,9 @@ from pathlib import Path
 from ..core.config import settings
 from ..core.exceptions import AudioProcessingError
 
+# WAV以外の圧縮音声の長さを見積もるためのビットレート（128kbps）
+ASSUMED_BYTES_PER_SECOND = 128_000 // 8
+
 
 class AudioFileProcessor:
     """音声ファイル処理のユーティリティクラス"""
@@ -48,6 +52,23 @@ class AudioFileProcessor:
         except Exception as e:
             raise AudioProcessingError("get_audio_info", str(e))
 
+    @staticmethod
+    def estimate_duration(data: bytes) -> float:
+        """音声データの長さ（秒）を見積もる（WAV以外はビットレートから推定）"""
+        duration = AudioFileProcessor.wav_duration(data)
+        if duration is None:
+            return len(data) / ASSUMED_BYTES_PER_SECOND
+        return duration
+
+    @staticmethod
+    def wav_duration(data: bytes) -> float | None:
+        """WAVヘッダーから音声の長さ（秒）を取得（WAVでなければ None）"""
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wav_file:
+                return wav_file.getnframes() / wav_file.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            return None
+
     @staticmethod
     def save_uploaded_file(file_content: bytes, suffix: str = ".tmp") -> Path:
         """アップロードされたファイルを一時保存"""
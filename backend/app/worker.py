@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+推論ワーカープロセス
+
+INFERENCE_MODE=remote の場合、APIプロセスは推論を行わずにブローカーへタスクを送る。
+このプロセスがタスクを受け取り、モデルをロードして文字起こしする。
+APIとは別に台数を増減できる。
+
+使用例:
+  # ローカルのキュー（Unixソケット）を起動
+  python -m app.worker --serve-broker
+  # 推論ワーカーを起動（必要な数だけ）
+  python -m app.worker
+"""
+
+import argparse
+import logging
+import signal
+from types import FrameType
+
+from .core.config import settings
+from .core.cpu import configure_cpu
+from .services.inference_broker import create_broker, serve_local_store
+from .services.remote_inference import InferenceWorker
+from .services.whisper_service import whisper_manager
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Whisper推論ワーカー")
+    parser.add_argument(
+        "--serve-broker",
+        action="store_true",
+        help="INFERENCE_BROKER_URL（unix://）でローカルのキューを公開する",
+    )
+    parser.add_argument(
+        "--preload", nargs="*", default=[], help="起動時にロードするモデル"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.log_level)
+
+    authkey = settings.inference_broker_authkey.encode()
+    if args.serve_broker:
+        if not settings.inference_broker_url.startswith("unix://"):
+            parser.error("--serve-broker requires a unix:// INFERENCE_BROKER_URL")
+        try:
+            serve_local_store(settings.inference_broker_url[len("unix://") :], authkey)
+        except (ValueError, PermissionError) as e:
+            parser.error(str(e))
+        return
+
+    configure_cpu()
+    for model_name in args.preload:
+        whisper_manager.load_model(model_name)
+
+    worker = InferenceWorker(
+        create_broker(settings.inference_broker_url, authkey),
+        whisper_manager,
+        threads=settings.model_replicas,
+        max_models=settings.worker_max_models,
+    )
+
+    def stop(signum: int, frame: FrameType | None) -> None:
+        # 処理中のタスクを終えてから終了する
+        logger.info("Stopping inference worker")
+        worker.stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(
+        f"Inference worker {worker.worker_id} started ({worker.threads} threads)"
+    )
+    worker.run(settings.worker_heartbeat_interval)
+
+
+if __name__ == "__main__":
+    main()
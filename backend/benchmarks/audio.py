@@ -0,0 +1,92 @@
+"""ベンチマーク用の決定的な合成音声"""
+
+import io
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+AUDIO_KINDS = ("tone", "speech", "noise")
+
+
+def tone(duration: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """440Hzと880Hzのサイン波（demo/create_test_audio.py と同じ構成）"""
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    audio = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 880 * t)
+    return apply_fade(audio, sample_rate)
+
+
+def speech_like(
+    duration: float, sample_rate: int = SAMPLE_RATE, seed: int = 0
+) -> np.ndarray:
+    """音節ごとに基本周波数と音量が変わる音声らしい信号
+
+    0.2〜0.4秒の音節と短い無音を交互に並べ、基本周波数（120〜300Hz）に
+    倍音と弱いノイズを加える。seed が同じなら常に同じ波形になる。
+    """
+    rng = np.random.default_rng(seed)
+    num_samples = int(sample_rate * duration)
+    audio = np.zeros(num_samples)
+
+    position = 0
+    while position < num_samples:
+        syllable = int(sample_rate * rng.uniform(0.2, 0.4))
+        end = min(position + syllable, num_samples)
+        t = np.arange(end - position) / sample_rate
+        f0 = rng.uniform(120, 300) * (
+            1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+        )
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voiced = sum(
+            amplitude * np.sin(harmonic * phase)
+            for harmonic, amplitude in ((1, 0.6), (2, 0.25), (3, 0.12), (4, 0.06))
+        )
+        envelope = np.sin(np.pi * np.arange(end - position) / (end - position))
+        audio[position:end] = envelope * voiced
+
+        pause = int(sample_rate * rng.uniform(0.05, 0.15))
+        position = end + pause
+
+    audio += 0.02 * rng.standard_normal(num_samples)
+    return apply_fade(0.5 * audio, sample_rate)
+
+
+def noise(duration: float, sample_rate: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """白色雑音（無音判定やフォールバックの多い最悪ケース）"""
+    rng = np.random.default_rng(seed)
+    return apply_fade(
+        0.1 * rng.standard_normal(int(sample_rate * duration)), sample_rate
+    )
+
+
+def apply_fade(audio: np.ndarray, sample_rate: int, fade: float = 0.1) -> np.ndarray:
+    fade_samples = min(int(sample_rate * fade), len(audio) // 2)
+    if fade_samples:
+        ramp = np.linspace(0.0, 1.0, fade_samples)
+        audio[:fade_samples] *= ramp
+        audio[-fade_samples:] *= ramp[::-1]
+    return audio.astype(np.float32)
+
+
+def generate(kind: str, duration: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """種類と長さを指定して合成音声を生成"""
+    if kind == "tone":
+        return tone(duration, sample_rate)
+    if kind == "speech":
+        return speech_like(duration, sample_rate)
+    if kind == "noise":
+        return noise(duration, sample_rate)
+    raise ValueError(f"Unknown audio kind: {kind}. Available kinds: {AUDIO_KINDS}")
+
+
+def to_wav_bytes(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """float32波形を16-bit モノラルWAVに変換"""
+    pcm = np.clip(np.round(audio * 32767), -32768, 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク結果をベースラインと比較し、劣化した項目を報告する
+
+使用例:
+  python -m benchmarks.compare results.json baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# 値が大きいほど悪い指標と、小さいほど悪い指標
+LOWER_IS_BETTER = ("latency_p50", "latency_p95", "mean_rtf")
+HIGHER_IS_BETTER = ("throughput",)
+MODEL_LOWER_IS_BETTER = ("cold_load_seconds", "peak_rss_mb")
+
+CaseKey = Tuple[str, float, int]
+
+
+def case_key(case: Dict[str, Any]) -> CaseKey:
+    return case["kind"], float(case["duration"]), int(case["concurrency"])
+
+
+def _check(
+    label: str,
+    metric: str,
+    current: float,
+    baseline: float,
+    tolerance: float,
+    higher_is_better: bool,
+) -> Dict[str, Any] | None:
+    if baseline <= 0:
+        return None
+    change = (current - baseline) / baseline
+    regressed = change < -tolerance if higher_is_better else change > tolerance
+    if not regressed:
+        return None
+    return {
+        "case": label,
+        "metric": metric,
+        "baseline": baseline,
+        "current": current,
+        "change": round(change, 4),
+    }
+
+
+def compare_results(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.15
+) -> List[Dict[str, Any]]:
+    """ベースラインより tolerance（割合）以上悪化した項目の一覧
+
+    モデルとケース（音声の種類・長さ・同時実行数）が両方にあるものだけを比較する。
+    """
+    regressions = []
+    baseline_models = {model["model"]: model for model in baseline["models"]}
+
+    for model in current["models"]:
+        base_model = baseline_models.get(model["model"])
+        if base_model is None:
+            continue
+
+        for metric in MODEL_LOWER_IS_BETTER:
+            if model.get(metric) is None or base_model.get(metric) is None:
+                continue
+            regression = _check(
+                model["model"],
+                metric,
+                model[metric],
+                base_model[metric],
+                tolerance,
+                higher_is_better=False,
+            )
+            if regression:
+                regressions.append(regression)
+
+        base_cases = {case_key(case): case for case in base_model["cases"]}
+        for case in model["cases"]:
+            base_case = base_cases.get(case_key(case))
+            if base_case is None:
+                continue
+            kind, duration, concurrency = case_key(case)
+            label = f"{model['model']}/{kind}/{duration:g}s/x{concurrency}"
+            for metrics, higher_is_better in (
+                (LOWER_IS_BETTER, False),
+                (HIGHER_IS_BETTER, True),
+            ):
+                for metric in metrics:
+                    regression = _check(
+                        label,
+                        metric,
+                        case[metric],
+                        base_case[metric],
+                        tolerance,
+                        higher_is_better,
+                    )
+                    if regression:
+                        regressions.append(regression)
+
+    return regressions
+
+
+def print_regressions(regressions: List[Dict[str, Any]], tolerance: float) -> None:
+    if not regressions:
+        print(f"✅ ベースラインからの劣化なし（許容 {tolerance:.0%}）")
+        return
+
+    print(f"❌ {len(regressions)} 件の劣化（許容 {tolerance:.0%}）")
+    for regression in regressions:
+        print(
+            f"  {regression['case']:<32} {regression['metric']:<18} "
+            f"{regression['baseline']:.4g} -> {regression['current']:.4g} "
+            f"({regression['change']:+.1%})"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ベンチマーク結果の比較")
+    parser.add_argument("results", type=Path, help="今回の結果（JSON）")
+    parser.add_argument("baseline", type=Path, help="ベースラインの結果（JSON）")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="許容する悪化の割合"
+    )
+    args = parser.parse_args()
+
+    current = json.loads(args.results.read_text())
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare_results(current, baseline, args.tolerance)
+    print_regressions(regressions, args.tolerance)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+文字起こしのスループット・レイテンシのベンチマーク
+
+モデルごとに別プロセスを起動し、プロセス内のアプリ（/transcribe）に対して
+コールドロード時間、ウォーム時のレイテンシ、リアルタイム係数、ピークRSSを
+同時実行数を変えながら計測する。ネットワークには接続しない
+（標準モデルは事前にダウンロード済みである必要がある）。
+
+使用例:
+  python -m benchmarks.run --models tiny base --output results.json
+  python -m benchmarks.run --random-model bench-random --models bench-random
+  python -m benchmarks.run --output results.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .audio import AUDIO_KINDS, generate, to_wav_bytes
+from .compare import compare_results, print_regressions
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# ベンチマーク中は受付制御とデコードキャッシュを無効にする
+WORKER_ENV = {
+    "MAX_QUEUE_DEPTH": "0",
+    "MAX_PENDING_AUDIO_SECONDS": "0",
+    "AUDIO_CACHE_ENABLED": "false",
+    "STAGE_TIMINGS_ENABLED": "false",
+}
+
+
+def peak_rss_mb() -> float:
+    """このプロセスのピークRSS（MB）"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / (1024 * 1024)  # macOSはバイト単位
+    return max_rss / 1024  # LinuxはKB単位
+
+
+def summarize(
+    kind: str,
+    duration: float,
+    concurrency: int,
+    latencies: List[float],
+    wall_seconds: float,
+) -> Dict[str, Any]:
+    """1ケース分の計測結果を集計"""
+    values = np.array(latencies)
+    return {
+        "kind": kind,
+        "duration": duration,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "latency_mean": round(float(values.mean()), 4),
+        "latency_p50": round(float(np.percentile(values, 50)), 4),
+        "latency_p95": round(float(np.percentile(values, 95)), 4),
+        "mean_rtf": round(float(values.mean()) / duration, 4),
+        # 1秒あたりに処理できた音声の秒数
+        "throughput": round(duration * len(latencies) / wall_seconds, 4),
+    }
+
+
+async def bench_model(
+    model: str,
+    kinds: List[str],
+    durations: List[float],
+    concurrency_levels: List[int],
+    repeats: int,
+    profile: str,
+    language: str,
+) -> Dict[str, Any]:
+    """プロセス内のアプリに対して1モデル分のベンチマークを実行"""
+    import httpx
+
+    from app.main import app
+
+    async def transcribe(client: httpx.AsyncClient, wav: bytes) -> float:
+        started = time.perf_counter()
+        response = await client.post(
+            "/transcribe",
+            files={"file": ("bench.wav", wav, "audio/wav")},
+            data={"model": model, "language": language, "profile": profile},
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        started = time.perf_counter()
+        response = await client.post(f"/models/{model}/load")
+        response.raise_for_status()
+        cold_load_seconds = time.perf_counter() - started
+
+        cases = []
+        for kind in kinds:
+            for duration in durations:
+                wav = to_wav_bytes(generate(kind, duration))
+                await transcribe(client, wav)  # ウォームアップ
+
+                for concurrency in concurrency_levels:
+                    latencies: List[float] = []
+                    wall_started = time.perf_counter()
+                    for _ in range(repeats):
+                        latencies.extend(
+                            await asyncio.gather(
+                                *(transcribe(client, wav) for _ in range(concurrency))
+                            )
+                        )
+                    wall_seconds = time.perf_counter() - wall_started
+                    case = summarize(
+                        kind, duration, concurrency, latencies, wall_seconds
+                    )
+                    print(
+                        f"  {model} {kind} {duration:g}s x{concurrency}: "
+                        f"p50={case['latency_p50']:.3f}s rtf={case['mean_rtf']:.3f}",
+                        file=sys.stderr,
+                    )
+                    cases.append(case)
+
+    return {
+        "model": model,
+        "cold_load_seconds": round(cold_load_seconds, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "cases": cases,
+    }
+
+
+def run_worker(model: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """モデルごとに新しいプロセスで計測する（コールドロードとピークRSSを分離するため）"""
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.run",
+        "--worker",
+        model,
+        "--kinds",
+        *args.kinds,
+        "--durations",
+        *[str(duration) for duration in args.durations],
+        "--concurrency",
+        *[str(level) for level in args.concurrency],
+        "--repeats",
+        str(args.repeats),
+        "--profile",
+        args.profile,
+        "--language",
+        args.language,
+    ]
+    completed = subprocess.run(
+        command,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **WORKER_ENV},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    if completed.returncode != 0:
+        return {"model": model, "error": f"worker exited with {completed.returncode}"}
+    result: Dict[str, Any] = json.loads(completed.stdout)
+    return result
+
+
+def create_random_model(name: str) -> Path:
+    """ネットワークなしで使える、tinyと同じ構成でランダム重みのカスタムモデルを作成"""
+    import torch
+    from whisper.model import ModelDimensions, Whisper  # type: ignore
+
+    from app.core.config import settings
+
+    model_path = settings.model_cache_dir / f"{name}.pt"
+    if model_path.exists():
+        return model_path
+
+    torch.manual_seed(0)
+    dims = ModelDimensions(
+        n_mels=80,
+        n_audio_ctx=1500,
+        n_audio_state=384,
+        n_audio_head=6,
+        n_audio_layer=4,
+        n_vocab=51865,
+        n_text_ctx=448,
+        n_text_state=384,
+        n_text_head=6,
+        n_text_layer=4,
+    )
+    model = Whisper(dims)
+    # 位置埋め込みは torch.empty で確保されるため明示的に初期化する
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(
+        {"dims": dims.__dict__, "model_state_dict": model.state_dict()}, model_path
+    )
+    return model_path
+
+
+def environment_info() -> Dict[str, Any]:
+    import torch
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="文字起こしベンチマーク")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base"])
+    parser.add_argument(
+        "--kinds", nargs="+", default=["tone", "speech"], choices=AUDIO_KINDS
+    )
+    parser.add_argument("--durations", nargs="+", type=float, default=[5.0, 30.0, 60.0])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="同時実行数ごとの繰り返し回数"
+    )
+    parser.add_argument("--profile", default="balanced", help="デコードプロファイル")
+    parser.add_argument("--language", default="ja", help="言語コード")
+    parser.add_argument(
+        "--random-model",
+        metavar="NAME",
+        help="ランダム重みのカスタムモデルをモデルディレクトリに作成する",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark_results.json"),
+        help="結果の出力先",
+    )
+    parser.add_argument("--baseline", type=Path, help="比較するベースラインの結果")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="許容する悪化の割合"
+    )
+    parser.add_argument("--worker", metavar="MODEL", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.worker:
+        result = asyncio.run(
+            bench_model(
+                args.worker,
+                args.kinds,
+                args.durations,
+                args.concurrency,
+                args.repeats,
+                args.profile,
+                args.language,
+            )
+        )
+        print(json.dumps(result))
+        return
+
+    if args.random_model:
+        model_path = create_random_model(args.random_model)
+        print(f"ランダム重みのモデル: {model_path}")
+
+    results: Dict[str, Any] = {"environment": environment_info(), "models": []}
+    for model in args.models:
+        print(f"🏃 {model} を計測中...")
+        results["models"].append(run_worker(model, args))
+
+    args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"📝 結果を保存しました: {args.output}")
+
+    failed = [model for model in results["models"] if "error" in model]
+    for model in failed:
+        print(f"⚠️  {model['model']}: {model['error']}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare_results(results, baseline, args.tolerance)
+        print_regressions(regressions, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -128,6 +128,7 @@ async def stream_transcription(
     model: str = "base",
     language: str = "ja",
     play_audio: bool = False,
+    revision_model: str | None = None,
 ) -> None:
     """WebSocketでストリーミング文字起こしを実行"""
 
@@ -146,6 +147,8 @@ async def stream_transcription(
         print("   初回のみ時間がかかる場合があります")
 
     url = f"ws://{host}:{port}/stream-transcribe?model={model}&language={language}"
+    if revision_model:
+        url += f"&revision_model={revision_model}"
     print(f"接続先: {url}")
     print(f"使用モデル: {model}")
     print(f"言語: {language}")
@@ -218,6 +221,10 @@ async def stream_transcription(
                         )
                         if data.get("type") == "partial":
                             pass
+                        elif data.get("type") == "revised":
+                            print(
+                                f"✏️  修正結果 (chunk {data.get('chunk_id', '?')}, {data.get('model_used')}): {data.get('text', '')}"
+                            )
                         elif data.get("type") == "final":
                             print()
                             print("=" * 50)
@@ -302,6 +309,12 @@ def main():
         help="音声チャンクサイズ (bytes) (default: 4096)",
     )
 
+    parser.add_argument(
+        "--revision-model",
+        default=None,
+        help="確定区間を再文字起こしする大きいモデル（カスケードモード）",
+    )
+
     parser.add_argument(
         "--play-audio",
         action="store_true",
@@ -331,6 +344,7 @@ def main():
                 args.model,
                 args.language,
                 args.play_audio,
+                args.revision_model,
             )
         )
         return 0
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+WebSocketストリーミング文字起こしAPIの負荷試験クライアント
+
+streaming.py と同じプロトコルで N 本のセッションを指定した間隔で開始し、
+各セッションで実時間のペースで音声を送信する。音声チャンクを送り終えてから
+対応する部分結果（partial）を受信するまでの時間と、end 送信から最終結果
+（final）までの時間を計測し、p50/p95/p99 とエラー・切断数を表示する。
+
+使用例:
+  python streaming_load.py audio.wav --sessions 20 --ramp 2
+  python streaming_load.py audio.wav --sessions 50 --ramp 5 --model tiny --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import websockets
+
+from streaming import check_model_status
+
+# 1回の送信で送る音声の長さ（streaming.py と同じ約0.1秒）
+SEND_INTERVAL = 0.1
+
+
+@dataclass
+class AudioSource:
+    pcm: bytes
+    sample_rate: int
+    channels: int
+    sample_width: int
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * self.channels * self.sample_width
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / self.bytes_per_second
+
+
+@dataclass
+class SessionResult:
+    session_id: int
+    chunk_latencies: List[float] = field(default_factory=list)
+    connect_time: float | None = None
+    time_to_final: float | None = None
+    error: str | None = None
+    disconnected: bool = False
+
+
+def load_wav(file_path: Path) -> AudioSource:
+    with wave.open(str(file_path), "rb") as wav_file:
+        return AudioSource(
+            pcm=wav_file.readframes(wav_file.getnframes()),
+            sample_rate=wav_file.getframerate(),
+            channels=wav_file.getnchannels(),
+            sample_width=wav_file.getsampwidth(),
+        )
+
+
+def percentile(values: List[float], q: float) -> float | None:
+    """最近傍順位法によるパーセンタイル"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_chunk_lag(metrics_text: str) -> tuple[float, float]:
+    """/metrics からサーバー側のチャンク遅延ヒストグラムの合計と件数を取得（全モデル分）"""
+    total = count = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith("whisper_stream_chunk_lag_seconds_sum"):
+            total += float(line.rsplit(" ", 1)[1])
+        elif line.startswith("whisper_stream_chunk_lag_seconds_count"):
+            count += float(line.rsplit(" ", 1)[1])
+    return total, count
+
+
+async def fetch_chunk_lag(host: str, port: int) -> tuple[float, float] | None:
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"http://{host}:{port}/metrics")
+            response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    return parse_chunk_lag(response.text)
+
+
+def chunk_completed_at(
+    send_log: List[tuple[int, float]], chunk_id: int, chunk_bytes: int
+) -> float | None:
+    """chunk_id 番目のチャンクを埋めるバイトを送り終えた時刻
+
+    send_log は（送信済みバイト数の累計, 送信時刻）の列。
+    """
+    needed = chunk_id * chunk_bytes
+    for sent_bytes, sent_at in send_log:
+        if sent_bytes >= needed:
+            return sent_at
+    return None
+
+
+async def run_session(
+    session_id: int,
+    url: str,
+    audio: AudioSource,
+    chunk_duration: float,
+) -> SessionResult:
+    """1セッション分の音声を実時間のペースで送信し、応答時間を記録"""
+    result = SessionResult(session_id)
+    # サーバーは音声 chunk_duration 秒ごとに部分結果を返す（送信するバイト数に換算）
+    chunk_bytes = int(audio.sample_rate * chunk_duration) * (
+        audio.channels * audio.sample_width
+    )
+    bytes_per_send = int(audio.sample_rate * SEND_INTERVAL) * (
+        audio.channels * audio.sample_width
+    )
+    send_log: List[tuple[int, float]] = []
+    end_sent_at: float | None = None
+
+    connect_started = time.perf_counter()
+    try:
+        async with websockets.connect(url, max_size=None) as websocket:
+            ready = json.loads(await websocket.recv())
+            result.connect_time = time.perf_counter() - connect_started
+            if ready.get("type") != "ready":
+                result.error = ready.get("code") or ready.get("message", "not ready")
+                return result
+
+            async def send_audio() -> None:
+                nonlocal end_sent_at
+                await websocket.send(
+                    json.dumps(
+                        {
+                            "type": "audio_info",
+                            "sample_rate": audio.sample_rate,
+                            "channels": audio.channels,
+                            "sample_width": audio.sample_width,
+                        }
+                    )
+                )
+                started = time.perf_counter()
+                sent = 0
+                while sent < len(audio.pcm):
+                    chunk = audio.pcm[sent : sent + bytes_per_send]
+                    await websocket.send(chunk)
+                    sent += len(chunk)
+                    send_log.append((sent, time.perf_counter()))
+                    # 送信済みの音声の長さに合わせて待機する（実時間のペース）
+                    target = started + sent / audio.bytes_per_second
+                    await asyncio.sleep(max(0.0, target - time.perf_counter()))
+                await websocket.send(json.dumps({"type": "end"}))
+                end_sent_at = time.perf_counter()
+
+            async def receive_messages() -> None:
+                while True:
+                    data = json.loads(await websocket.recv())
+                    received_at = time.perf_counter()
+                    message_type = data.get("type")
+
+                    if message_type == "partial":
+                        chunk_id = data.get("chunk_id", 0)
+                        completed_at = chunk_completed_at(
+                            send_log, chunk_id, chunk_bytes
+                        )
+                        if completed_at is not None:
+                            result.chunk_latencies.append(received_at - completed_at)
+                    elif message_type == "final":
+                        if end_sent_at is not None:
+                            result.time_to_final = received_at - end_sent_at
+                        return
+                    elif message_type == "error":
+                        result.error = data.get("code") or data.get("message")
+                        return
+
+            sender = asyncio.create_task(send_audio())
+            try:
+                await receive_messages()
+            finally:
+                sender.cancel()
+
+    except websockets.exceptions.ConnectionClosed:
+        result.disconnected = True
+    except (OSError, websockets.exceptions.InvalidHandshake) as e:
+        result.error = f"connect: {e}"
+
+    if result.error is None and result.time_to_final is None:
+        result.disconnected = True
+    return result
+
+
+async def run_load(
+    url: str,
+    audio: AudioSource,
+    sessions: int,
+    ramp: float,
+    chunk_duration: float,
+) -> List[SessionResult]:
+    """ramp 本/秒のペースで sessions 本のセッションを開始し、全セッションの終了を待つ"""
+
+    async def delayed(session_id: int) -> SessionResult:
+        await asyncio.sleep(session_id / ramp)
+        return await run_session(session_id, url, audio, chunk_duration)
+
+    return await asyncio.gather(*(delayed(i) for i in range(sessions)))
+
+
+def summarize(
+    results: List[SessionResult],
+    elapsed: float,
+    server_lag_mean: float | None = None,
+) -> Dict[str, Any]:
+    chunk_latencies = [v for r in results for v in r.chunk_latencies]
+    finals = [r.time_to_final for r in results if r.time_to_final is not None]
+    connects = [r.connect_time for r in results if r.connect_time is not None]
+
+    def stats(values: List[float]) -> Dict[str, float | None]:
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else None,
+        }
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r.error:
+            errors[r.error] = errors.get(r.error, 0) + 1
+
+    return {
+        "sessions": len(results),
+        "completed": len(finals),
+        "errors": errors,
+        "disconnects": sum(r.disconnected for r in results),
+        "elapsed_seconds": elapsed,
+        "chunk_latency": stats(chunk_latencies),
+        "time_to_final": stats(finals),
+        # サーバー内でチャンクが揃ってから部分結果を送るまでの平均（/metrics の差分）
+        "server_lag_mean": server_lag_mean,
+        "connect_time": stats(connects),
+    }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    def line(label: str, stats: Dict[str, Any]) -> None:
+        if not stats["count"]:
+            print(f"  {label:<18} (no data)")
+            return
+        print(
+            f"  {label:<18} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s "
+            f"p99={stats['p99']:.3f}s max={stats['max']:.3f}s (n={stats['count']})"
+        )
+
+    print("=" * 50)
+    print(
+        f"セッション: {summary['sessions']} / 完了: {summary['completed']} / "
+        f"切断: {summary['disconnects']} / 経過: {summary['elapsed_seconds']:.1f}s"
+    )
+    if summary["errors"]:
+        print(f"エラー: {summary['errors']}")
+    line("chunk -> partial", summary["chunk_latency"])
+    line("end -> final", summary["time_to_final"])
+    if summary["server_lag_mean"] is not None:
+        print(f"  {'server lag (mean)':<18} {summary['server_lag_mean']:.3f}s")
+    line("connect", summary["connect_time"])
+    print("=" * 50)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="WebSocketストリーミング文字起こしAPIの負荷試験クライアント"
+    )
+    parser.add_argument("audio_file", type=Path, help="送信する音声ファイル (WAV形式)")
+    parser.add_argument("--sessions", "-n", type=int, default=10, help="セッション数")
+    parser.add_argument(
+        "--ramp", type=float, default=1.0, help="1秒あたりに開始するセッション数"
+    )
+    parser.add_argument("--model", "-m", default="base", help="使用するWhisperモデル")
+    parser.add_argument("--language", "-l", default="ja", help="音声の言語コード")
+    parser.add_argument("--host", default="localhost", help="APIサーバーのホスト")
+    parser.add_argument("--port", type=int, default=8000, help="APIサーバーのポート")
+    parser.add_argument(
+        "--chunk-duration",
+        type=float,
+        default=2.0,
+        help="サーバーのCHUNK_DURATION（秒）。部分結果と送信チャンクの対応付けに使う",
+    )
+    parser.add_argument("--output", type=Path, help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+
+    if not args.audio_file.exists():
+        print(f"❌ ファイルが見つかりません: {args.audio_file}")
+        return 1
+
+    model_status = asyncio.run(check_model_status(args.host, args.port, args.model))
+    if not model_status["is_ready"]:
+        print(
+            f"❌ モデル '{args.model}' は準備できていません: {model_status['message']}"
+        )
+        return 1
+
+    audio = load_wav(args.audio_file)
+    url = (
+        f"ws://{args.host}:{args.port}/stream-transcribe"
+        f"?model={args.model}&language={args.language}"
+    )
+    print(
+        f"🚀 {args.sessions} セッション（{args.ramp}/秒で開始）、"
+        f"音声 {audio.duration:.1f}秒 -> {url}"
+    )
+
+    lag_before = asyncio.run(fetch_chunk_lag(args.host, args.port))
+    started = time.perf_counter()
+    results = asyncio.run(
+        run_load(url, audio, args.sessions, args.ramp, args.chunk_duration)
+    )
+    elapsed = time.perf_counter() - started
+    lag_after = asyncio.run(fetch_chunk_lag(args.host, args.port))
+
+    # 複数ワーカーの場合は全ワーカーの合計（PROMETHEUS_MULTIPROC_DIR 設定時）
+    server_lag_mean = None
+    if lag_before and lag_after and lag_after[1] > lag_before[1]:
+        server_lag_mean = (lag_after[0] - lag_before[0]) / (
+            lag_after[1] - lag_before[1]
+        )
+    summary = summarize(results, elapsed, server_lag_mean)
+    print_summary(summary)
+
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+        print(f"📝 結果を保存しました: {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+streaming_load.pyのテストファイル
+"""
+
+from streaming_load import (
+    SessionResult,
+    chunk_completed_at,
+    parse_chunk_lag,
+    percentile,
+    summarize,
+)
+
+
+class TestStreamingLoad:
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([3.0], 99) == 3.0
+        assert percentile([], 50) is None
+
+    def test_chunk_completed_at(self):
+        # 0.1秒ごとに3200バイト（16kHz 16-bit）を送信
+        send_log = [(3200 * i, float(i) / 10) for i in range(1, 31)]
+        # 2秒チャンク = 64000バイトを送り終えた時刻
+        assert chunk_completed_at(send_log, 1, 64000) == 2.0
+        assert chunk_completed_at(send_log, 2, 64000) is None
+
+    def test_parse_chunk_lag(self):
+        metrics_text = "\n".join(
+            [
+                "# TYPE whisper_stream_chunk_lag_seconds histogram",
+                'whisper_stream_chunk_lag_seconds_count{model="tiny"} 4.0',
+                'whisper_stream_chunk_lag_seconds_sum{model="tiny"} 2.0',
+                'whisper_stream_chunk_lag_seconds_count{model="base"} 1.0',
+                'whisper_stream_chunk_lag_seconds_sum{model="base"} 1.5',
+            ]
+        )
+        assert parse_chunk_lag(metrics_text) == (3.5, 5.0)
+
+    def test_summarize(self):
+        results = [
+            SessionResult(0, chunk_latencies=[0.5, 0.7], time_to_final=1.0),
+            SessionResult(1, error="busy"),
+            SessionResult(2, chunk_latencies=[0.9], disconnected=True),
+        ]
+
+        summary = summarize(results, elapsed=10.0, server_lag_mean=0.4)
+
+        assert summary["sessions"] == 3
+        assert summary["completed"] == 1
+        assert summary["errors"] == {"busy": 1}
+        assert summary["disconnects"] == 1
+        assert summary["chunk_latency"]["count"] == 3
+        assert summary["chunk_latency"]["p50"] == 0.7
+        assert summary["server_lag_mean"] == 0.4
@@ -59,6 +59,31 @@ def test_get_model_info_custom_model(override_whisper_service):
     assert data["file_size"] is not None
 
 
+def test_get_model_info_loaded_version(override_whisper_service):
+    """ロード中のカスタムモデルの版とロード時間"""
+    mock_service = override_whisper_service
+    mock_service.model_manager.get_model_info.return_value = {
+        "model": "custom-model",
+        "exists": True,
+        "is_custom": True,
+        "is_loaded": True,
+        "type": "custom",
+        "version": "3f2a9c1d7e4b",
+        "loaded_at": 1640995300.5,
+        "load_time": 2.5,
+        "reloading": True,
+    }
+
+    response = client.get("/models/custom-model/info")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["version"] == "3f2a9c1d7e4b"
+    assert data["loaded_at"] == 1640995300.5
+    assert data["load_time"] == 2.5
+    assert data["reloading"] is True
+
+
 def test_get_model_info_nonexistent_model(override_whisper_service):
     """存在しないモデルの情報取得テスト"""
     mock_service = override_whisper_service
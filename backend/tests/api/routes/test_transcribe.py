@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 from app.main import app
 import io
+import wave
+from unittest.mock import patch
 
 client = TestClient(app)
 
@@ -10,7 +12,7 @@ def test_transcribe_audio_success(override_whisper_service):
     mock_service = override_whisper_service
     mock_service.transcribe.return_value = {
         "text": "Hello world",
-        "language": "en", 
+        "language": "en",
         "segments": [{"text": "Hello world", "start": 0.0, "end": 2.0}],
         "model_used": "base",
     }
@@ -56,7 +58,7 @@ def test_transcribe_audio_invalid_model(override_whisper_service):
     """無効なモデル名の場合のテスト"""
     import pytest
     from app.core.exceptions import InvalidModelError
-    
+
     mock_service = override_whisper_service
     mock_service.is_valid_model.return_value = False
     mock_service.get_available_models.return_value = ["tiny", "base", "small"]
@@ -73,7 +75,7 @@ def test_transcribe_audio_unsupported_format():
     """サポートされていないファイル形式のテスト"""
     import pytest
     from app.core.exceptions import UnsupportedAudioFormatError
-    
+
     fake_audio_data = b"fake audio content"
     files = {"file": ("test_audio.txt", io.BytesIO(fake_audio_data), "text/plain")}
 
@@ -84,4 +86,282 @@ def test_transcribe_audio_unsupported_format():
 def test_transcribe_audio_no_file():
     """ファイルなしの場合のテスト"""
     response = client.post("/transcribe")
-    assert response.status_code == 422  # Validation error
\ No newline at end of file
+    assert response.status_code == 422  # Validation error
+
+
+def test_transcribe_audio_with_decoding_profile(override_whisper_service):
+    """デコードプロファイル指定付き文字起こしテスト"""
+    mock_service = override_whisper_service
+    mock_service.transcribe.return_value = {
+        "text": "Hello world",
+        "language": "en",
+        "segments": [],
+        "model_used": "base",
+        "decoding_profile": "fast",
+    }
+
+    files = {"file": ("test_audio.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files, data={"profile": "fast"})
+
+    assert response.status_code == 200
+    assert response.json()["transcription"]["decoding_profile"] == "fast"
+    assert mock_service.transcribe.call_args[0][3] == "fast"
+
+
+def test_transcribe_audio_priority(override_whisper_service):
+    """優先度の指定と、長い音声のバッチ扱い"""
+    mock_service = override_whisper_service
+    mock_service.transcribe.return_value = {
+        "text": "ok",
+        "language": "ja",
+        "segments": [],
+        "model_used": "base",
+    }
+
+    files = {"file": ("a.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files)
+    assert response.status_code == 200
+    args = mock_service.transcribe.call_args[0]
+    assert args[5] == "interactive"
+    assert args[6] == "ip:testclient"
+
+    files = {"file": ("a.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files, data={"priority": "batch"})
+    assert response.status_code == 200
+    assert mock_service.transcribe.call_args[0][5] == "batch"
+
+    # 16kHz 16-bit モノラル 2秒のWAV（しきい値を1秒にして自動でバッチにする）
+    wav = io.BytesIO()
+    with wave.open(wav, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(b"\x00\x00" * 32000)
+    files = {"file": ("a.wav", io.BytesIO(wav.getvalue()), "audio/wav")}
+    with patch("app.main.settings.batch_audio_seconds", 1.0):
+        response = client.post("/transcribe", files=files)
+    assert response.status_code == 200
+    assert mock_service.transcribe.call_args[0][5] == "batch"
+
+    # realtime はストリーミング専用
+    files = {"file": ("a.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files, data={"priority": "realtime"})
+    assert response.status_code == 422
+
+
+def test_transcribe_audio_invalid_decoding_profile(override_whisper_service):
+    """無効なデコードプロファイルの場合のテスト"""
+    import pytest
+    from app.core.exceptions import InvalidDecodingProfileError
+
+    files = {"file": ("test_audio.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+
+    with pytest.raises(InvalidDecodingProfileError):
+        client.post("/transcribe", files=files, data={"profile": "ultra"})
+
+
+def test_transcribe_audio_service_busy(override_whisper_service):
+    """過負荷時は503とRetry-Afterを返す"""
+    from app.api.dependencies import get_admission_controller
+    from app.services.admission import AdmissionController
+
+    admission = AdmissionController(max_queue_depth=1, max_pending_audio_seconds=0)
+    app.dependency_overrides[get_admission_controller] = lambda: admission
+
+    fake_audio_data = b"fake audio content"
+    files = {"file": ("test_audio.wav", io.BytesIO(fake_audio_data), "audio/wav")}
+
+    with admission.track(30.0):
+        response = client.post("/transcribe", files=files)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+    assert response.json()["error"] == "busy"
+    override_whisper_service.transcribe.assert_not_called()
+
+
+def test_transcribe_audio_draining(override_whisper_service):
+    """停止処理中は503とRetry-Afterを返す"""
+    from app.api.dependencies import get_drain_controller
+    from app.services.drain import DrainController
+
+    drain = DrainController(retry_after=7)
+    drain.draining = True
+    app.dependency_overrides[get_drain_controller] = lambda: drain
+
+    files = {"file": ("test_audio.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert response.json()["error"] == "draining"
+    override_whisper_service.transcribe.assert_not_called()
+
+
+def test_transcribe_audio_rate_limited(override_whisper_service):
+    """クライアントの残量を超える音声は429とRetry-Afterを返す"""
+    from app.api.dependencies import get_rate_limiter
+    from app.services.rate_limit import InMemoryBucketStore, RateLimiter
+
+    override_whisper_service.transcribe.return_value = {
+        "text": "ok",
+        "language": "ja",
+        "segments": [],
+        "model_used": "base",
+    }
+    # 1秒あたり0.5秒分、容量は3秒分
+    limiter = RateLimiter(InMemoryBucketStore(), rate=0.5, burst=3.0)
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+
+    # 16kHz 16-bit モノラル 2秒のWAV
+    wav = io.BytesIO()
+    with wave.open(wav, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(b"\x00\x00" * 32000)
+
+    def post(api_key):
+        files = {"file": ("a.wav", io.BytesIO(wav.getvalue()), "audio/wav")}
+        return client.post(
+            "/transcribe",
+            files=files,
+            data={"model": "base"},
+            headers={"X-API-Key": api_key},
+        )
+
+    assert post("client-a").status_code == 200
+    response = post("client-a")
+    assert response.status_code == 429
+    # 残り1秒分、足りない1秒分は2秒で補充される
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["error"] == "rate_limited"
+    # 別のクライアントは影響を受けない
+    assert post("client-b").status_code == 200
+    assert override_whisper_service.transcribe.call_count == 2
+
+
+def test_transcribe_audio_rate_limited_by_decoded_length(override_whisper_service):
+    """WAV以外の音声はデコードした実際の長さで課金する"""
+    import numpy as np
+    from app.api.dependencies import get_rate_limiter
+    from app.services.rate_limit import InMemoryBucketStore, RateLimiter
+
+    override_whisper_service.transcribe.return_value = {
+        "text": "ok",
+        "language": "ja",
+        "segments": [],
+        "model_used": "base",
+    }
+    # 低ビットレートの小さなファイルでも、デコード結果は10秒
+    decoded = np.zeros(16000 * 10, dtype=np.float32)
+    override_whisper_service.load_audio.return_value = decoded
+    limiter = RateLimiter(InMemoryBucketStore(), rate=0.5, burst=5.0)
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+
+    def post():
+        files = {"file": ("a.mp3", io.BytesIO(b"\x00" * 2000), "audio/mp3")}
+        return client.post("/transcribe", files=files, data={"model": "base"})
+
+    # 満タンなら容量より長い音声も受け付け、10秒分を引く
+    assert post().status_code == 200
+    # デコード結果をそのまま推論に渡す
+    assert override_whisper_service.transcribe.call_args[0][0] is decoded
+
+    # 残量を使い切ったクライアントの音声はデコードしない
+    override_whisper_service.load_audio.reset_mock()
+    response = post()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    override_whisper_service.load_audio.assert_not_called()
+    assert override_whisper_service.transcribe.call_count == 1
+
+
+def test_transcribe_audio_admission_rejects_decoded_length(override_whisper_service):
+    """デコード後の長さで受付を拒否した場合は課金しない"""
+    import numpy as np
+    from app.api.dependencies import get_admission_controller, get_rate_limiter
+    from app.services.admission import AdmissionController
+    from app.services.rate_limit import InMemoryBucketStore, RateLimiter
+
+    override_whisper_service.load_audio.return_value = np.zeros(
+        16000 * 10, dtype=np.float32
+    )
+    admission = AdmissionController(max_queue_depth=0, max_pending_audio_seconds=5)
+    limiter = RateLimiter(InMemoryBucketStore(), rate=0.001, burst=12.0)
+    app.dependency_overrides[get_admission_controller] = lambda: admission
+    app.dependency_overrides[get_rate_limiter] = lambda: limiter
+
+    def post():
+        files = {"file": ("a.mp3", io.BytesIO(b"\x00" * 2000), "audio/mp3")}
+        return client.post("/transcribe", files=files, data={"model": "base"})
+
+    with admission.track(3.0):
+        # サイズからの見積もり（0.125秒）では受け付け、デコードした10秒で拒否する
+        response = post()
+        assert response.status_code == 503
+        override_whisper_service.load_audio.assert_called_once()
+        override_whisper_service.transcribe.assert_not_called()
+        # 残量は減っていない
+        limiter.check("ip:testclient", 12.0)
+
+        # 過負荷の間はデコードせずに拒否する
+        admission.max_pending_audio_seconds = 1
+        override_whisper_service.load_audio.reset_mock()
+        assert post().status_code == 503
+        override_whisper_service.load_audio.assert_not_called()
+
+
+def test_transcribe_audio_stage_timings(override_whisper_service):
+    """有効時はServer-Timingヘッダーとtimingsを返す"""
+    from unittest.mock import patch
+    from app.core.config import settings
+
+    fake_audio_data = b"fake audio content"
+    files = {"file": ("test_audio.wav", io.BytesIO(fake_audio_data), "audio/wav")}
+
+    with patch.object(settings, "stage_timings_enabled", True):
+        response = client.post("/transcribe", files=files)
+
+    assert response.status_code == 200
+    assert "upload_read;dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
+    assert set(response.json()["timings"]) >= {"upload_read", "temp_write", "total"}
+
+    response = client.post("/transcribe", files=files)
+    assert "Server-Timing" not in response.headers
+    assert response.json()["timings"] is None
+
+
+def test_transcribe_audio_deadline(override_whisper_service):
+    """処理期限は最も短い指定を使い、途中で止まった結果は truncated を返す"""
+    from app.core.exceptions import RequestCancelledError
+
+    mock_service = override_whisper_service
+    mock_service.transcribe.return_value = {
+        "text": "partial",
+        "language": "ja",
+        "segments": [],
+        "model_used": "base",
+        "truncated": True,
+    }
+
+    files = {"file": ("a.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post(
+        "/transcribe",
+        files=files,
+        data={"timeout": "30"},
+        headers={"X-Request-Timeout": "10"},
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "truncated"
+    assert response.json()["transcription"]["truncated"] is True
+    cancel = mock_service.transcribe.call_args[0][7]
+    assert 0 < cancel.remaining() <= 10
+
+    # 推論を始める前に期限が過ぎた場合は504
+    mock_service.transcribe.side_effect = RequestCancelledError("deadline")
+    files = {"file": ("a.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    response = client.post("/transcribe", files=files)
+    assert response.status_code == 504
+    assert response.json()["error"] == "deadline"
@@ -8,3 +8,69 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+
+def test_lifespan_starts_under_test_client():
+    """TestClient はlifespanを別スレッドで実行するため、シグナルハンドラーは設定されない"""
+    with TestClient(app) as lifespan_client:
+        response = lifespan_client.get("/health")
+    assert response.status_code == 200
+
+
+def test_readiness_check():
+    from app.api.dependencies import get_drain_controller
+    from app.services.drain import DrainController
+
+    drain = DrainController()
+    app.dependency_overrides[get_drain_controller] = lambda: drain
+    try:
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+        drain.draining = True
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "draining"}
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_metrics(override_whisper_service):
+    import io
+
+    files = {"file": ("test_audio.wav", io.BytesIO(b"fake audio"), "audio/wav")}
+    client.post("/transcribe", files=files, data={"model": "tiny"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'whisper_transcribe_requests_total{model="tiny",status="success"}' in body
+    assert 'whisper_request_duration_seconds_count{model="tiny"}' in body
+    assert "whisper_inference_queue_depth" in body
+
+
+def test_admin_profile():
+    from unittest.mock import patch
+    from app.core.config import settings
+
+    # 無効時はエンドポイント自体が存在しない扱い
+    assert client.post("/admin/profile?seconds=0.05").status_code == 404
+
+    with (
+        patch.object(settings, "profiler_enabled", True),
+        patch.object(settings, "admin_token", "secret"),
+    ):
+        response = client.post(
+            "/admin/profile?seconds=0.05", headers={"X-Admin-Token": "wrong"}
+        )
+        assert response.status_code == 403
+
+        response = client.post(
+            "/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.collapsed"')
+    assert response.text.strip()
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from unittest.mock import Mock, MagicMock
 from app.main import app
@@ -10,10 +11,18 @@ def mock_whisper_service():
     mock_service = Mock(spec=WhisperService)
     mock_service.model_manager = Mock()
     mock_service.model_manager.loaded_models = {}
-    
+
     # 基本的なメソッドのデフォルト戻り値を設定
-    mock_service.get_available_models.return_value = ["tiny", "base", "small", "medium", "large"]
+    mock_service.get_available_models.return_value = [
+        "tiny",
+        "base",
+        "small",
+        "medium",
+        "large",
+    ]
     mock_service.is_valid_model.return_value = True
+    # WAV以外のアップロードは推論の前にデコードする（1秒分の無音）
+    mock_service.load_audio.return_value = np.zeros(16000, dtype=np.float32)
     mock_service.load_model.return_value = MagicMock()
     mock_service.transcribe.return_value = {
         "text": "Test transcription",
@@ -28,7 +37,7 @@ def mock_whisper_service():
         "is_custom": False,
         "message": "Model is available but not loaded yet",
     }
-    
+
     return mock_service
 
 
@@ -37,4 +46,4 @@ def override_whisper_service(mock_whisper_service):
     """WhisperServiceの依存性注入をオーバーライド"""
     app.dependency_overrides[get_whisper_service] = lambda: mock_whisper_service
     yield mock_whisper_service
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
@@ -0,0 +1,76 @@
+import io
+import wave
+
+import numpy as np
+from benchmarks.audio import generate, to_wav_bytes
+from benchmarks.compare import compare_results
+
+
+def make_results(latency: float, throughput: float, cold_load: float = 1.0) -> dict:
+    return {
+        "models": [
+            {
+                "model": "tiny",
+                "cold_load_seconds": cold_load,
+                "peak_rss_mb": 500.0,
+                "cases": [
+                    {
+                        "kind": "speech",
+                        "duration": 30.0,
+                        "concurrency": 1,
+                        "latency_p50": latency,
+                        "latency_p95": latency,
+                        "mean_rtf": latency / 30.0,
+                        "throughput": throughput,
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class TestBenchmarkAudio:
+    def test_generate_is_deterministic(self):
+        for kind in ("tone", "speech", "noise"):
+            first = generate(kind, 2.0)
+            second = generate(kind, 2.0)
+            assert first.dtype == np.float32
+            assert len(first) == 32000
+            np.testing.assert_array_equal(first, second)
+            assert np.abs(first).max() <= 1.0
+
+    def test_to_wav_bytes(self):
+        wav = to_wav_bytes(generate("tone", 1.0))
+        with wave.open(io.BytesIO(wav), "rb") as wav_file:
+            assert wav_file.getframerate() == 16000
+            assert wav_file.getnframes() == 16000
+
+
+class TestCompareResults:
+    def test_within_tolerance(self):
+        baseline = make_results(latency=2.0, throughput=15.0)
+        current = make_results(latency=2.2, throughput=14.0)
+        assert compare_results(current, baseline, tolerance=0.15) == []
+
+    def test_flags_regressions(self):
+        baseline = make_results(latency=2.0, throughput=15.0, cold_load=1.0)
+        current = make_results(latency=3.0, throughput=10.0, cold_load=2.0)
+
+        regressions = compare_results(current, baseline, tolerance=0.15)
+
+        metrics = {regression["metric"] for regression in regressions}
+        assert metrics == {
+            "cold_load_seconds",
+            "latency_p50",
+            "latency_p95",
+            "mean_rtf",
+            "throughput",
+        }
+        assert regressions[0]["case"] == "tiny"
+        assert any(r["case"] == "tiny/speech/30s/x1" for r in regressions)
+
+    def test_ignores_missing_models_and_cases(self):
+        baseline = make_results(latency=1.0, throughput=30.0)
+        current = make_results(latency=5.0, throughput=1.0)
+        current["models"][0]["model"] = "base"
+        assert compare_results(current, baseline) == []
@@ -0,0 +1,101 @@
+import subprocess
+import sys
+
+import pytest
+
+from app.core.cpu import claim_worker_slot, plan_cpu_config, split_cores
+
+
+def test_split_cores():
+    assert split_cores(list(range(16)), 4) == [
+        [0, 1, 2, 3],
+        [4, 5, 6, 7],
+        [8, 9, 10, 11],
+        [12, 13, 14, 15],
+    ]
+    assert split_cores([0, 1, 2, 3, 4], 2) == [[0, 1, 2], [3, 4]]
+    # コア数より多くは分けない
+    assert split_cores([0, 1], 4) == [[0], [1]]
+
+
+def test_plan_divides_cores_between_workers():
+    """16コアを4ワーカーで使う場合は1ワーカーあたり4スレッド"""
+    config = plan_cpu_config(workers=4, cores=list(range(16)))
+
+    assert config.intra_op_threads == 4
+    assert config.inter_op_threads == 1
+    assert config.cores == list(range(16))
+    assert config.replica_cores is None
+
+
+def test_plan_worker_affinity():
+    config = plan_cpu_config(
+        workers=4, replicas=2, affinity="worker", worker_index=2, cores=list(range(16))
+    )
+
+    assert config.cores == [8, 9, 10, 11]
+    assert config.intra_op_threads == 2
+
+
+def test_plan_replica_affinity():
+    config = plan_cpu_config(
+        workers=2, replicas=2, affinity="replica", worker_index=1, cores=list(range(8))
+    )
+
+    assert config.cores == [4, 5, 6, 7]
+    assert config.replica_cores == [[4, 5], [6, 7]]
+    assert config.intra_op_threads == 2
+
+
+def test_plan_explicit_threads():
+    config = plan_cpu_config(
+        workers=4, intra_op_threads=3, inter_op_threads=2, cores=list(range(16))
+    )
+
+    assert config.intra_op_threads == 3
+    assert config.inter_op_threads == 2
+
+
+def test_plan_invalid_affinity():
+    with pytest.raises(ValueError):
+        plan_cpu_config(affinity="socket")
+
+
+def test_claim_worker_slot_is_exclusive_between_processes(tmp_path):
+    """ロックを保持しているプロセスとは別の番号を取得する"""
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from pathlib import Path; "
+            "from app.core.cpu import claim_worker_slot; "
+            f"print(claim_worker_slot(4, Path({str(tmp_path)!r})), flush=True); "
+            "sys.stdin.read()",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "0"
+        assert claim_worker_slot(4, tmp_path) == 1
+    finally:
+        holder.communicate("")
+
+
+def test_configure_cpu_applies_thread_counts():
+    """新しいプロセスでスレッド数が設定される"""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import torch; from app.core.cpu import configure_cpu; "
+            "config = configure_cpu(); "
+            "print(torch.get_num_threads() == config.intra_op_threads, "
+            "torch.get_num_interop_threads() == config.inter_op_threads)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.split() == ["True", "True"]
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core import metrics
+
+BACKEND_DIR = Path(__file__).resolve().parents[3]
+
+WORKER_SCRIPT = """
+from app.core import metrics
+metrics.TRANSCRIBE_REQUESTS.labels("base", "success").inc()
+metrics.LOADED_MODELS.set(1)
+"""
+
+EXITED_WORKER_SCRIPT = WORKER_SCRIPT + "metrics.mark_worker_dead()\n"
+
+
+def test_metrics_are_aggregated_across_workers(tmp_path, monkeypatch):
+    """PROMETHEUS_MULTIPROC_DIR 設定時は各ワーカープロセスの値が合算される"""
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": ""}
+    for script in (WORKER_SCRIPT, EXITED_WORKER_SCRIPT):
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=BACKEND_DIR,
+            env=env,
+            check=True,
+        )
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    content, content_type = metrics.render_metrics()
+    body = content.decode()
+
+    assert content_type.startswith("text/plain")
+    assert (
+        'whisper_transcribe_requests_total{model="base",status="success"} 2.0' in body
+    )
+    # 終了処理を済ませたワーカーのゲージは集計されない
+    assert "whisper_loaded_models 1.0" in body
@@ -0,0 +1,14 @@
+from app.core.timing import StageTimings
+
+
+def test_stage_timings_accumulate_and_format():
+    timings = StageTimings()
+    timings.add("encode", 0.010)
+    timings.add("encode", 0.005)
+    with timings.measure("decode"):
+        pass
+
+    assert timings.as_milliseconds()["encode"] == 15.0
+    assert timings.get("decode") >= 0.0
+    assert timings.get("missing") == 0.0
+    assert timings.server_timing().startswith("encode;dur=15.0, decode;dur=")
@@ -0,0 +1,62 @@
+import pytest
+from app.core.exceptions import ServiceBusyError
+from app.services.admission import AdmissionController
+
+
+class TestAdmissionController:
+    def test_admit_counts_load_until_done(self):
+        admission = AdmissionController(max_queue_depth=2, max_pending_audio_seconds=0)
+
+        with admission.admit(10.0):
+            assert admission.queue_depth == 1
+            assert admission.pending_audio_seconds == 10.0
+
+        assert admission.queue_depth == 0
+        assert admission.pending_audio_seconds == 0.0
+
+    def test_rejects_when_queue_is_full(self):
+        admission = AdmissionController(max_queue_depth=1, max_pending_audio_seconds=0)
+
+        with admission.admit(5.0):
+            with pytest.raises(ServiceBusyError) as exc_info:
+                with admission.admit(5.0):
+                    pass
+
+        assert exc_info.value.retry_after >= 1
+        assert admission.queue_depth == 0
+
+    def test_rejects_when_pending_audio_exceeds_limit(self):
+        admission = AdmissionController(
+            max_queue_depth=0, max_pending_audio_seconds=60, initial_realtime_factor=0.5
+        )
+
+        # 何も処理していなければ上限より長い音声でも受け付ける
+        with admission.admit(100.0):
+            assert admission.is_overloaded(1.0)
+            with pytest.raises(ServiceBusyError) as exc_info:
+                admission.check(1.0)
+
+        # Retry-Afterは未処理音声 × リアルタイム係数
+        assert exc_info.value.retry_after == 50
+        assert not admission.is_overloaded(1.0)
+
+    def test_track_never_rejects(self):
+        admission = AdmissionController(max_queue_depth=1, max_pending_audio_seconds=0)
+
+        with admission.track(2.0):
+            with admission.track(2.0):
+                assert admission.queue_depth == 2
+                assert admission.is_overloaded()
+
+        assert admission.queue_depth == 0
+
+    def test_realtime_factor_is_updated_from_observed_work(self):
+        admission = AdmissionController(
+            max_queue_depth=0, max_pending_audio_seconds=0, initial_realtime_factor=1.0
+        )
+
+        with admission.track(100.0):
+            pass
+
+        # ほぼ一瞬で終わったので係数は下がる
+        assert admission.realtime_factor < 1.0
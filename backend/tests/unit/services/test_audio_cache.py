@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+from unittest.mock import Mock, patch
+from app.services.audio_cache import AudioDecodeCache
+from app.services.whisper_service import WhisperModelManager
+
+
+def make_audio(samples: int = 1600) -> np.ndarray:
+    return (np.arange(samples, dtype=np.float32) % 200 - 100) / 32768.0
+
+
+class TestAudioDecodeCache:
+    def test_load_decodes_once_per_content(self, tmp_path):
+        """同じ内容のファイルは2回目以降デコードされない"""
+        decoder = Mock(return_value=make_audio())
+        cache = AudioDecodeCache(tmp_path / "cache", 10 * 1024 * 1024, decoder)
+
+        upload1 = tmp_path / "a.tmp"
+        upload2 = tmp_path / "b.tmp"
+        upload1.write_bytes(b"same content")
+        upload2.write_bytes(b"same content")
+
+        first = cache.load(upload1)
+        second = cache.load(upload2)
+
+        decoder.assert_called_once()
+        assert second.dtype == np.float32
+        np.testing.assert_allclose(first, second)
+
+    def test_get_returns_memory_mapped_pcm(self, tmp_path):
+        cache = AudioDecodeCache(tmp_path, 10 * 1024 * 1024, Mock())
+        cache.put("key", make_audio())
+
+        pcm = cache.get("key")
+
+        assert isinstance(pcm, np.memmap)
+        assert pcm.dtype == np.int16
+        assert cache.get("missing") is None
+
+    def test_lru_eviction(self, tmp_path):
+        """上限を超えると最も古くアクセスされたエントリから削除される"""
+        audio = make_audio(16000)
+        entry_size = audio.size * 2 + 128  # int16 + .npyヘッダー
+        cache = AudioDecodeCache(tmp_path, entry_size * 2, Mock())
+
+        cache.put("first", audio)
+        cache.put("second", audio)
+        os.utime(tmp_path / "first.npy", (1, 1))
+        os.utime(tmp_path / "second.npy", (2, 2))
+
+        # firstにアクセスしてsecondを最古にする
+        assert cache.get("first") is not None
+        cache.put("third", audio)
+
+        assert (tmp_path / "first.npy").exists()
+        assert not (tmp_path / "second.npy").exists()
+        assert (tmp_path / "third.npy").exists()
+        assert cache.total_bytes() <= entry_size * 2
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_manager_uses_cached_audio(
+        self, mock_load_model, mock_transcribe_mel, tmp_path
+    ):
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "cached",
+            "language": "ja",
+            "segments": [],
+        }
+
+        upload = tmp_path / "upload.tmp"
+        upload.write_bytes(b"audio bytes")
+        decoder = Mock(return_value=make_audio())
+
+        manager = WhisperModelManager()
+        manager.audio_cache = AudioDecodeCache(
+            tmp_path / "cache", 10 * 1024 * 1024, decoder
+        )
+
+        manager.transcribe(str(upload), "base")
+        manager.transcribe(str(upload), "tiny")
+
+        decoder.assert_called_once()
+        assert mock_transcribe_mel.call_count == 2
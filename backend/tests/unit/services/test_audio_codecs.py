@@ -0,0 +1,95 @@
+import io
+
+import numpy as np
+import pytest
+
+from app.core.exceptions import AudioProcessingError, UnsupportedAudioFormatError
+from app.services.audio_codecs import StreamDecoder, available_codecs
+
+
+def sine(seconds, sample_rate):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * 440 * t) * 0.3).astype(np.float32)
+
+
+def test_pcm_is_always_available():
+    assert available_codecs()[0] == "pcm"
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(UnsupportedAudioFormatError):
+        StreamDecoder("speex", 16000)
+
+
+def test_compressed_codecs_require_av():
+    try:
+        import av  # noqa: F401
+
+        pytest.skip("av is installed")
+    except ImportError:
+        pass
+    assert available_codecs() == ["pcm"]
+    with pytest.raises(UnsupportedAudioFormatError):
+        StreamDecoder("opus", 48000)
+
+
+def test_decode_opus_packets():
+    av = pytest.importorskip("av")
+    encoder = av.CodecContext.create("libopus", "w")
+    encoder.sample_rate = 48000
+    encoder.layout = "mono"
+    encoder.format = "s16"
+    encoder.bit_rate = 16000
+    samples = (sine(1.0, 48000) * 32767).astype(np.int16)
+    packets = []
+    for start in range(0, len(samples), 960):
+        frame = av.AudioFrame.from_ndarray(
+            samples[None, start : start + 960], format="s16", layout="mono"
+        )
+        frame.sample_rate = 48000
+        frame.pts = start
+        packets.extend(bytes(packet) for packet in encoder.encode(frame))
+    packets.extend(bytes(packet) for packet in encoder.encode(None))
+
+    decoder = StreamDecoder("opus", 48000)
+    pcm = b"".join(decoder.decode(packet) for packet in packets) + decoder.flush()
+
+    # 16kHz に変換される（エンコーダーの遅延分の誤差は許容する）
+    assert abs(len(pcm) / 2 - 16000) < 1600
+    # 圧縮後のサイズは16kHz 16-bit PCMの1/10以下
+    assert sum(len(packet) for packet in packets) < 32000 / 10
+
+
+def test_decode_flac_split_anywhere():
+    av = pytest.importorskip("av")
+    output = io.BytesIO()
+    with av.open(output, "w", format="flac") as container:
+        stream = container.add_stream("flac", rate=16000, layout="mono")
+        samples = (sine(2.0, 16000) * 32767).astype(np.int16)
+        frame = av.AudioFrame.from_ndarray(samples[None], format="s16", layout="mono")
+        frame.sample_rate = 16000
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    data = output.getvalue()
+
+    # メタデータやフレームの途中で区切って送っても、すべてのフレームがデコードされる
+    for size in (1, 333, 1000, len(data)):
+        decoder = StreamDecoder("flac", 16000)
+        pcm = b"".join(
+            decoder.decode(data[start : start + size])
+            for start in range(0, len(data), size)
+        )
+        pcm += decoder.flush()
+
+        decoded = np.frombuffer(pcm, np.int16)
+        assert len(decoded) == 32000
+        assert np.abs(decoded.astype(np.int32) - samples).max() <= 1
+
+
+def test_flac_without_stream_header_is_rejected():
+    pytest.importorskip("av")
+    decoder = StreamDecoder("flac", 16000)
+    with pytest.raises(AudioProcessingError):
+        decoder.decode(b"\xff\xf8\x69\x08")
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from app.core.exceptions import RequestCancelledError
+from app.services.cancellation import (
+    DEADLINE,
+    DISCONNECTED,
+    Cancellation,
+    effective_timeout,
+)
+
+
+def test_no_deadline():
+    cancel = Cancellation()
+    assert cancel.remaining() is None
+    assert cancel.reason is None
+    cancel.check()
+
+
+def test_deadline_expires():
+    cancel = Cancellation(0.05)
+    assert cancel.reason is None
+    time.sleep(0.06)
+    assert cancel.reason == DEADLINE
+    with pytest.raises(RequestCancelledError) as exc_info:
+        cancel.check()
+    assert exc_info.value.reason == DEADLINE
+
+
+def test_first_reason_wins():
+    cancel = Cancellation(60)
+    cancel.cancel()
+    cancel.cancel(DEADLINE)
+    assert cancel.reason == DISCONNECTED
+
+
+def test_until_wallclock_deadline():
+    assert 9 < Cancellation.until(time.time() + 10).remaining() <= 10
+    # 過ぎた期限は即座に打ち切る
+    assert Cancellation.until(time.time() - 1).reason == DEADLINE
+
+
+def test_effective_timeout():
+    assert effective_timeout(0, None) is None
+    assert effective_timeout(0, 30.0, 10.0) == 10.0
+    assert effective_timeout(60.0, None, -1) == 60.0
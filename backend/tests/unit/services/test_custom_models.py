@@ -1,3 +1,5 @@
+import os
+import time
 from unittest.mock import patch
 from app.services.whisper_service import WhisperModelManager
 
@@ -91,6 +93,10 @@ class TestCustomModelSupport:
         assert info["is_custom"] is False
         assert info["type"] == "standard"
         assert info["file_path"] is None
+        # ワーカーのCPU構成
+        assert info["replicas"] >= 1
+        assert info["cpu"]["intra_op_threads"] >= 1
+        assert info["cpu"]["affinity"] in ("none", "worker", "replica")
 
         # 存在しないモデル
         info = manager.get_model_info("nonexistent")
@@ -181,3 +187,105 @@ class TestCustomModelSupport:
         status = manager.get_model_status("base")
         assert status["is_custom"] is False
         assert "Standard" in status["message"]
+
+
+def _rewrite(path, content):
+    """内容を書き換え、mtimeが確実に変わるようにする"""
+    mtime = path.stat().st_mtime_ns
+    path.write_text(content)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+class TestCustomModelHotSwap:
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_swap_after_in_flight_requests(self, mock_load_model, tmp_path):
+        """ファイルが更新されると新しい版に切り替え、古い版は処理中の推論の後に解放する"""
+        custom_file = tmp_path / "custom-model.pt"
+        custom_file.write_text("version 1")
+        old_model, new_model = object(), object()
+        mock_load_model.side_effect = [old_model, new_model]
+
+        manager = WhisperModelManager()
+        manager.model_dir = tmp_path
+        old_pool = manager.get_pool("custom-model")
+        old_info = manager.get_model_info("custom-model")
+        assert old_info["version"] is not None
+        assert old_info["load_time"] >= 0
+
+        _rewrite(custom_file, "version 2")
+        with old_pool.checkout() as model:
+            manager.reload_if_changed("custom-model").join()
+            # 切り替え後の推論は新しい版を使い、処理中の推論は古い版のまま続く
+            assert model is old_model
+            assert manager.get_pool("custom-model").model is new_model
+            manager._release_retired()
+            assert manager._retired == [old_pool]
+
+        manager._release_retired()
+        assert manager._retired == []
+
+        info = manager.get_model_info("custom-model")
+        assert info["version"] != old_info["version"]
+        assert info["loaded_at"] >= old_info["loaded_at"]
+        assert info["reloading"] is False
+
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_touch_without_change_keeps_model(self, mock_load_model, tmp_path):
+        custom_file = tmp_path / "custom-model.pt"
+        custom_file.write_text("same")
+        mock_load_model.return_value = object()
+
+        manager = WhisperModelManager()
+        manager.model_dir = tmp_path
+        model = manager.load_model("custom-model")
+        version = manager.versions["custom-model"].version
+
+        _rewrite(custom_file, "same")
+        manager.reload_if_changed("custom-model").join()
+
+        assert manager.load_model("custom-model") is model
+        assert manager.versions["custom-model"].version == version
+        assert mock_load_model.call_count == 1
+        # 変更検出用の値が更新され、再度確認してもロードしない
+        assert manager.reload_if_changed("custom-model") is None
+
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_failed_reload_keeps_serving(self, mock_load_model, tmp_path):
+        """新しい版のロードに失敗した場合は古い版を使い続ける"""
+        custom_file = tmp_path / "custom-model.pt"
+        custom_file.write_text("version 1")
+        old_model = object()
+        mock_load_model.side_effect = [old_model, RuntimeError("truncated file")]
+
+        manager = WhisperModelManager()
+        manager.model_dir = tmp_path
+        manager.load_model("custom-model")
+
+        _rewrite(custom_file, "version 2 (partial)")
+        manager.reload_if_changed("custom-model").join()
+
+        assert manager.load_model("custom-model") is old_model
+        # 同じファイルのロードは繰り返さない
+        assert manager.reload_if_changed("custom-model") is None
+
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_load_model_checks_for_updates(self, mock_load_model, tmp_path):
+        custom_file = tmp_path / "custom-model.pt"
+        custom_file.write_text("version 1")
+        old_model, new_model = object(), object()
+        mock_load_model.side_effect = [old_model, new_model]
+
+        manager = WhisperModelManager()
+        manager.model_dir = tmp_path
+        manager.reload_interval = 0.01
+        assert manager.load_model("custom-model") is old_model
+
+        _rewrite(custom_file, "version 2")
+        time.sleep(0.02)
+        # 更新の確認はロードを待たずに現在の版を返す
+        assert manager.load_model("custom-model") is old_model
+        for _ in range(100):
+            if manager.loaded_models["custom-model"] is new_model:
+                break
+            time.sleep(0.01)
+        assert manager.load_model("custom-model") is new_model
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import torch
+import whisper
+from whisper.model import ModelDimensions, Whisper
+from app.services.decoder import transcribe_mel
+from app.services.mel_frontend import LogMelFrontend
+
+
+@pytest.fixture(scope="module")
+def random_model():
+    """ダウンロード不要な小さいランダム重みのWhisperモデル"""
+    torch.manual_seed(0)
+    dims = ModelDimensions(
+        n_mels=80,
+        n_audio_ctx=1500,
+        n_audio_state=64,
+        n_audio_head=2,
+        n_audio_layer=1,
+        n_vocab=51865,
+        n_text_ctx=448,
+        n_text_state=64,
+        n_text_head=2,
+        n_text_layer=1,
+    )
+    model = Whisper(dims).eval()
+    # デコーダーの位置埋め込みは torch.empty で確保され未初期化のため、NaNを含み得る
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+    return model
+
+
+@pytest.mark.parametrize("language", ["ja", None])
+def test_matches_whisper_transcribe(random_model, language):
+    """30秒を超える音声でもwhisper.transcribeと同じ結果になる"""
+    rng = np.random.default_rng(1)
+    audio = (rng.standard_normal(16000 * 35) * 0.1).astype(np.float32)
+
+    expected = whisper.transcribe(
+        random_model, audio, language=language, temperature=0.0, fp16=False
+    )
+    mel = LogMelFrontend().compute(audio, 80)
+    result = transcribe_mel(random_model, mel, language=language, temperature=0.0)
+
+    assert result["text"] == expected["text"]
+    assert result["language"] == expected["language"]
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [
+        (s["start"], s["end"]) for s in expected["segments"]
+    ]
+
+
+def test_auto_language_uses_single_encoder_pass(random_model):
+    """言語判定と温度フォールバックで先頭窓のエンコード結果を共有する"""
+    rng = np.random.default_rng(2)
+    audio = (rng.standard_normal(16000 * 10) * 0.1).astype(np.float32)
+    mel = LogMelFrontend().compute(audio, 80)
+
+    encoder_calls = []
+    handle = random_model.encoder.register_forward_hook(
+        lambda *args: encoder_calls.append(1)
+    )
+    try:
+        result = transcribe_mel(random_model, mel, language=None)
+    finally:
+        handle.remove()
+
+    assert len(encoder_calls) == 1
+    assert 0.0 < result["language_probability"] <= 1.0
+
+
+def test_records_encode_and_decode_timings(random_model):
+    from app.core.timing import StageTimings
+
+    mel = LogMelFrontend().compute(np.zeros(16000 * 2, dtype=np.float32), 80)
+    timings = StageTimings()
+
+    transcribe_mel(random_model, mel, language="ja", temperature=0.0, timings=timings)
+
+    assert timings.get("encode") > 0.0
+    assert timings.get("decode") > 0.0
+
+
+def test_segments_are_reported_per_window(random_model):
+    rng = np.random.default_rng(3)
+    audio = (rng.standard_normal(16000 * 35) * 0.1).astype(np.float32)
+    mel = LogMelFrontend().compute(audio, 80)
+    reported = []
+
+    result = transcribe_mel(
+        random_model,
+        mel,
+        language="ja",
+        temperature=0.0,
+        no_speech_threshold=None,
+        on_segments=lambda segments: reported.append(segments),
+    )
+
+    assert len(reported) >= 2
+    assert [s for segments in reported for s in segments] == result["segments"]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from app.services.decoding_profiles import DECODING_PROFILES, get_decoding_profile
+from app.services.whisper_service import WhisperModelManager
+
+
+class TestDecodingProfiles:
+    def test_builtin_profiles(self):
+        assert set(DECODING_PROFILES) == {"fast", "balanced", "accurate"}
+
+    def test_fast_profile_is_single_pass_greedy(self):
+        options = get_decoding_profile("fast").decode_options()
+
+        assert options["temperature"] == (0.0,)
+        assert options["compression_ratio_threshold"] is None
+        assert options["logprob_threshold"] is None
+        assert options["condition_on_previous_text"] is False
+        assert options["without_timestamps"] is True
+        assert "beam_size" not in options
+        assert "best_of" not in options
+
+    def test_accurate_profile_uses_beam_search(self):
+        options = get_decoding_profile("accurate").decode_options()
+
+        assert options["beam_size"] == 5
+        assert options["best_of"] == 5
+        assert len(options["temperature"]) > 1
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError) as exc_info:
+            get_decoding_profile("ultra")
+
+        assert "Invalid decoding profile" in str(exc_info.value)
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_manager_applies_profile(self, mock_load_model, mock_transcribe_mel):
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "fast",
+            "language": "ja",
+            "segments": [],
+        }
+
+        manager = WhisperModelManager()
+        result = manager.transcribe(
+            np.zeros(16000, dtype=np.float32), "base", "ja", profile="fast"
+        )
+
+        assert result["decoding_profile"] == "fast"
+        kwargs = mock_transcribe_mel.call_args.kwargs
+        assert kwargs["temperature"] == (0.0,)
+        assert kwargs["without_timestamps"] is True
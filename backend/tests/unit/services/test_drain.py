@@ -0,0 +1,112 @@
+import asyncio
+import os
+import signal
+import threading
+
+import pytest
+
+from app.core.exceptions import ServiceBusyError
+from app.services.drain import DrainController
+
+
+def test_check_rejects_while_draining():
+    drain = DrainController(retry_after=4)
+    drain.check()
+
+    drain.draining = True
+    with pytest.raises(ServiceBusyError) as exc_info:
+        drain.check()
+    assert exc_info.value.retry_after == 4
+    assert exc_info.value.reason == "draining"
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_requests():
+    drain = DrainController(grace_seconds=5)
+
+    async def request():
+        with drain.track():
+            await asyncio.sleep(0.2)
+
+    task = asyncio.create_task(request())
+    await asyncio.sleep(0)
+    assert drain.in_flight == 1
+
+    assert await drain.drain() == 0
+    assert task.done()
+    assert drain.draining is True
+
+
+@pytest.mark.asyncio
+async def test_drain_gives_up_after_grace_period():
+    drain = DrainController(grace_seconds=0.1)
+    with drain.track():
+        assert await drain.drain() == 1
+
+
+@pytest.mark.asyncio
+async def test_drain_notifies_sessions():
+    drain = DrainController(grace_seconds=5)
+
+    async def session():
+        with drain.session() as drained:
+            await drained.wait()
+
+    task = asyncio.create_task(session())
+    await asyncio.sleep(0)
+
+    assert await drain.drain() == 0
+    await task
+
+    # 停止処理の開始後に始まったセッションはすぐに通知される
+    with drain.session() as drained:
+        assert drained.is_set()
+
+
+@pytest.mark.asyncio
+async def test_sigterm_drains_before_previous_handler():
+    received = []
+    original = signal.signal(
+        signal.SIGTERM, lambda signum, frame: received.append(signum)
+    )
+    try:
+        drain = DrainController(grace_seconds=5)
+        drain.install_signal_handlers()
+
+        with drain.track():
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.sleep(0.2)
+            # 処理中のリクエストがある間は元のハンドラーを呼ばない
+            assert drain.draining is True
+            assert received == []
+
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.05)
+        assert received == [signal.SIGTERM]
+    finally:
+        signal.signal(signal.SIGTERM, original)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
+def test_signal_handlers_are_skipped_off_the_main_thread():
+    """TestClient のようにメインスレッド以外で起動した場合はハンドラーを設定しない"""
+    errors = []
+    before = signal.getsignal(signal.SIGTERM)
+
+    def install():
+        try:
+            asyncio.run(install_async())
+        except Exception as e:
+            errors.append(e)
+
+    async def install_async():
+        DrainController().install_signal_handlers()
+
+    thread = threading.Thread(target=install)
+    thread.start()
+    thread.join()
+
+    assert errors == []
+    assert signal.getsignal(signal.SIGTERM) is before
@@ -0,0 +1,288 @@
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from app.core.exceptions import RequestCancelledError
+from app.services.cancellation import Cancellation
+from app.services.inference_broker import (
+    InferenceBroker,
+    InMemoryStore,
+    create_broker,
+    decode_message,
+    encode_message,
+    serve_local_store,
+)
+from app.services.model_router import ModelRouter
+from app.services.remote_inference import (
+    InferenceWorker,
+    RemoteInferenceClient,
+    RemoteInferenceError,
+)
+from app.core.timing import StageTimings
+
+
+def test_message_roundtrip():
+    audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+    header = {"op": "transcribe", "probability": np.float32(0.5)}
+
+    decoded_header, decoded_audio = decode_message(encode_message(header, audio))
+
+    assert decoded_header == {"op": "transcribe", "probability": 0.5}
+    np.testing.assert_array_equal(decoded_audio, audio)
+    assert decode_message(encode_message({"ok": True}))[1] is None
+
+    # 16-bit PCMは変換せずに送る
+    pcm = np.arange(-8, 8, dtype=np.int16)
+    payload = encode_message(header, pcm)
+    assert len(payload) < len(encode_message(header, pcm.astype(np.float32)))
+    decoded_header, decoded_audio = decode_message(payload)
+    assert decoded_audio.dtype == np.int16
+    np.testing.assert_array_equal(decoded_audio, pcm)
+
+
+class TestInMemoryStore:
+    def test_fifo_order(self):
+        store = InMemoryStore()
+        store.lpush("q", b"1")
+        store.lpush("q", b"2")
+
+        assert store.llen("q") == 2
+        assert store.brpop(["q"], timeout=1) == ("q", b"1")
+        assert store.brpop(["q"], timeout=1) == ("q", b"2")
+        assert store.llen("q") == 0
+
+    def test_brpop_timeout(self):
+        store = InMemoryStore()
+        started = time.monotonic()
+        assert store.brpop(["q"], timeout=0.05) is None
+        assert time.monotonic() - started >= 0.05
+
+    def test_brpop_wakes_on_push(self):
+        store = InMemoryStore()
+        threading.Timer(0.05, store.lpush, ("q", b"late")).start()
+        assert store.brpop(["q"], timeout=5) == ("q", b"late")
+
+    def test_expire(self):
+        store = InMemoryStore()
+        store.lpush("result", b"r")
+        assert store.expire("result", 0) is True
+        assert store.llen("result") == 0
+        assert store.expire("missing", 10) is False
+
+
+def test_remote_transcribe_through_worker():
+    """APIプロセス側のクライアントからワーカーに推論を依頼する"""
+    broker = InferenceBroker(InMemoryStore())
+    worker_manager = Mock()
+    worker_manager.loaded_models = {}
+
+    def transcribe(
+        audio, model_name, language, profile, timings, priority, client, cancel
+    ):
+        timings.add("encode", 0.25)
+        return {"text": f"{len(audio)} samples ({priority})", "language": language}
+
+    worker_manager.transcribe.side_effect = transcribe
+    worker = InferenceWorker(broker, worker_manager)
+    runner = threading.Thread(target=worker.run, daemon=True)
+    runner.start()
+
+    try:
+        client = RemoteInferenceClient(broker, Mock(), timeout=5)
+        timings = StageTimings()
+        result = client.transcribe(
+            np.zeros(16000, dtype=np.float32),
+            "tiny",
+            "ja",
+            timings=timings,
+            priority="batch",
+            client="ip:192.0.2.1",
+        )
+
+        assert result == {"text": "16000 samples (batch)", "language": "ja"}
+        assert worker_manager.transcribe.call_args.kwargs["client"] == "ip:192.0.2.1"
+        assert worker_manager.transcribe.call_args.kwargs["cancel"] is None
+        assert timings.get("encode") == 0.25
+        assert timings.get("dispatch") >= 0
+
+        # 期限はワーカーに渡され、ワーカーでの打ち切りはクライアントで同じ例外になる
+        client.transcribe(
+            np.zeros(10, dtype=np.float32), "tiny", "ja", cancel=Cancellation(30)
+        )
+        cancel = worker_manager.transcribe.call_args.kwargs["cancel"]
+        assert 25 < cancel.remaining() <= 30
+        worker_manager.transcribe.side_effect = RequestCancelledError("deadline")
+        with pytest.raises(RequestCancelledError):
+            client.transcribe(
+                np.zeros(10, dtype=np.float32), "tiny", "ja", cancel=Cancellation(30)
+            )
+        worker_manager.transcribe.side_effect = transcribe
+
+        client.load_model("base")
+        worker_manager.load_model.assert_called_once_with("base")
+
+        worker_manager.transcribe.side_effect = ValueError("broken model")
+        with pytest.raises(RemoteInferenceError, match="broken model"):
+            client.transcribe(np.zeros(10, dtype=np.float32), "tiny", "ja")
+    finally:
+        worker.stopping.set()
+        runner.join()
+
+
+def test_remote_transcribe_decodes_audio_in_api_process():
+    broker = InferenceBroker(InMemoryStore())
+    worker_manager = Mock()
+    worker_manager.loaded_models = {}
+    worker_manager.transcribe.return_value = {"text": "ok"}
+    api_manager = Mock()
+    api_manager.load_audio.return_value = np.zeros(320, dtype=np.float32)
+
+    worker = InferenceWorker(broker, worker_manager)
+    runner = threading.Thread(target=worker.run_once, args=(5,))
+    runner.start()
+    client = RemoteInferenceClient(broker, api_manager, timeout=5)
+    assert client.transcribe("/tmp/audio.wav", "tiny", "ja") == {"text": "ok"}
+    runner.join()
+
+    api_manager.load_audio.assert_called_once_with("/tmp/audio.wav")
+    assert len(worker_manager.transcribe.call_args.args[0]) == 320
+
+
+def test_remote_transcribe_timeout():
+    client = RemoteInferenceClient(InferenceBroker(InMemoryStore()), Mock(), 0.1)
+    with pytest.raises(TimeoutError, match="within 0.1 seconds"):
+        client.transcribe(np.zeros(10, dtype=np.float32), "tiny", "ja")
+
+    # 期限で短くなった待ち時間を報告する
+    client = RemoteInferenceClient(InferenceBroker(InMemoryStore()), Mock(), 5)
+    cancel = Mock(reason=None)
+    cancel.remaining.return_value = 0.1
+    with pytest.raises(TimeoutError, match="within 0.1 seconds"):
+        client.transcribe(np.zeros(10, dtype=np.float32), "tiny", "ja", cancel=cancel)
+
+
+def test_unix_socket_store(tmp_path):
+    """別プロセスで公開したストアにUnixソケットで接続する"""
+    socket_path = tmp_path / "private" / "queue.sock"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from app.services.inference_broker import serve_local_store; "
+            f"serve_local_store({str(socket_path)!r}, b'secret')",
+        ]
+    )
+    try:
+        for _ in range(100):
+            if socket_path.exists():
+                break
+            time.sleep(0.05)
+
+        # ソケットとディレクトリは所有者のみがアクセスできる
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+        assert socket_path.parent.stat().st_mode & 0o777 == 0o700
+
+        broker = create_broker(f"unix://{socket_path}", b"secret")
+        broker.submit(b"task")
+        assert broker.pending() == 1
+        assert broker.next_task(timeout=1) == b"task"
+
+        broker.publish_result("abc", b"result")
+        assert broker.wait_result("abc", timeout=1) == b"result"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_worker_queues_and_registry():
+    broker = InferenceBroker(InMemoryStore())
+    broker.submit(b"shared")
+    broker.submit(b"direct", worker_id="w1")
+
+    # 自分宛てのタスクを先に受け取る
+    assert broker.next_task(timeout=1, worker_id="w1") == b"direct"
+    assert broker.next_task(timeout=1, worker_id="w2") == b"shared"
+
+    broker.register_worker("w1", {"models": ["tiny"]})
+    assert broker.workers(max_age=10)["w1"]["models"] == ["tiny"]
+    assert broker.workers(max_age=-1) == {}
+    broker.unregister_worker("w1")
+    assert broker.workers(max_age=10) == {}
+
+
+def test_requeue_tasks():
+    """ワーカー専用のキューに残ったタスクを順序を保って共有のキューに戻す"""
+    broker = InferenceBroker(InMemoryStore())
+    broker.submit(b"shared")
+    broker.submit(b"first", worker_id="w1")
+    broker.submit(b"second", worker_id="w1")
+    broker.submit(b"batch", worker_id="w1", priority="batch")
+
+    assert broker.requeue_tasks("w1") == 3
+    assert broker.requeue_tasks("w1") == 0
+    received = [broker.next_task(timeout=1, worker_id="w2") for _ in range(4)]
+    assert received == [b"shared", b"first", b"second", b"batch"]
+
+
+def test_remote_client_requeues_tasks_of_dead_worker():
+    """振り分け先のワーカーのハートビートが途絶えたら、他のワーカーが処理する"""
+    broker = InferenceBroker(InMemoryStore())
+    # 登録直後にハートビートが止まったワーカー
+    broker.register_worker("dead", {"models": ["tiny"], "threads": 1})
+    router = ModelRouter(broker, heartbeat_timeout=0.5)
+    worker_manager = Mock()
+    worker_manager.loaded_models = {}
+    worker_manager.transcribe.return_value = {"text": "rescued"}
+
+    worker = InferenceWorker(broker, worker_manager, worker_id="alive")
+    runner = threading.Thread(target=worker.run_once, args=(10,))
+    runner.start()
+    client = RemoteInferenceClient(broker, Mock(), timeout=30, router=router)
+    started = time.monotonic()
+    result = client.transcribe(np.zeros(10, dtype=np.float32), "tiny", "ja")
+    runner.join()
+
+    assert result == {"text": "rescued"}
+    assert time.monotonic() - started < 10
+
+
+def test_priority_queues():
+    """優先度の高いクラスのタスクから受け取る"""
+    broker = InferenceBroker(InMemoryStore())
+    broker.submit(b"batch", priority="batch")
+    broker.submit(b"interactive")
+    broker.submit(b"direct-batch", worker_id="w1", priority="batch")
+    broker.submit(b"live", priority="realtime")
+    assert broker.pending() == 3
+
+    received = [broker.next_task(timeout=1, worker_id="w1") for _ in range(4)]
+    assert received == [b"live", b"interactive", b"direct-batch", b"batch"]
+
+    with pytest.raises(ValueError):
+        broker.submit(b"task", priority="urgent")
+
+
+def test_create_broker_invalid_url():
+    with pytest.raises(ValueError):
+        create_broker("amqp://localhost")
+
+
+def test_unix_socket_store_requires_authkey(tmp_path):
+    socket_path = tmp_path / "queue.sock"
+    with pytest.raises(ValueError):
+        serve_local_store(str(socket_path), b"")
+    with pytest.raises(ValueError):
+        create_broker(f"unix://{socket_path}")
+    assert not socket_path.exists()
+
+
+def test_unix_socket_store_requires_private_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        serve_local_store(str(shared / "queue.sock"), b"secret")
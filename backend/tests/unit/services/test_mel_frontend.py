@@ -0,0 +1,83 @@
+import numpy as np
+import torch
+from whisper.audio import N_SAMPLES, log_mel_spectrogram
+from app.services.mel_frontend import (
+    IncrementalSpectrogram,
+    LogMelFrontend,
+    power_spectrogram,
+)
+
+
+def make_audio(seconds: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(16000 * seconds)) * 0.1).astype(np.float32)
+
+
+def whisper_reference(audio: np.ndarray) -> torch.Tensor:
+    """whisper.transcribe と同じ無音パディング付きのlog-mel（内容フレームのみ）"""
+    mel = log_mel_spectrogram(audio, 80, padding=N_SAMPLES)
+    return mel[:, : len(audio) // 160]
+
+
+class TestLogMelFrontend:
+    def test_compute_matches_whisper(self):
+        audio = make_audio(3.3)
+        mel = LogMelFrontend().compute(audio, 80)
+
+        torch.testing.assert_close(mel, whisper_reference(audio))
+
+    def test_compute_batch_matches_individual(self):
+        clips = [make_audio(2.0, seed=1), make_audio(0.7, seed=2), make_audio(4.1)]
+        mels = LogMelFrontend().compute_batch(clips, 80)
+
+        assert len(mels) == 3
+        for clip, mel in zip(clips, mels):
+            torch.testing.assert_close(mel, whisper_reference(clip))
+
+    def test_compute_batch_empty(self):
+        assert LogMelFrontend().compute_batch([], 80) == []
+
+
+class TestIncrementalSpectrogram:
+    def test_incremental_matches_full_computation(self):
+        audio = make_audio(3.0)
+        spectrogram = IncrementalSpectrogram()
+        for i in range(0, len(audio), 1234):
+            spectrogram.extend(audio[i : i + 1234])
+
+        frames = spectrogram.frames(0, len(audio) // 160)
+        expected = power_spectrogram(torch.from_numpy(audio))[:, : len(audio) // 160]
+
+        assert spectrogram.num_frames < len(audio) // 160  # 末尾は暫定計算
+        torch.testing.assert_close(frames, expected)
+
+    def test_committed_frames_are_not_recomputed(self):
+        audio = make_audio(2.0)
+        spectrogram = IncrementalSpectrogram()
+        spectrogram.extend(audio[:16000])
+        committed = spectrogram.num_frames
+        first = spectrogram.frames(0, committed).clone()
+
+        spectrogram.extend(audio[16000:])
+
+        assert spectrogram.num_frames > committed
+        torch.testing.assert_close(spectrogram.frames(0, committed), first)
+
+    def test_discard_before(self):
+        spectrogram = IncrementalSpectrogram()
+        spectrogram.extend(make_audio(1.0))
+        spectrogram.discard_before(50)
+
+        assert spectrogram.frames(50, 80).shape == (201, 30)
+        try:
+            spectrogram.frames(0, 10)
+            assert False, "discarded frames should not be available"
+        except ValueError:
+            pass
+
+    def test_short_input(self):
+        spectrogram = IncrementalSpectrogram()
+        spectrogram.extend(make_audio(0.005))
+
+        assert spectrogram.num_frames == 0
+        assert spectrogram.frames(0, 0).shape == (201, 0)
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import torch
+from whisper.model import ModelDimensions, Whisper
+from app.core.exceptions import RequestCancelledError
+from app.services.decoder import transcribe_mel
+from app.services.mel_frontend import LogMelFrontend
+from app.services.model_pool import ModelReplicaPool, create_replica
+
+
+@pytest.fixture(scope="module")
+def random_model():
+    """ダウンロード不要な小さいランダム重みのWhisperモデル"""
+    torch.manual_seed(0)
+    dims = ModelDimensions(
+        n_mels=80,
+        n_audio_ctx=1500,
+        n_audio_state=64,
+        n_audio_head=2,
+        n_audio_layer=1,
+        n_vocab=51865,
+        n_text_ctx=448,
+        n_text_state=64,
+        n_text_head=2,
+        n_text_layer=1,
+    )
+    model = Whisper(dims).eval()
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+    return model
+
+
+def test_replica_shares_weights(random_model):
+    replica = create_replica(random_model)
+
+    assert replica is not random_model
+    assert replica.decoder is not random_model.decoder
+    for original, copied in zip(random_model.parameters(), replica.parameters()):
+        assert copied is original
+    for original, copied in zip(random_model.buffers(), replica.buffers()):
+        assert copied is original
+
+
+def test_replicas_transcribe_in_parallel(random_model):
+    """レプリカごとに同時に推論しても単独実行と同じ結果になる"""
+    rng = np.random.default_rng(3)
+    audio = (rng.standard_normal(16000 * 5) * 0.1).astype(np.float32)
+    mel = LogMelFrontend().compute(audio, 80)
+    expected = transcribe_mel(random_model, mel, language="ja", temperature=0.0)
+
+    pool = ModelReplicaPool(random_model, replicas=2)
+
+    def run(_):
+        with pool.checkout() as model:
+            return transcribe_mel(model, mel, language="ja", temperature=0.0)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(run, range(4)))
+
+    for result in results:
+        assert result["text"] == expected["text"]
+    assert pool.available == 2
+
+
+def test_checkout_waits_for_free_replica():
+    pool = ModelReplicaPool(object(), replicas=1)
+    entered = threading.Event()
+    order = []
+
+    def hold():
+        with pool.checkout():
+            entered.set()
+            time.sleep(0.05)
+            order.append("first")
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait()
+    assert pool.available == 0
+    with pool.checkout():
+        order.append("second")
+    thread.join()
+
+    assert order == ["first", "second"]
+    assert pool.available == 1
+
+
+def test_checkout_sets_thread_count(random_model):
+    original = torch.get_num_threads()
+    pool = ModelReplicaPool(random_model, replicas=1, threads=1)
+    try:
+        with pool.checkout():
+            assert torch.get_num_threads() == 1
+    finally:
+        torch.set_num_threads(original)
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_checkout_pins_replica_cores():
+    cores = sorted(os.sched_getaffinity(0))
+    pool = ModelReplicaPool(object(), replicas=1, core_sets=[cores[:1]])
+
+    def run():
+        with pool.checkout():
+            return os.sched_getaffinity(0)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(run).result() == {cores[0]}
+        # 返却後は同じスレッドで動く別の処理にコアの固定を持ち越さない
+        assert sorted(executor.submit(os.sched_getaffinity, 0).result()) == cores
+    # 呼び出し元のスレッドのコア割り当ては変わらない
+    assert sorted(os.sched_getaffinity(0)) == cores
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_lease_restores_thread_settings():
+    """返却時と、コアを固定しないレプリカに移った場合は借りる前の設定に戻す"""
+    cores = sorted(os.sched_getaffinity(0))
+    original_threads = torch.get_num_threads()
+    pool = ModelReplicaPool(object(), replicas=1, threads=1, core_sets=[cores[:1]])
+
+    def run():
+        torch.set_num_threads(2)
+        with pool.lease() as lease:
+            leased_threads = torch.get_num_threads()
+            pinned = os.sched_getaffinity(0)
+            pool._bind(None, lease.saved_affinity)
+            unpinned = os.sched_getaffinity(0)
+            pool._bind(cores[:1], lease.saved_affinity)
+        after = (os.sched_getaffinity(0), torch.get_num_threads())
+        return leased_threads, pinned, unpinned, after
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leased_threads, pinned, unpinned, after = executor.submit(run).result()
+    finally:
+        torch.set_num_threads(original_threads)
+
+    assert leased_threads == 1
+    assert after == (set(cores), 2)
+    assert pinned == {cores[0]}
+    assert sorted(unpinned) == cores
+
+
+def test_transcribe_mel_checkpoints_between_windows(random_model):
+    """30秒窓の区切りごとに checkpoint を呼び、返されたレプリカで続きを処理する"""
+    rng = np.random.default_rng(4)
+    audio = (rng.standard_normal(16000 * 35) * 0.1).astype(np.float32)
+    mel = LogMelFrontend().compute(audio, 80)
+    expected = transcribe_mel(random_model, mel, language="ja", temperature=0.0)
+
+    pool = ModelReplicaPool(random_model, replicas=2)
+    windows = []
+    with pool.lease("batch", "client", 30.0) as lease:
+
+        def checkpoint(seconds):
+            windows.append(seconds)
+            return lease.checkpoint(seconds)
+
+        result = transcribe_mel(
+            lease.model, mel, language="ja", temperature=0.0, checkpoint=checkpoint
+        )
+
+    assert result["text"] == expected["text"]
+    assert len(windows) >= 1
+    assert all(0 < seconds <= 30 for seconds in windows)
+    assert pool.available == 2
+
+
+def test_transcribe_mel_stops_when_checkpoint_returns_none(random_model):
+    """checkpoint が None を返したら、それまでの窓の結果を truncated として返す"""
+    rng = np.random.default_rng(4)
+    audio = (rng.standard_normal(16000 * 65) * 0.1).astype(np.float32)
+    mel = LogMelFrontend().compute(audio, 80)
+    windows = []
+
+    def checkpoint(seconds):
+        windows.append(seconds)
+        return None
+
+    result = transcribe_mel(
+        random_model, mel, language="ja", temperature=0.0, checkpoint=checkpoint
+    )
+
+    assert result["truncated"] is True
+    assert len(windows) == 1
+    assert all(segment["end"] <= 30.0 for segment in result["segments"])
+
+
+def test_lease_cancelled_while_yielding_releases_once():
+    pool = ModelReplicaPool(object(), replicas=1)
+    cancelled = []
+
+    def reason():
+        return cancelled[0] if cancelled else None
+
+    with pytest.raises(RequestCancelledError):
+        with pool.lease("batch", "a", 30.0, reason) as lease:
+
+            def live():
+                with pool.checkout("realtime", "b", 2.0):
+                    cancelled.append("deadline")
+                    time.sleep(0.2)
+
+            thread = threading.Thread(target=live)
+            thread.start()
+            deadline = time.monotonic() + 5
+            while pool.scheduler.waiting() == 0:
+                assert time.monotonic() < deadline
+                time.sleep(0.005)
+            lease.checkpoint(30.0)
+    thread.join()
+
+    assert pool.available == 1
+
+
+def test_lease_yields_to_realtime_chunk():
+    pool = ModelReplicaPool(object(), replicas=1)
+    order = []
+
+    with pool.lease("batch", "a", 30.0) as lease:
+
+        def live():
+            with pool.checkout("realtime", "b", 2.0):
+                order.append("live")
+
+        thread = threading.Thread(target=live)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while pool.scheduler.waiting() == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+
+        assert lease.checkpoint(30.0) is pool.model
+        order.append("batch")
+        thread.join()
+
+    assert order == ["live", "batch"]
+    assert pool.available == 1
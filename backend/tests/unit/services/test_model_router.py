@@ -0,0 +1,109 @@
+import time
+from unittest.mock import Mock
+
+from app.services.inference_broker import InferenceBroker, InMemoryStore, encode_message
+from app.services.model_router import ModelRouter
+from app.services.remote_inference import InferenceWorker
+
+
+def status(models, busy=0, threads=1, max_models=0, model_bytes=0):
+    return {
+        "models": models,
+        "busy": busy,
+        "queued": 0,
+        "threads": threads,
+        "max_models": max_models,
+        "model_bytes": model_bytes,
+    }
+
+
+def make_router(workers):
+    broker = InferenceBroker(InMemoryStore())
+    for worker_id, worker_status in workers.items():
+        broker.register_worker(worker_id, worker_status)
+    return broker, ModelRouter(broker, refresh_interval=0)
+
+
+def test_no_workers_uses_shared_queue():
+    _, router = make_router({})
+    assert router.route("tiny") is None
+
+
+def test_prefers_worker_holding_model():
+    _, router = make_router(
+        {"w1": status(["base"]), "w2": status(["tiny"]), "w3": status([])}
+    )
+    assert router.route("tiny") == "w2"
+    assert router.route("base") == "w1"
+
+
+def test_new_model_goes_to_idle_worker_with_least_memory():
+    _, router = make_router(
+        {
+            "w1": status(["base"], model_bytes=300),
+            "w2": status(["tiny"], model_bytes=100),
+            "w3": status(["small"], busy=1, model_bytes=0),
+        }
+    )
+    assert router.route("custom") == "w2"
+
+
+def test_pending_load_is_not_duplicated():
+    """ロードを依頼したワーカーは状態に反映される前でもロード済みとみなす"""
+    _, router = make_router({"w1": status([], threads=2), "w2": status([], threads=2)})
+
+    first = router.route("custom")
+    with router.track(first):
+        assert router.route("custom") == first
+
+
+def test_hot_model_spreads_to_idle_worker():
+    _, router = make_router({"w1": status(["tiny"], busy=1), "w2": status([])})
+    assert router.route("tiny") == "w2"
+
+
+def test_saturated_workers_stay_on_holder():
+    _, router = make_router(
+        {"w1": status(["tiny"], busy=2), "w2": status(["base"], busy=3)}
+    )
+    assert router.route("tiny") == "w1"
+
+
+def test_full_workers_are_not_preferred_for_new_models():
+    _, router = make_router(
+        {
+            "w1": status(["tiny"], max_models=1),
+            "w2": status(["base"], busy=1, max_models=2),
+        }
+    )
+    assert router.route("custom") == "w2"
+
+
+def test_stale_workers_are_ignored():
+    broker, router = make_router({"w1": status(["tiny"])})
+    router.heartbeat_timeout = 0.01
+    time.sleep(0.02)
+    assert router.route("tiny") is None
+
+
+def test_worker_evicts_least_recently_used_model():
+    broker = InferenceBroker(InMemoryStore())
+    manager = Mock()
+    manager.loaded_models = {}
+
+    def load_model(name):
+        manager.loaded_models[name] = Mock()
+
+    def unload_model(name):
+        return manager.loaded_models.pop(name, None) is not None
+
+    manager.load_model.side_effect = load_model
+    manager.unload_model.side_effect = unload_model
+    worker = InferenceWorker(broker, manager, worker_id="w1", max_models=2)
+
+    for model_name in ("tiny", "base", "tiny", "small"):
+        worker.handle(encode_message({"id": "t", "op": "load", "model": model_name}))
+
+    assert set(manager.loaded_models) == {"tiny", "small"}
+    # モデルが変わるたびに状態を登録し直す
+    assert broker.workers(max_age=10)["w1"]["models"] == ["tiny", "small"]
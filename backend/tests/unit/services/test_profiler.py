@@ -0,0 +1,48 @@
+import sys
+import threading
+from collections import Counter
+
+import pytest
+from app.services.profiler import (
+    ProfilerBusyError,
+    SamplingProfiler,
+    collapse_stack,
+    format_collapsed,
+)
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    def test_profile_records_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="inference")
+        worker.start()
+        try:
+            samples = SamplingProfiler().profile(0.1, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+
+        stacks = [stack for stack in samples if stack.startswith("inference;")]
+        assert stacks
+        assert any("busy_loop (test_profiler.py:" in stack for stack in stacks)
+
+    def test_rejects_concurrent_sessions(self):
+        profiler = SamplingProfiler()
+        profiler._running.acquire()
+        with pytest.raises(ProfilerBusyError):
+            profiler.profile(0.01)
+
+    def test_format_collapsed(self):
+        stack = collapse_stack("main;thread", sys._getframe())
+        assert stack.startswith("main_thread;")
+        assert stack.split(";")[-1].startswith(
+            "test_format_collapsed (test_profiler.py:"
+        )
+
+        text = format_collapsed(Counter({"a;b": 3, "a;c": 5}))
+        assert text == "a;c 5\na;b 3\n"
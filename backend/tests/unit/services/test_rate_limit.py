@@ -0,0 +1,134 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from app.core.exceptions import RateLimitExceededError
+from app.services.rate_limit import (
+    InMemoryBucketStore,
+    RateLimiter,
+    SqliteBucketStore,
+    create_bucket_store,
+    parse_model_weights,
+    refill,
+)
+
+
+def test_refill():
+    # 10秒で10トークン補充され、容量で頭打ちになる
+    assert refill(0.0, 0.0, 10.0, 1.0, 100.0, 5.0) == (5.0, 0.0)
+    assert refill(95.0, 0.0, 10.0, 1.0, 100.0, 0.0) == (100.0, 0.0)
+    # 足りない場合は引かずに待ち時間を返す
+    assert refill(2.0, 0.0, 0.0, 0.5, 100.0, 5.0) == (2.0, 6.0)
+
+
+def test_refill_cost_larger_than_capacity():
+    """容量を超える長い音声は満タンなら受け付け、残量を負にする"""
+    assert refill(100.0, 0.0, 0.0, 1.0, 100.0, 7200.0) == (-7100.0, 0.0)
+    tokens, wait = refill(50.0, 0.0, 0.0, 1.0, 100.0, 7200.0)
+    assert (tokens, wait) == (50.0, 50.0)
+    # 負の間は秒数0の確認も待たされる
+    assert refill(-10.0, 0.0, 0.0, 2.0, 100.0, 0.0) == (-10.0, 5.0)
+
+
+def test_parse_model_weights():
+    assert parse_model_weights("tiny=0.5, base=1,large-v3=8,") == {
+        "tiny": 0.5,
+        "base": 1.0,
+        "large-v3": 8.0,
+    }
+
+
+class TestRateLimiter:
+    def test_take_and_retry_after(self):
+        limiter = RateLimiter(InMemoryBucketStore(), rate=2.0, burst=10.0)
+        limiter.take("client", 8.0)
+        with pytest.raises(RateLimitExceededError) as exc_info:
+            limiter.take("client", 7.0)
+        # 残り約2秒分、足りない5秒分は2.5秒で補充される
+        assert exc_info.value.retry_after == 3
+        assert exc_info.value.reason == "rate_limited"
+
+        # クライアントごとに別のバケット
+        limiter.take("other", 10.0)
+
+    def test_disabled(self):
+        limiter = RateLimiter(InMemoryBucketStore(), rate=0, burst=1.0)
+        assert limiter.enabled is False
+        limiter.take("client", 1000.0)
+        limiter.take("client", 1000.0)
+
+    def test_check_does_not_consume(self):
+        limiter = RateLimiter(InMemoryBucketStore(), rate=0.001, burst=10.0)
+        limiter.check("client", 10.0)
+        limiter.check("client", 10.0)
+        limiter.take("client", 6.0)
+        with pytest.raises(RateLimitExceededError):
+            limiter.check("client", 6.0)
+
+    def test_check_rejects_while_in_debt(self):
+        limiter = RateLimiter(InMemoryBucketStore(), rate=1.0, burst=10.0)
+        limiter.check("client")
+        limiter.take("client", 100.0)
+        with pytest.raises(RateLimitExceededError) as exc_info:
+            limiter.check("client")
+        assert 89 <= exc_info.value.retry_after <= 90
+
+    def test_cost_weighted_by_model(self):
+        limiter = RateLimiter(
+            InMemoryBucketStore(), 1.0, 10.0, {"tiny": 0.5, "large-v3": 8.0}
+        )
+        assert limiter.cost(10.0, "tiny") == 5.0
+        assert limiter.cost(10.0, "custom-model") == 10.0
+        # カスケード時は両方のモデルの分
+        assert limiter.cost(10.0, "tiny", "large-v3") == 85.0
+        assert limiter.cost(10.0, "tiny", None) == 5.0
+
+    def test_client_key(self):
+        limiter = RateLimiter(InMemoryBucketStore(), 1.0, 10.0)
+        conn = Mock()
+        conn.headers = {"X-API-Key": "secret"}
+        key = limiter.client_key(conn)
+        assert key.startswith("key:")
+        assert "secret" not in key
+
+        conn.headers = {}
+        conn.client.host = "192.0.2.1"
+        assert limiter.client_key(conn) == "ip:192.0.2.1"
+
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    """同じファイルを開いたストア（別ワーカー）で残量を共有する"""
+    path = tmp_path / "buckets.sqlite3"
+    first = RateLimiter(SqliteBucketStore(path), rate=0.001, burst=10.0)
+    second = RateLimiter(SqliteBucketStore(path), rate=0.001, burst=10.0)
+
+    first.take("client", 6.0)
+    with pytest.raises(RateLimitExceededError):
+        second.take("client", 6.0)
+    second.take("client", 4.0)
+
+
+def test_sqlite_store_concurrent_takes(tmp_path):
+    """同時に引き出しても容量を超えて受け付けない"""
+    store = SqliteBucketStore(tmp_path / "buckets.sqlite3")
+    accepted = []
+
+    def take() -> None:
+        for _ in range(10):
+            if store.take("client", 1.0, 0.0001, 25.0) == 0:
+                accepted.append(1)
+
+    threads = [threading.Thread(target=take) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(accepted) == 25
+
+
+def test_create_bucket_store(tmp_path):
+    assert isinstance(create_bucket_store(""), InMemoryBucketStore)
+    store = create_bucket_store(str(tmp_path / "limits" / "buckets.sqlite3"))
+    assert isinstance(store, SqliteBucketStore)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.core.exceptions import UnsupportedAudioFormatError
+from app.services.resampler import PcmConverter, StreamResampler
+
+
+def sine(seconds, sample_rate, frequency=440.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * frequency * t) * 0.5).astype(np.float32)
+
+
+@pytest.mark.parametrize("rate", [8000, 22050, 44100, 48000])
+def test_chunked_output_matches_one_shot(rate):
+    samples = sine(1.0, rate)
+    one_shot = StreamResampler(rate)
+    expected = np.concatenate([one_shot.process(samples), one_shot.flush()])
+
+    chunked = StreamResampler(rate)
+    parts = [chunked.process(samples[i : i + 997]) for i in range(0, len(samples), 997)]
+    result = np.concatenate([*parts, chunked.flush()])
+
+    assert len(result) == 16000
+    np.testing.assert_allclose(result, expected, atol=1e-6)
+
+
+def test_resampled_sine_matches_target_rate():
+    resampler = StreamResampler(44100)
+    result = np.concatenate([resampler.process(sine(1.0, 44100)), resampler.flush()])
+    # フィルタの立ち上がり・立ち下がりを除いて比較する
+    np.testing.assert_allclose(result[200:-200], sine(1.0, 16000)[200:-200], atol=5e-3)
+
+
+def test_same_rate_is_passthrough():
+    resampler = StreamResampler(16000)
+    samples = sine(0.1, 16000)
+    assert resampler.passthrough
+    np.testing.assert_array_equal(resampler.process(samples), samples)
+    assert len(resampler.flush()) == 0
+
+
+def test_pcm16_mono_16k_is_unchanged():
+    converter = PcmConverter(16000)
+    data = b"\x01\x00\xff\x7f" * 50
+    assert converter.convert(data) == data
+    assert converter.flush() == b""
+
+
+def test_stereo_float32_is_downmixed_and_resampled():
+    left = sine(0.5, 48000)
+    stereo = np.stack([left, np.zeros_like(left)], axis=1).astype("<f4")
+    converter = PcmConverter(48000, channels=2, sample_width=4)
+
+    pcm = converter.convert(stereo.tobytes()) + converter.flush()
+    result = np.frombuffer(pcm, "<i2") / 32768.0
+
+    assert len(result) == 8000
+    np.testing.assert_allclose(
+        result[200:-200], sine(0.5, 16000)[200:-200] / 2, atol=5e-3
+    )
+
+
+def test_frames_split_across_messages():
+    stereo = (np.arange(4000, dtype="<i2") % 100).repeat(2).tobytes()
+    whole = PcmConverter(8000, channels=2)
+    expected = whole.convert(stereo) + whole.flush()
+
+    split = PcmConverter(8000, channels=2)
+    pcm = b"".join(
+        split.convert(stereo[i : i + 333]) for i in range(0, len(stereo), 333)
+    )
+    assert pcm + split.flush() == expected
+
+
+@pytest.mark.parametrize(
+    "sample_rate, channels, sample_width",
+    [
+        (16000, 1, 3),
+        (16000, 0, 2),
+        (16000, 64, 2),
+        (0, 1, 2),
+        (1_000_003, 1, 2),
+        ("16000", 1, 2),
+        (16000.0, 1, 2),
+    ],
+)
+def test_unsupported_formats_are_rejected(sample_rate, channels, sample_width):
+    with pytest.raises(UnsupportedAudioFormatError):
+        PcmConverter(sample_rate, channels, sample_width)
+
+
+def test_rates_with_large_ratio_are_rejected():
+    """16kHz と公約数の小さいレートはフィルタが巨大になるため拒否する"""
+    for rate in (8000, 11025, 22050, 44100, 48000, 96000, 192000):
+        StreamResampler(rate)
+    with pytest.raises(UnsupportedAudioFormatError):
+        StreamResampler(16001)
+    with pytest.raises(UnsupportedAudioFormatError):
+        PcmConverter(44101)
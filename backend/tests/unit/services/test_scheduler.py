@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from app.core.exceptions import RequestCancelledError
+from app.services.cancellation import Cancellation
+from app.services.scheduler import FairScheduler, priority_rank
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def start_waiters(scheduler, jobs):
+    """jobs の順に並ばせ、割り当てられた順序を記録するスレッドを起動する"""
+    order = []
+    threads = []
+    for name, priority, client, cost in jobs:
+
+        def run(name=name, priority=priority, client=client, cost=cost):
+            slot = scheduler.acquire(priority, client, cost)
+            order.append(name)
+            scheduler.release(slot)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        # 並んだ順序を確定させる
+        wait_for(lambda count=len(threads): scheduler.waiting() == count)
+    return order, threads
+
+
+def test_priority_rank():
+    assert priority_rank("realtime") < priority_rank("interactive")
+    assert priority_rank("interactive") < priority_rank("batch")
+    with pytest.raises(ValueError):
+        priority_rank("urgent")
+
+
+def test_higher_priority_first():
+    scheduler = FairScheduler(["slot"])
+    held = scheduler.acquire("batch")
+
+    order, threads = start_waiters(
+        scheduler,
+        [
+            ("batch", "batch", "a", 30.0),
+            ("interactive", "interactive", "b", 5.0),
+            ("realtime", "realtime", "c", 2.0),
+        ],
+    )
+    assert scheduler.waiting("batch") == 1
+    scheduler.release(held)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["realtime", "interactive", "batch"]
+    assert scheduler.free == 1
+
+
+def test_fair_between_clients():
+    """同じクラスでは、多く投げたクライアントの仕事が他のクライアントを待たせない"""
+    scheduler = FairScheduler(["slot"])
+    held = scheduler.acquire("batch", "a", 10.0)
+
+    order, threads = start_waiters(
+        scheduler,
+        [
+            ("a2", "batch", "a", 10.0),
+            ("a3", "batch", "a", 10.0),
+            ("b1", "batch", "b", 10.0),
+        ],
+    )
+    scheduler.release(held)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["b1", "a2", "a3"]
+
+
+def test_checkpoint_without_waiters_keeps_slot():
+    scheduler = FairScheduler(["slot"])
+    slot = scheduler.acquire("batch", "a", 30.0)
+    assert scheduler.checkpoint(slot, "batch", "a", 30.0) == slot
+    assert scheduler.free == 0
+
+
+def test_checkpoint_yields_to_realtime():
+    """長い仕事は区切りで優先度の高い仕事に譲り、その後に再開する"""
+    scheduler = FairScheduler(["slot"])
+    slot = scheduler.acquire("batch", "a", 30.0)
+
+    order, threads = start_waiters(scheduler, [("live", "realtime", "b", 2.0)])
+    slot = scheduler.checkpoint(slot, "batch", "a", 30.0)
+    order.append("batch")
+    scheduler.release(slot)
+    threads[0].join()
+
+    assert order == ["live", "batch"]
+
+
+def test_checkpoint_alternates_between_batch_clients():
+    scheduler = FairScheduler(["slot"])
+    slot = scheduler.acquire("batch", "a", 30.0)
+
+    order, threads = start_waiters(scheduler, [("b", "batch", "b", 30.0)])
+    slot = scheduler.checkpoint(slot, "batch", "a", 30.0)
+    order.append("a")
+    scheduler.release(slot)
+    threads[0].join()
+
+    assert order == ["b", "a"]
+
+
+def test_lower_priority_does_not_preempt():
+    scheduler = FairScheduler(["slot"])
+    slot = scheduler.acquire("realtime", "a", 2.0)
+    order, threads = start_waiters(scheduler, [("batch", "batch", "b", 30.0)])
+
+    assert scheduler.checkpoint(slot, "realtime", "a", 2.0) == slot
+    order.append("live")
+    scheduler.release(slot)
+    threads[0].join()
+
+    assert order == ["live", "batch"]
+
+
+def test_cancelled_while_waiting_is_dropped():
+    """期限の過ぎた仕事はスロットを受け取らずに並びから外れる"""
+    scheduler = FairScheduler(["slot"])
+    held = scheduler.acquire("interactive", "a")
+    cancel = Cancellation(0.1)
+
+    with pytest.raises(RequestCancelledError) as exc_info:
+        scheduler.acquire("interactive", "b", 5.0, lambda: cancel.reason)
+    assert exc_info.value.reason == "deadline"
+    assert scheduler.waiting() == 0
+
+    scheduler.release(held)
+    assert scheduler.free == 1
+
+
+def test_checkpoint_cancelled_after_yielding():
+    """譲って待っている間に打ち切られた場合、スロットは返却済みのまま"""
+    scheduler = FairScheduler(["slot"])
+    slot = scheduler.acquire("batch", "a", 30.0)
+    cancel = Cancellation()
+
+    def live():
+        held = scheduler.acquire("realtime", "b", 2.0)
+        cancel.cancel()
+        time.sleep(0.2)
+        scheduler.release(held)
+
+    thread = threading.Thread(target=live)
+    thread.start()
+    wait_for(lambda: scheduler.waiting() == 1)
+    with pytest.raises(RequestCancelledError):
+        scheduler.checkpoint(slot, "batch", "a", 30.0, lambda: cancel.reason)
+    thread.join()
+
+    assert scheduler.free == 1
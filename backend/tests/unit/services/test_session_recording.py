@@ -0,0 +1,60 @@
+import numpy as np
+import torch
+
+from app.services.mel_frontend import log10_mel, power_spectrogram
+from app.services.session_recording import SessionRecording
+
+
+def pcm(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+def test_keeps_audio_in_memory():
+    recording = SessionRecording(spill_bytes=1024)
+    recording.append(pcm(np.full(100, 0.5)))
+    recording.append(pcm(np.full(100, -0.5)))
+
+    assert not recording.spilled
+    assert recording.num_samples == 200
+    samples = recording.samples()
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples[:100], 0.5, atol=1e-4)
+    np.testing.assert_allclose(samples[100:], -0.5, atol=1e-4)
+
+
+def test_spills_long_sessions_to_disk():
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(4000) * 0.1).clip(-1, 1)
+    recording = SessionRecording(spill_bytes=1000)
+    for start in range(0, len(audio), 700):
+        recording.append(pcm(audio[start : start + 700]))
+
+    assert recording.spilled
+    expected = np.frombuffer(pcm(audio), np.int16)
+    # PCMはメモリマップのまま float32 に展開しない
+    assert isinstance(recording.pcm(), np.memmap)
+    np.testing.assert_array_equal(recording.pcm(), expected)
+    np.testing.assert_allclose(recording.samples(), expected / 32768.0, atol=1e-7)
+
+    recording.close()
+    assert not recording.spilled
+
+
+def test_mel_frames_are_joined_with_tail():
+    power = power_spectrogram(torch.randn(16000) * 0.1)
+    recording = SessionRecording(spill_bytes=1024, n_mels=80)
+    recording.add_frames(power[:, :40])
+    recording.add_frames(power[:, 40:70])
+
+    assert recording.mel_frame_count == 70
+    log_mel = recording.log_mel(power[:, 70:])
+    assert log_mel is not None
+    torch.testing.assert_close(log_mel, log10_mel(power, 80), atol=1e-2, rtol=0)
+
+
+def test_mel_is_not_kept_without_mel_bins():
+    recording = SessionRecording(spill_bytes=1024)
+    recording.add_frames(torch.ones(201, 10))
+    assert not recording.keeps_mel
+    assert recording.mel_frame_count == 0
+    assert recording.log_mel(torch.ones(201, 5)) is None
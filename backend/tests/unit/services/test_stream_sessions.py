@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import Mock
+
+from app.services.stream_sessions import StreamSessionStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_detached_session_can_be_resumed():
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=60)
+        service = Mock()
+        session = await store.create(service)
+        store.detach(session)
+        assert service.on_revision is None
+        service.close.assert_not_called()
+
+        resumed = await store.attach(session.id)
+        assert resumed is session
+        assert session.lock.locked()
+        store.close(session)
+        assert len(store) == 0
+        assert await store.attach(session.id) is None
+
+    run(scenario())
+
+
+def test_detached_session_expires_after_grace_period():
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=0.05)
+        service = Mock()
+        session = await store.create(service)
+        store.detach(session)
+        await asyncio.sleep(0.1)
+        assert len(store) == 0
+        service.close.assert_called_once()
+        assert await store.attach(session.id) is None
+
+    run(scenario())
+
+
+def test_resume_supersedes_connected_session():
+    """前の接続が切断に気付く前に再接続した場合、前の接続を閉じさせて引き継ぐ"""
+
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=60)
+        session = await store.create(Mock())
+
+        async def old_connection():
+            await session.superseded.wait()
+            store.detach(session)
+
+        old = asyncio.create_task(old_connection())
+        resumed = await asyncio.wait_for(store.attach(session.id), 5)
+        await old
+        assert resumed is session
+        assert not session.superseded.is_set()
+
+    run(scenario())
+
+
+def test_disabled_store_keeps_nothing():
+    async def scenario():
+        store = StreamSessionStore(grace_seconds=0)
+        service = Mock()
+        session = await store.create(service)
+        store.detach(session)
+        assert len(store) == 0
+        service.close.assert_called_once()
+        assert await store.attach(session.id) is None
+
+    run(scenario())
+
+
+def test_multiple_workers_warn_about_sticky_routing(caplog):
+    """セッションはワーカーごとに保持するため、複数ワーカーでは警告する"""
+    StreamSessionStore(grace_seconds=60, workers=1)
+    StreamSessionStore(grace_seconds=0, workers=4)
+    assert "sticky" not in caplog.text
+
+    StreamSessionStore(grace_seconds=60, workers=4)
+    assert "sticky routing" in caplog.text
@@ -2,6 +2,7 @@ import pytest
 import json
 import wave
 import tempfile
+import numpy as np
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from app.main import app
@@ -103,6 +104,13 @@ class TestStreamingTranscriptionService:
         assert result["text"] == "Final transcription"
         assert result["language"] == "en"
 
+    def test_receive_pcm_audio(self):
+        service = StreamingTranscriptionService(language="ja")
+        service.set_audio_format(16000)
+        service.receive_audio(b"\x01\x00" * 100)
+        assert service.received_bytes == 200
+        assert service.take_remaining_audio() == b"\x01\x00" * 100
+
     def test_add_partial_text(self):
         service = StreamingTranscriptionService(language="ja")
 
@@ -178,6 +186,50 @@ class TestWebSocketEndpoint:
             assert final_msg["type"] == "final"
             assert "text" in final_msg
 
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_cascade_flow(self, mock_transcribe):
+        """小さいモデルの部分結果の後に大きいモデルのrevisedが届く"""
+
+        def transcribe(audio, model_name, language, **kwargs):
+            return {
+                "text": f"{model_name} text",
+                "language": "ja",
+                "segments": [],
+                "model_used": model_name,
+            }
+
+        mock_transcribe.side_effect = transcribe
+
+        with client.websocket_connect(
+            "/stream-transcribe?model=tiny&revision_model=base"
+        ) as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+
+            websocket.send_bytes(self.create_test_wav_data(2.1))
+            partial_msg = json.loads(websocket.receive_text())
+            assert partial_msg["type"] == "partial"
+            assert partial_msg["text"] == "tiny text"
+
+            websocket.send_text(json.dumps({"type": "end"}))
+
+            revised_msg = json.loads(websocket.receive_text())
+            assert revised_msg["type"] == "revised"
+            assert revised_msg["chunk_id"] == partial_msg["chunk_id"]
+            assert revised_msg["text"] == "base text"
+            assert revised_msg["model_used"] == "base"
+
+            final_msg = json.loads(websocket.receive_text())
+            assert final_msg["type"] == "final"
+            assert final_msg["model_used"] == "base"
+
+    def test_websocket_invalid_revision_model(self):
+        with client.websocket_connect(
+            "/stream-transcribe?model=tiny&revision_model=invalid"
+        ) as websocket:
+            error_msg = json.loads(websocket.receive_text())
+            assert error_msg["type"] == "error"
+            assert "Invalid revision model" in error_msg["message"]
+
     def test_websocket_invalid_model(self):
         with client.websocket_connect("/stream-transcribe?model=invalid") as websocket:
             # エラーメッセージを受信
@@ -186,6 +238,281 @@ class TestWebSocketEndpoint:
             assert error_msg["type"] == "error"
             assert "Invalid model" in error_msg["message"]
 
+    def test_websocket_invalid_decoding_profile(self):
+        with client.websocket_connect(
+            "/stream-transcribe?model=base&profile=ultra"
+        ) as websocket:
+            error_msg = json.loads(websocket.receive_text())
+            assert error_msg["type"] == "error"
+            assert "Invalid decoding profile" in error_msg["message"]
+
+    def test_websocket_rejects_when_busy(self):
+        from app.api.dependencies import get_admission_controller
+
+        admission = get_admission_controller()
+        with patch.object(admission, "is_overloaded", return_value=True):
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                error_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["type"] == "error"
+        assert error_msg["code"] == "busy"
+        assert error_msg["retry_after"] >= 1
+
+    def test_websocket_rejects_when_draining(self):
+        from app.services.drain import DrainController
+
+        drain = DrainController(retry_after=3)
+        drain.draining = True
+        with patch("app.main.get_drain_controller", return_value=drain):
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                error_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["code"] == "draining"
+        assert error_msg["retry_after"] == 3
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_drain_sends_final(self, mock_transcribe):
+        """停止処理が始まるとここまでの結果を final として送って閉じる"""
+        from app.services.drain import DrainController
+
+        mock_transcribe.return_value = {"text": "こんにちは", "language": "ja"}
+        drain = DrainController(grace_seconds=5)
+        with patch("app.main.get_drain_controller", return_value=drain):
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                assert json.loads(websocket.receive_text())["type"] == "ready"
+                # 2秒分（16kHz 16-bit）の音声で部分結果を1つ受け取る
+                websocket.send_bytes(b"\x01\x00" * 32000)
+                assert json.loads(websocket.receive_text())["type"] == "partial"
+
+                remaining = websocket.portal.call(drain.drain)
+                final_msg = json.loads(websocket.receive_text())
+
+        assert remaining == 0
+        assert final_msg["type"] == "final"
+        assert final_msg["reason"] == "draining"
+        assert final_msg["text"].strip() == "こんにちは"
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_rate_limited(self, mock_transcribe):
+        """残量を使い切るとここまでの結果を final として送って閉じる"""
+        from app.services.rate_limit import InMemoryBucketStore, RateLimiter
+
+        mock_transcribe.return_value = {"text": "こんにちは", "language": "ja"}
+        limiter = RateLimiter(InMemoryBucketStore(), rate=0.01, burst=3.0)
+        with patch("app.main.get_rate_limiter", return_value=limiter):
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                assert json.loads(websocket.receive_text())["type"] == "ready"
+                # 2秒分のチャンクは受け付けられ、次の2秒分で残量が足りなくなる
+                websocket.send_bytes(b"\x01\x00" * 32000)
+                assert json.loads(websocket.receive_text())["type"] == "partial"
+                websocket.send_bytes(b"\x01\x00" * 32000)
+                error_msg = json.loads(websocket.receive_text())
+                final_msg = json.loads(websocket.receive_text())
+
+            # 使い切った状態では新しいセッションも受け付けない
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                rejected = json.loads(websocket.receive_text())
+
+        assert error_msg["code"] == "rate_limited"
+        assert error_msg["retry_after"] == 100
+        assert final_msg["type"] == "final"
+        assert final_msg["reason"] == "rate_limited"
+        assert final_msg["text"].strip() == "こんにちは"
+        assert mock_transcribe.call_count == 1
+        assert rejected["code"] == "rate_limited"
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_resume_after_disconnect(self, mock_transcribe):
+        """切断後に session_id で再接続すると、確定済みの音声を処理し直さずに続ける"""
+        from app.services.stream_sessions import StreamSessionStore
+
+        mock_transcribe.return_value = {"text": "こんにちは", "language": "ja"}
+        store = StreamSessionStore(grace_seconds=60)
+        with patch("app.api.dependencies.get_stream_sessions", return_value=store):
+            with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+                ready_msg = json.loads(websocket.receive_text())
+                # 2秒分で部分結果を1つ受け取り、0.5秒分は未処理のまま切断する
+                websocket.send_bytes(b"\x01\x00" * 32000)
+                partial_msg = json.loads(websocket.receive_text())
+                websocket.send_bytes(b"\x01\x00" * 8000)
+                # 受信済みであることを待つ
+                websocket.send_text("invalid json")
+                websocket.receive_text()
+            assert len(store) == 1
+
+            # 部分結果を受け取れなかったものとして再接続する
+            with client.websocket_connect(
+                f"/stream-transcribe?session_id={ready_msg['session_id']}"
+                "&last_chunk_id=0"
+            ) as websocket:
+                resumed_msg = json.loads(websocket.receive_text())
+                replayed_msg = json.loads(websocket.receive_text())
+                websocket.send_bytes(b"\x01\x00" * 24000)
+                assert json.loads(websocket.receive_text())["type"] == "partial"
+                websocket.send_text(json.dumps({"type": "end"}))
+                final_msg = json.loads(websocket.receive_text())
+
+            # 終了したセッションには再接続できない
+            with client.websocket_connect(
+                f"/stream-transcribe?session_id={ready_msg['session_id']}"
+            ) as websocket:
+                expired_msg = json.loads(websocket.receive_text())
+
+        assert ready_msg["session_id"]
+        assert ready_msg["resumed"] is False
+        assert resumed_msg["type"] == "ready"
+        assert resumed_msg["resumed"] is True
+        assert resumed_msg["last_chunk_id"] == 1
+        assert resumed_msg["received_bytes"] == 80000
+        assert replayed_msg == partial_msg
+        assert final_msg["type"] == "final"
+        assert final_msg["text"].strip() == "こんにちは こんにちは"
+        # チャンク2つ分だけ推論する（残りは100バイト未満）
+        assert mock_transcribe.call_count == 2
+        assert expired_msg["code"] == "session_expired"
+        assert len(store) == 0
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_full_final_pass(self, mock_transcribe):
+        """final_pass=full はセッション全体を文字起こしし直し、セグメントを順に送る"""
+
+        def transcribe(audio, model_name, language, **kwargs):
+            if "on_segments" not in kwargs:
+                return {"text": "chunk", "language": "en"}
+            segments = [{"id": 0, "start": 0.0, "end": 2.5, "text": "whole"}]
+            kwargs["on_segments"](segments)
+            return {
+                "text": "whole",
+                "language": "en",
+                "segments": segments,
+                "model_used": model_name,
+            }
+
+        mock_transcribe.side_effect = transcribe
+
+        with client.websocket_connect(
+            "/stream-transcribe?model=base&final_pass=full"
+        ) as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+            websocket.send_bytes(self.create_test_wav_data(2.5))
+            assert json.loads(websocket.receive_text())["type"] == "partial"
+
+            websocket.send_text(json.dumps({"type": "end"}))
+            segment_msg = json.loads(websocket.receive_text())
+            final_msg = json.loads(websocket.receive_text())
+
+        assert segment_msg == {
+            "type": "segment",
+            "id": 0,
+            "start": 0.0,
+            "end": 2.5,
+            "text": "whole",
+        }
+        assert final_msg["type"] == "final"
+        assert final_msg["text"] == "whole"
+        # 最後の呼び出しはセッション全体（2.5秒）の音声
+        assert len(mock_transcribe.call_args.args[0]) == 40000
+
+    def test_websocket_invalid_final_pass(self):
+        with client.websocket_connect(
+            "/stream-transcribe?model=base&final_pass=best"
+        ) as websocket:
+            error_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["type"] == "error"
+        assert "Invalid final pass" in error_msg["message"]
+
+    def test_websocket_unsupported_codec(self):
+        """未対応のコーデックはエラーを返し、セッションはそのまま続ける"""
+        with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+            websocket.send_text(
+                json.dumps(
+                    {
+                        "type": "audio_info",
+                        "sample_rate": 16000,
+                        "channels": 1,
+                        "sample_width": 2,
+                        "codec": "speex",
+                    }
+                )
+            )
+            error_msg = json.loads(websocket.receive_text())
+            websocket.send_text(json.dumps({"type": "end"}))
+            final_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["code"] == "unsupported_codec"
+        assert "pcm" in error_msg["message"]
+        assert final_msg["type"] == "final"
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_websocket_resamples_stereo_float(self, mock_transcribe):
+        """48kHz ステレオの32-bit浮動小数点PCMも16kHz モノラルとして文字起こしする"""
+        mock_transcribe.return_value = {"text": "Hello", "language": "en"}
+        samples = np.zeros((int(48000 * 2.1), 2), dtype="<f4")
+
+        with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+            websocket.send_text(
+                json.dumps(
+                    {
+                        "type": "audio_info",
+                        "sample_rate": 48000,
+                        "channels": 2,
+                        "sample_width": 4,
+                    }
+                )
+            )
+            websocket.send_bytes(samples.tobytes())
+            partial_msg = json.loads(websocket.receive_text())
+
+        assert partial_msg["type"] == "partial"
+        audio = mock_transcribe.call_args.args[0]
+        assert len(audio) == 32000
+
+    def test_websocket_unsupported_sample_width(self):
+        with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+            websocket.send_text(
+                json.dumps(
+                    {
+                        "type": "audio_info",
+                        "sample_rate": 16000,
+                        "channels": 1,
+                        "sample_width": 3,
+                    }
+                )
+            )
+            error_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["code"] == "unsupported_format"
+
+    @pytest.mark.parametrize(
+        "audio_info",
+        [
+            {"sample_rate": 1_000_003},
+            {"sample_rate": 10**12},
+            {"sample_rate": 16001},
+            {"sample_rate": "fast"},
+            {"channels": 1000},
+        ],
+    )
+    def test_websocket_rejects_unsupported_audio_info(self, audio_info):
+        """範囲外や不正な型の形式はセッションを止めずに unsupported_format を返す"""
+        with client.websocket_connect("/stream-transcribe?model=base") as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "ready"
+            websocket.send_text(json.dumps({"type": "audio_info", **audio_info}))
+            error_msg = json.loads(websocket.receive_text())
+            # セッションは続き、受け付けられる形式に切り替えられる
+            websocket.send_text(
+                json.dumps({"type": "audio_info", "sample_rate": 44100})
+            )
+            websocket.send_text(json.dumps({"type": "end"}))
+            final_msg = json.loads(websocket.receive_text())
+
+        assert error_msg["code"] == "unsupported_format"
+        assert final_msg["type"] == "final"
+
     @patch("app.services.streaming_service.whisper_manager.transcribe")
     def test_websocket_invalid_json(self, mock_transcribe):
         with client.websocket_connect("/stream-transcribe?model=base") as websocket:
@@ -202,3 +529,152 @@ class TestWebSocketEndpoint:
             error_msg = json.loads(error_data)
             assert error_msg["type"] == "error"
             assert "Invalid JSON" in error_msg["message"]
+
+
+class TestMultiplexedStreaming:
+    @staticmethod
+    def frame(stream_id, pcm):
+        return stream_id.to_bytes(4, "big") + pcm
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_streams_share_one_connection(self, mock_transcribe):
+        """ストリームごとに別のセッションとして部分結果と最終結果を返す"""
+
+        def transcribe(audio, model_name, language, **kwargs):
+            return {"text": "high" if audio[0] > 0.1 else "low", "language": "ja"}
+
+        mock_transcribe.side_effect = transcribe
+
+        with client.websocket_connect("/stream-transcribe-mux") as websocket:
+            websocket.send_text(json.dumps({"type": "start", "stream": 1}))
+            websocket.send_text(
+                json.dumps({"type": "start", "stream": 7, "model": "base"})
+            )
+            ready = [json.loads(websocket.receive_text()) for _ in range(2)]
+
+            # 2秒分（16kHz 16-bit）を1秒分ずつ交互に送る
+            for _ in range(2):
+                websocket.send_bytes(self.frame(1, b"\x01\x00" * 16000))
+                websocket.send_bytes(self.frame(7, b"\x00\x10" * 16000))
+            partials = [json.loads(websocket.receive_text()) for _ in range(2)]
+
+            websocket.send_text(json.dumps({"type": "end", "stream": 1}))
+            websocket.send_text(json.dumps({"type": "end", "stream": 7}))
+            finals = [json.loads(websocket.receive_text()) for _ in range(2)]
+
+        assert {(msg["type"], msg["stream"]) for msg in ready} == {
+            ("ready", 1),
+            ("ready", 7),
+        }
+        assert {(msg["stream"], msg["text"]) for msg in partials} == {
+            (1, "low"),
+            (7, "high"),
+        }
+        assert all(msg["chunk_id"] == 1 for msg in partials)
+        assert {
+            (msg["type"], msg["stream"], msg["text"].strip()) for msg in finals
+        } == {
+            ("final", 1, "low"),
+            ("final", 7, "high"),
+        }
+
+    def test_errors_are_scoped_to_streams(self):
+        with client.websocket_connect("/stream-transcribe-mux") as websocket:
+            websocket.send_bytes(self.frame(3, b"\x00\x00" * 100))
+            unknown = json.loads(websocket.receive_text())
+
+            websocket.send_text(
+                json.dumps({"type": "start", "stream": 4, "model": "invalid"})
+            )
+            invalid = json.loads(websocket.receive_text())
+
+            websocket.send_text(json.dumps({"type": "end"}))
+            missing_id = json.loads(websocket.receive_text())
+
+        assert unknown["type"] == "error"
+        assert unknown["stream"] == 3
+        assert unknown["code"] == "unknown_stream"
+        assert invalid["stream"] == 4
+        assert "Invalid model" in invalid["message"]
+        assert missing_id["type"] == "error"
+        assert "stream" not in missing_id
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_stream_limit(self, mock_transcribe):
+        with patch("app.main.settings.mux_max_streams", 1):
+            with client.websocket_connect("/stream-transcribe-mux") as websocket:
+                websocket.send_text(json.dumps({"type": "start", "stream": 1}))
+                assert json.loads(websocket.receive_text())["type"] == "ready"
+                websocket.send_text(json.dumps({"type": "start", "stream": 2}))
+                rejected = json.loads(websocket.receive_text())
+
+        assert rejected["stream"] == 2
+        assert rejected["code"] == "too_many_streams"
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_stream_queue_overflow_closes_only_that_stream(self, mock_transcribe):
+        """推論が追いつかずにキューがあふれたストリームだけを終了する"""
+        import threading
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def transcribe(audio, model_name, language, **kwargs):
+            started.set()
+            release.wait(5)
+            return {"text": "こんにちは", "language": "ja"}
+
+        mock_transcribe.side_effect = transcribe
+
+        with patch("app.main.settings.mux_queue_max_items", 2):
+            with client.websocket_connect("/stream-transcribe-mux") as websocket:
+                websocket.send_text(json.dumps({"type": "start", "stream": 1}))
+                assert json.loads(websocket.receive_text())["type"] == "ready"
+                websocket.send_bytes(self.frame(1, b"\x01\x00" * 32000))
+                assert started.wait(5)
+
+                # 1つ目のチャンクの推論中に、キューの上限を超えて送る
+                for _ in range(3):
+                    websocket.send_bytes(self.frame(1, b"\x01\x00" * 1600))
+                # 他のストリームへの応答が届けば、ここまでのフレームは受信済み
+                websocket.send_bytes(self.frame(9, b""))
+                assert json.loads(websocket.receive_text())["stream"] == 9
+                release.set()
+                messages = [json.loads(websocket.receive_text()) for _ in range(3)]
+
+                websocket.send_bytes(self.frame(1, b"\x01\x00" * 1600))
+                unknown = json.loads(websocket.receive_text())
+                websocket.send_text(json.dumps({"type": "start", "stream": 2}))
+                ready = json.loads(websocket.receive_text())
+
+        assert [msg["type"] for msg in messages] == ["partial", "error", "final"]
+        assert messages[1]["code"] == "stream_overflow"
+        assert messages[2]["reason"] == "overflow"
+        assert all(msg["stream"] == 1 for msg in messages)
+        assert unknown["code"] == "unknown_stream"
+        assert (ready["type"], ready["stream"]) == ("ready", 2)
+
+    @patch("app.services.streaming_service.whisper_manager.transcribe")
+    def test_drain_sends_final_for_each_stream(self, mock_transcribe):
+        from app.services.drain import DrainController
+
+        mock_transcribe.return_value = {"text": "こんにちは", "language": "ja"}
+        drain = DrainController(grace_seconds=5)
+        with patch("app.main.get_drain_controller", return_value=drain):
+            with client.websocket_connect("/stream-transcribe-mux") as websocket:
+                for stream_id in (1, 2):
+                    websocket.send_text(
+                        json.dumps({"type": "start", "stream": stream_id})
+                    )
+                    assert json.loads(websocket.receive_text())["type"] == "ready"
+                websocket.send_bytes(self.frame(1, b"\x01\x00" * 32000))
+                assert json.loads(websocket.receive_text())["type"] == "partial"
+
+                remaining = websocket.portal.call(drain.drain)
+                finals = [json.loads(websocket.receive_text()) for _ in range(2)]
+
+        assert remaining == 0
+        assert {(msg["stream"], msg["reason"]) for msg in finals} == {
+            (1, "draining"),
+            (2, "draining"),
+        }
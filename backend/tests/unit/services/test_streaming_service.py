@@ -1,4 +1,5 @@
 import pytest
+import torch
 from unittest.mock import patch
 from app.services.streaming_service import AudioBuffer, StreamingTranscriptionService
 
@@ -37,6 +38,46 @@ class TestAudioBufferUnit:
 
 
 class TestStreamingTranscriptionServiceUnit:
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_chunk_timings(self, mock_whisper_manager):
+        """有効時は部分結果にチャンクごとの所要時間が含まれる"""
+        from app.core.config import settings
+
+        mock_whisper_manager.transcribe.return_value = {"text": "t", "language": "ja"}
+        service = StreamingTranscriptionService(model_name="tiny", language="ja")
+
+        result = await service.process_audio_chunk(b"\x00\x00" * 16000)
+        assert result is not None
+        assert "timings" not in result
+
+        with patch.object(settings, "stage_timings_enabled", True):
+            result = await service.process_audio_chunk(b"\x00\x00" * 16000)
+
+        assert result is not None
+        assert set(result["timings"]) >= {"features", "total"}
+        assert mock_whisper_manager.transcribe.call_args.kwargs["timings"] is not None
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_chunks_use_realtime_priority(self, mock_whisper_manager):
+        """ライブのチャンクは realtime、再文字起こしは interactive で推論する"""
+        mock_whisper_manager.transcribe.return_value = {"text": "t", "language": "ja"}
+        service = StreamingTranscriptionService(
+            model_name="tiny", language="ja", revision_model="small", client="ip:1"
+        )
+
+        await service.process_audio_chunk(b"\x00\x00" * 16000)
+        await service.wait_for_revisions()
+        service.cancel_revisions()
+
+        calls = mock_whisper_manager.transcribe.call_args_list
+        assert [(c.args[1], c.kwargs["priority"]) for c in calls] == [
+            ("tiny", "realtime"),
+            ("small", "interactive"),
+        ]
+        assert all(c.kwargs["client"] == "ip:1" for c in calls)
+
     @pytest.mark.asyncio
     @patch("app.services.streaming_service.whisper_manager")
     async def test_chunk_processing_workflow(self, mock_whisper_manager):
@@ -145,3 +186,170 @@ class TestStreamingTranscriptionServiceUnit:
         assert result["text"] == " Partial results"
         assert result["language"] == "unknown"
         assert result["segments"] == []
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_chunk_uses_incremental_spectrogram(self, mock_whisper_manager):
+        """16kHz入力は一時WAVを作らず、逐次計算したスペクトログラムを渡す"""
+        mock_whisper_manager.transcribe.return_value = {"text": "chunk"}
+
+        service = StreamingTranscriptionService(language="ja")
+        chunk_data = b"\x01\x00" * 32000  # 2秒分
+
+        await service.process_audio_chunk(chunk_data)
+        await service.process_audio_chunk(chunk_data)
+
+        args, kwargs = mock_whisper_manager.transcribe.call_args
+        assert args[0].shape == (32000,)
+        assert tuple(kwargs["spectrogram"].shape) == (201, 200)
+        assert service.processed_samples == 64000
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_auto_language_detected_once_per_session(self, mock_whisper_manager):
+        """language=auto は最初のチャンクの判定結果をセッション中使い回す"""
+        mock_whisper_manager.transcribe.return_value = {
+            "text": "hello",
+            "language": "en",
+            "language_probability": 0.93,
+        }
+
+        service = StreamingTranscriptionService(language="auto")
+        chunk_data = b"\x01\x00" * 32000
+
+        first = await service.process_audio_chunk(chunk_data)
+        second = await service.process_audio_chunk(chunk_data)
+
+        languages = [c.args[2] for c in mock_whisper_manager.transcribe.call_args_list]
+        assert languages == ["auto", "en"]
+        assert service.detected_language == "en"
+        assert service.language_probability == 0.93
+        assert first["language"] == second["language"] == "en"
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_cascade_revision_replaces_partial_text(self, mock_whisper_manager):
+        """カスケードモードでは確定チャンクを大きいモデルで再文字起こしする"""
+
+        def transcribe(audio, model_name, language, **kwargs):
+            text = "rough" if model_name == "tiny" else "accurate"
+            return {"text": text, "language": "ja", "segments": []}
+
+        mock_whisper_manager.transcribe.side_effect = transcribe
+
+        service = StreamingTranscriptionService(
+            model_name="tiny", language="ja", revision_model="large-v3"
+        )
+        revisions = []
+
+        async def on_revision(revised):
+            revisions.append(revised)
+
+        service.on_revision = on_revision
+
+        partial = await service.process_audio_chunk(b"\x01\x00" * 32000)
+        service.add_partial_text(partial["text"], partial["chunk_id"])
+        assert service.accumulated_text == " rough"
+
+        await service.wait_for_revisions()
+        service.cancel_revisions()
+
+        assert revisions == [
+            {
+                "text": "accurate",
+                "start": partial["start"],
+                "end": partial["end"],
+                "chunk_id": 1,
+                "model_used": "large-v3",
+            }
+        ]
+        assert service.accumulated_text == " accurate"
+        assert service.final_model == "large-v3"
+
+
+class TestFullSessionFinalPass:
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_reuses_chunk_mel_for_whole_session(self, mock_whisper_manager):
+        """チャンクの処理で計算したメルをつなげると、全体から計算したものと一致する"""
+        import numpy as np
+        from app.services.mel_frontend import LogMelFrontend
+
+        mock_whisper_manager.mel_bins.return_value = 80
+        mock_whisper_manager.transcribe.return_value = {"text": "chunk"}
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(16000 * 5 + 123) * 0.1).astype(np.float32)
+        pcm = (audio * 32767).astype("<i2").tobytes()
+
+        service = StreamingTranscriptionService(language="ja", final_pass="full")
+        await service.process_audio_chunk(pcm[:64000])
+        await service.process_audio_chunk(pcm[64000:128000])
+
+        mock_whisper_manager.transcribe.return_value = {
+            "text": "whole session",
+            "language": "ja",
+            "segments": [],
+            "model_used": "base",
+            "decoding_profile": "balanced",
+        }
+        result = await service.process_session_audio(pcm[128000:])
+
+        assert result["text"] == "whole session"
+        args, kwargs = mock_whisper_manager.transcribe.call_args
+        # 保持した16-bit PCMを float32 に展開せずに渡す
+        assert args[0].dtype == np.int16
+        np.testing.assert_array_equal(args[0], np.frombuffer(pcm, np.int16))
+        samples = np.frombuffer(pcm, np.int16) / 32768.0
+        assert kwargs["priority"] == "interactive"
+        frontend = LogMelFrontend()
+        torch.testing.assert_close(
+            frontend.from_log10_mel(kwargs["log_mel"]),
+            frontend.compute(samples, 80),
+            atol=2e-3,
+            rtol=0,
+        )
+        assert service.recording is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_segments_are_sent_progressively(self, mock_whisper_manager):
+        segments = [
+            {"id": 0, "start": 0.0, "end": 2.0, "text": "first"},
+            {"id": 1, "start": 30.0, "end": 32.0, "text": "second"},
+        ]
+
+        def transcribe(audio, model_name, language, **kwargs):
+            for segment in segments:
+                kwargs["on_segments"]([segment])
+            return {"text": "first second", "language": "ja", "segments": segments}
+
+        mock_whisper_manager.mel_bins.return_value = None
+        mock_whisper_manager.transcribe.side_effect = transcribe
+        received = []
+
+        async def on_segments(new_segments):
+            received.append(new_segments)
+
+        service = StreamingTranscriptionService(language="ja", final_pass="full")
+        result = await service.process_session_audio(b"\x01\x00" * 16000, on_segments)
+
+        assert received == [[segments[0]], [segments[1]]]
+        assert result["segments"] == segments
+        assert mock_whisper_manager.transcribe.call_args.kwargs["log_mel"] is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.streaming_service.whisper_manager")
+    async def test_failure_falls_back_to_chunk_results(self, mock_whisper_manager):
+        mock_whisper_manager.mel_bins.return_value = None
+        mock_whisper_manager.transcribe.side_effect = Exception("failed")
+
+        service = StreamingTranscriptionService(language="ja", final_pass="full")
+        service.add_partial_text("partial", 1)
+        result = await service.process_session_audio(b"\x01\x00" * 16000)
+
+        assert result["text"] == " partial"
+        assert service.recording is None
+
+    def test_chunk_final_pass_keeps_nothing(self):
+        service = StreamingTranscriptionService(language="ja")
+        assert service.recording is None
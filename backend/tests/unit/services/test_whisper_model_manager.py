@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from unittest.mock import Mock, patch
 from app.services.whisper_service import WhisperModelManager, STANDARD_MODELS
@@ -44,6 +45,35 @@ class TestWhisperModelManager:
         assert "base" in manager.loaded_models
         mock_load_model.assert_called_once()
 
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_loaded_model_gauges_sum_across_managers(self, mock_load_model):
+        """DIコンテナのマネージャーとグローバルの whisper_manager が互いに上書きしない"""
+        import torch
+        from prometheus_client import REGISTRY
+        from app.services.whisper_service import whisper_manager
+
+        def gauges():
+            return (
+                REGISTRY.get_sample_value("whisper_loaded_models"),
+                REGISTRY.get_sample_value("whisper_loaded_model_bytes"),
+            )
+
+        mock_load_model.side_effect = lambda *args, **kwargs: torch.nn.Linear(4, 4)
+        whisper_manager.unload_model("tiny")
+        models, size = gauges()
+        container_manager = WhisperModelManager()
+        try:
+            container_manager.load_model("base")
+            whisper_manager.load_model("tiny")
+            # 重み16個 + バイアス4個の float32
+            assert gauges() == (models + 2, size + 2 * 80)
+
+            container_manager.unload_model("base")
+            assert gauges() == (models + 1, size + 80)
+        finally:
+            whisper_manager.unload_model("tiny")
+        assert gauges() == (models, size)
+
     @patch("app.services.whisper_service.whisper.load_model")
     def test_load_model_invalid(self, mock_load_model):
         manager = WhisperModelManager()
@@ -71,23 +101,164 @@ class TestWhisperModelManager:
         mock_load_model.assert_called_once()  # 1回だけ呼ばれる
 
     @patch("app.services.whisper_service.whisper.load_model")
-    def test_transcribe_success(self, mock_load_model):
+    def test_unload_model(self, mock_load_model):
+        mock_load_model.return_value = Mock()
+        manager = WhisperModelManager()
+        manager.load_model("base")
+
+        assert manager.unload_model("base") is True
+        assert "base" not in manager.loaded_models
+        assert manager.unload_model("base") is False
+
+        # 再度ロードできる
+        manager.load_model("base")
+        assert mock_load_model.call_count == 2
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_audio")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_success(
+        self, mock_load_model, mock_load_audio, mock_transcribe_mel
+    ):
         mock_model = Mock()
-        mock_model.transcribe.return_value = {
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_load_audio.return_value = np.zeros(32000, dtype=np.float32)
+        mock_transcribe_mel.return_value = {
             "text": "  Hello world  ",
             "language": "en",
             "segments": [{"text": "Hello world", "start": 0.0, "end": 2.0}],
         }
-        mock_load_model.return_value = mock_model
 
         manager = WhisperModelManager()
-        result = manager.transcribe("test_audio.wav", "base")
+        result = manager.transcribe("test_audio.wav", "base", "en")
 
         assert result["text"] == "Hello world"  # strip()されている
         assert result["language"] == "en"
         assert result["model_used"] == "base"
         assert len(result["segments"]) == 1
 
+        # 2秒分のlog-melがモデルに渡される
+        mel = mock_transcribe_mel.call_args[0][1]
+        assert tuple(mel.shape) == (80, 200)
+        assert mock_transcribe_mel.call_args.kwargs["language"] == "en"
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_audio")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_with_precomputed_spectrogram(
+        self, mock_load_model, mock_load_audio, mock_transcribe_mel
+    ):
+        """パワースペクトログラムが渡された場合は音声のデコードとSTFTを省略する"""
+        import torch
+
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "chunk",
+            "language": "ja",
+            "segments": [],
+        }
+
+        manager = WhisperModelManager()
+        result = manager.transcribe(
+            np.zeros(1600, dtype=np.float32),
+            "base",
+            spectrogram=torch.ones(201, 10),
+        )
+
+        assert result["text"] == "chunk"
+        mock_load_audio.assert_not_called()
+        assert tuple(mock_transcribe_mel.call_args[0][1].shape) == (80, 10)
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_with_kept_log_mel(self, mock_load_model, mock_transcribe_mel):
+        """メル帯域数がモデルと一致する場合のみ、保持しておいたメルを使う"""
+        import torch
+
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "session",
+            "language": "ja",
+            "segments": [],
+        }
+
+        manager = WhisperModelManager()
+        manager.transcribe(
+            np.zeros(1600, dtype=np.float32), "base", log_mel=torch.zeros(80, 10)
+        )
+        mel = mock_transcribe_mel.call_args[0][1]
+        assert torch.equal(mel, torch.ones(80, 10))
+        assert manager.mel_bins("base") == 80
+
+        manager.transcribe(
+            np.zeros(1600, dtype=np.float32), "base", log_mel=torch.zeros(128, 10)
+        )
+        assert not torch.equal(mock_transcribe_mel.call_args[0][1], torch.ones(80, 10))
+        assert manager.mel_bins("tiny") is None
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_pcm_converts_only_for_mel(
+        self, mock_load_model, mock_transcribe_mel
+    ):
+        """16-bit PCMは保持したメルを使えない場合だけ float32 に変換する"""
+        import torch
+
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "",
+            "language": "ja",
+            "segments": [],
+        }
+        pcm = np.full(16000, 16384, dtype=np.int16)
+
+        manager = WhisperModelManager()
+        with patch.object(manager.frontend, "compute", wraps=manager.frontend.compute):
+            manager.transcribe(pcm, "base", log_mel=torch.zeros(80, 100))
+            manager.frontend.compute.assert_not_called()
+
+            manager.transcribe(pcm, "base")
+            samples = manager.frontend.compute.call_args[0][0]
+        assert samples.dtype == np.float32
+        np.testing.assert_allclose(samples, 0.5)
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_audio")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_records_stage_timings(
+        self, mock_load_model, mock_load_audio, mock_transcribe_mel
+    ):
+        from app.core.timing import StageTimings
+
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_load_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_transcribe_mel.return_value = {
+            "text": "timed",
+            "language": "ja",
+            "segments": [],
+        }
+
+        timings = StageTimings()
+        manager = WhisperModelManager()
+        manager.transcribe("test_audio.wav", "base", timings=timings)
+
+        assert set(timings.seconds) >= {
+            "model_load",
+            "audio_decode",
+            "model_wait",
+            "mel",
+        }
+        assert mock_transcribe_mel.call_args.kwargs["timings"] is timings
+
     @patch("app.services.whisper_service.whisper.load_model")
     def test_transcribe_invalid_model(self, mock_load_model):
         manager = WhisperModelManager()
@@ -98,11 +269,17 @@ class TestWhisperModelManager:
         assert "Invalid model name" in str(exc_info.value)
         mock_load_model.assert_not_called()
 
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_audio")
     @patch("app.services.whisper_service.whisper.load_model")
-    def test_transcribe_failure(self, mock_load_model):
+    def test_transcribe_failure(
+        self, mock_load_model, mock_load_audio, mock_transcribe_mel
+    ):
         mock_model = Mock()
-        mock_model.transcribe.side_effect = Exception("Transcription error")
+        mock_model.dims.n_mels = 80
         mock_load_model.return_value = mock_model
+        mock_load_audio.return_value = np.zeros(16000, dtype=np.float32)
+        mock_transcribe_mel.side_effect = Exception("Transcription error")
 
         manager = WhisperModelManager()
 
@@ -110,3 +287,23 @@ class TestWhisperModelManager:
             manager.transcribe("test_audio.wav", "base")
 
         assert "Transcription failed" in str(exc_info.value)
+
+    @patch("app.services.whisper_service.transcribe_mel")
+    @patch("app.services.whisper_service.whisper.load_model")
+    def test_transcribe_auto_language(self, mock_load_model, mock_transcribe_mel):
+        mock_model = Mock()
+        mock_model.dims.n_mels = 80
+        mock_load_model.return_value = mock_model
+        mock_transcribe_mel.return_value = {
+            "text": "bonjour",
+            "language": "fr",
+            "language_probability": 0.88,
+            "segments": [],
+        }
+
+        manager = WhisperModelManager()
+        result = manager.transcribe(np.zeros(16000, dtype=np.float32), "base", "auto")
+
+        assert mock_transcribe_mel.call_args.kwargs["language"] is None
+        assert result["language"] == "fr"
+        assert result["language_probability"] == 0.88